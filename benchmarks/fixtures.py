@@ -0,0 +1,186 @@
+"""
+Benchmark Fixtures
+
+Builds the offline inputs of the benchmark suite in ``benchmarks/data``:
+
+- ``timetables/``  a snapshot of the route parquet files, with the long format
+  and bundle built from them
+- ``*.pdf``        synthetic timetable PDFs drawn from that snapshot as ruled
+  tables, so camelot reads them the same way as KTMB's PDFs
+- ``real/*.pdf``   real KTMB timetable PDFs (``REAL_PDFS``), downloaded with
+  ``--real``; the text-layer extractor is checked against camelot on them
+- ``TrainTime.html`` is a saved copy of the listing page and is not generated
+
+The files are checked in, so benchmark runs never touch the network and always
+measure the same inputs. Run this script only to refresh the snapshot, or with
+``--real`` to download the real PDFs and compare both extractors on them:
+
+    python benchmarks/fixtures.py [--source timetables]
+    python benchmarks/fixtures.py --real
+"""
+
+import argparse
+import os
+import shutil
+import sys
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+DATA_DIR = os.path.join(BENCH_DIR, "data")
+TIMETABLES_DIR = os.path.join(DATA_DIR, "timetables")
+LISTING_FILE = os.path.join(DATA_DIR, "TrainTime.html")
+REAL_DIR = os.path.join(DATA_DIR, "real")
+
+sys.path.insert(0, REPO_DIR)
+
+# PDF name -> (route files drawn one per page, first column header, route title)
+PDFS = {
+    'klang_weekdays.pdf': (['klang_weekdays_route_1', 'klang_weekdays_route_2'], 'STATION',
+                           'LALUAN TG MALIM KE PEL KLANG'),
+    'utara.pdf': (['utara_ipoh_1', 'utara_padangbesar_1'], 'NOMBOR TREN', 'KOMUTER UTARA'),
+}
+
+# Real KTMB timetables (from the saved listing page): file name -> URL
+REAL_PDFS = {
+    'klang_weekdays_2jan2026.pdf': "https://www.ktmb.com.my/assets/pdf/2026/TM-PK-TM Weekday2JAN2026.pdf",
+    'utara_16sept2023.pdf': "https://www.ktmb.com.my/assets/pdf/2023/Jadual-Komuter-Utara-16-Sept-2023.pdf",
+}
+
+CELL_WIDTH = 34
+STATION_WIDTH = 110
+ROW_HEIGHT = 14
+FONT_SIZE = 7
+
+
+def raw_table(df, header, title):
+    """
+    Return ``df`` laid out like a raw camelot table of a KTMB PDF.
+
+    Two title rows, then the train numbers under ``header``, then one row per station.
+    """
+    columns = [header] + [str(c) for c in df.columns[1:]]
+    rows = [['KTM KOMUTER'] + [''] * (len(columns) - 1),
+            [''] + [title] + [''] * (len(columns) - 2),
+            columns]
+    rows += df.fillna('').astype(str).values.tolist()
+    return pd.DataFrame(rows)
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _table_page(raw):
+    """PDF content stream drawing ``raw`` as a ruled table."""
+    widths = [STATION_WIDTH] + [CELL_WIDTH] * (raw.shape[1] - 1)
+    x0, y0 = 30, 800
+    edges = [x0]
+    for width in widths:
+        edges.append(edges[-1] + width)
+    height = ROW_HEIGHT * len(raw)
+
+    ops = ["0.5 w"]
+    for i in range(len(raw) + 1):
+        y = y0 - i * ROW_HEIGHT
+        ops.append(f"{x0} {y} m {edges[-1]} {y} l S")
+    for x in edges:
+        ops.append(f"{x} {y0} m {x} {y0 - height} l S")
+    for i, row in enumerate(raw.itertuples(index=False)):
+        for j, cell in enumerate(row):
+            if cell:
+                ops.append(f"BT /F1 {FONT_SIZE} Tf {edges[j] + 2} {y0 - (i + 1) * ROW_HEIGHT + 4} Td "
+                           f"({_escape(cell)}) Tj ET")
+    return "\n".join(ops), edges[-1] + x0
+
+
+def write_pdf(raw_tables, path):
+    """Write one page per raw table to ``path`` as a minimal PDF 1.4 file."""
+    pages = [_table_page(raw) for raw in raw_tables]
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))),
+                                                     len(pages)),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, (content, width) in enumerate(pages):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {max(width, 842)} 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(content.encode('latin-1'))} >>\nstream\n{content}\nendstream")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def fixture_raw_tables():
+    """Return PDF name -> raw tables, built from the parquet snapshot."""
+    tables = {}
+    for pdf_name, (route_files, header, title) in PDFS.items():
+        tables[pdf_name] = [
+            raw_table(pd.read_parquet(os.path.join(TIMETABLES_DIR, f"{name}.parquet")), header, title)
+            for name in route_files
+        ]
+    return tables
+
+
+def build_fixtures(source):
+    from parquet_writer import write_parquet
+    from timetable_bundle import BUNDLE_FILE, write_bundle
+    from timetable_schema import STATIONS_FILE, STOP_TIMES_FILE, build_long_format, load_wide_tables, route_files
+
+    os.makedirs(TIMETABLES_DIR, exist_ok=True)
+    for path in route_files(source).values():
+        shutil.copyfile(path, os.path.join(TIMETABLES_DIR, os.path.basename(path)))
+
+    stations, stop_times = build_long_format(load_wide_tables(TIMETABLES_DIR))
+    write_parquet(stations, os.path.join(TIMETABLES_DIR, STATIONS_FILE))
+    write_parquet(stop_times, os.path.join(TIMETABLES_DIR, STOP_TIMES_FILE))
+    write_bundle(stations, stop_times, os.path.join(TIMETABLES_DIR, BUNDLE_FILE))
+
+    for pdf_name, raw_tables in fixture_raw_tables().items():
+        write_pdf(raw_tables, os.path.join(DATA_DIR, pdf_name))
+    print(f"Wrote benchmark fixtures to {DATA_DIR}")
+
+
+def real_pdfs():
+    """Return the paths of the real KTMB PDFs in ``REAL_DIR`` that have been downloaded."""
+    return [os.path.join(REAL_DIR, name) for name in sorted(REAL_PDFS) if os.path.exists(os.path.join(REAL_DIR, name))]
+
+
+def download_real_pdfs():
+    """
+    Download ``REAL_PDFS`` to ``REAL_DIR`` and compare the text-layer tables with camelot.
+
+    Returns:
+    bool: True if every page of every PDF is identical or was sent to camelot.
+    """
+    from pdf_downloader import fetch_pdf, make_session
+    from pdf_text_extractor import compare_with_camelot
+
+    os.makedirs(REAL_DIR, exist_ok=True)
+    session = make_session()
+    for name, url in REAL_PDFS.items():
+        result = fetch_pdf(url, os.path.join(REAL_DIR, name), session=session)
+        print(f"Downloaded {url} to {name} ({result['size']} bytes)")
+    return all([compare_with_camelot(path) for path in real_pdfs()])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the benchmark fixtures from a timetables folder.")
+    parser.add_argument('--source', default=os.path.join(REPO_DIR, "timetables"))
+    parser.add_argument('--real', action='store_true',
+                        help="Download the real KTMB PDFs and compare the text-layer extractor with camelot on them.")
+    args = parser.parse_args()
+    if args.real:
+        sys.exit(0 if download_real_pdfs() else 1)
+    build_fixtures(args.source)
@@ -0,0 +1,471 @@
+"""
+Benchmark Suite
+
+Times the scraper stages and the query engines on the checked-in fixtures in
+``benchmarks/data`` (see ``fixtures.py``), fully offline:
+
+- ``listing_parse``       get_ktmb_komuter_timetables on the saved listing page
+- ``effective_dates``     normalize_dates on its effective texts and PDF file names
+- ``parse_time_cells``    parse_time_to_minutes per cell and parse_times on whole tables
+- ``camelot_extract``     read_tables on the fixture PDFs with camelot
+- ``text_extract``        read_tables on the fixture PDFs with the text-layer extractor
+- ``page_screen``         timetable_pages on the fixture PDFs
+- ``clean_tables``        cleaning and time checks of the raw tables
+- ``long_format``         build_long_format from the route parquet files
+- ``write_parquet``       a changed and an unchanged write of stop_times
+- ``bundle_read``         read_bundle of the timetable bundle
+- ``index_build``         TimetableIndex from stations / stop_times
+- ``next_trains``         ScheduleIndex queries between random stations
+- ``departures``          DepartureBoard queries at random stations
+- ``journeys``            JourneyPlanner queries between random stations
+- ``history_query``       HistoryIndex as-of lookups of routes and trains
+- ``real_text_extract``   read_tables on the real KTMB PDFs, when downloaded
+                          with ``fixtures.py --real``
+
+Each benchmark takes ``repeat`` timed samples; a sample loops the benchmark
+until it has run for at least ``MIN_SAMPLE_SECONDS``, so millisecond-scale
+benchmarks are not dominated by timer and scheduler noise. The best sample
+(the one least disturbed by other load) is compared with ``baseline.json``. A
+benchmark is a regression, and makes the script exit with status 1, when it is
+more than ``--threshold`` slower than its baseline *and* at least
+``--min-delta`` seconds slower.
+
+``--check`` runs no benchmark. It parses a fixed table of date texts and time
+cells (``DATE_CASES``, ``TIME_CASES``) and exits with status 1 if any result
+differs from the expected one, so a change to ``date_normalizer`` or
+``time_parsing`` that alters what users see is caught:
+
+    python benchmarks/run_benchmarks.py --check
+
+Baselines are stored per machine (OS, architecture, CPU model and count), and
+a machine without a baseline is only reported, never failed. Save one on the
+machine you compare on:
+
+    python benchmarks/run_benchmarks.py --save-baseline
+    python benchmarks/run_benchmarks.py [--only camelot_extract,next_trains] [--threshold 0.25]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import pandas as pd
+
+import get_latest_komuter_timetables as scraper
+from date_normalizer import file_name, format_date, normalize_dates, parse_date
+from fixtures import DATA_DIR, LISTING_FILE, PDFS, TIMETABLES_DIR, fixture_raw_tables, real_pdfs
+from parquet_writer import write_parquet
+from page_screen import timetable_pages
+from pdf_extractor import read_tables
+from time_parsing import INVALID, parse_time_to_minutes, parse_times
+from timetable_bundle import BUNDLE_FILE, read_bundle
+from timetable_history import HistoryIndex, load_history, record_editions
+from timetable_index import TimetableIndex
+from timetable_schema import NO_STOP, build_long_format, load_wide_tables
+
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+THRESHOLD = 0.25  # allowed slowdown before a benchmark counts as a regression
+MIN_DELTA = 0.005  # seconds; smaller slowdowns are noise, whatever their percentage
+MIN_SAMPLE_SECONDS = 0.05  # fast benchmarks are looped until one sample takes this long
+SEED = 2024
+QUERIES = 1000
+
+# text -> date parse_date must find (None: no date)
+DATE_CASES = {
+    "Jadual-Komuter-Utara-16-Sept-2023": date(2023, 9, 16),
+    "16 Sep 2023": date(2023, 9, 16),
+    "2nd January 2026": date(2026, 1, 2),
+    "January 2nd, 2026": date(2026, 1, 2),
+    "TM-PK-TM Weekday2JAN2026": date(2026, 1, 2),
+    "15Mac2025": date(2025, 3, 15),
+    "1 Mac 24": date(2024, 3, 1),
+    "BCPS_Komuter Weekday mulai 25 Ogos 2025 1": date(2025, 8, 25),
+    "1-Julai-2025": date(2025, 7, 1),
+    "11 Mei 2026": date(2026, 5, 11),
+    "5 Disember 2024": date(2024, 12, 5),
+    "Jadual Tren ETS 12 Dis 2025": date(2025, 12, 12),
+    "1 Oktober 2025": date(2025, 10, 1),
+    "2024-01-01": date(2024, 1, 1),
+    "20240101": date(2024, 1, 1),
+    "12/01/2026": date(2026, 1, 12),
+    "12012026": date(2026, 1, 12),
+    "BC-PS-BC Weekday2026_Perubahan 27042026 (2)": date(2026, 4, 27),
+    "Jadual Komuter terkini": None,
+}
+# date -> format_date text, the style of the listing's Effective column
+FORMAT_CASES = {
+    date(2023, 9, 16): "16 September 2023",
+    date(2026, 1, 2): "2 January 2026",
+}
+# raw time cell -> minutes since midnight (INVALID: not a time)
+TIME_CASES = {
+    "6:15": 375,
+    "06:15": 375,
+    "6.15": 375,
+    "18::12": 1092,
+    "615": 375,
+    "1026": 626,
+    "6:15*": 375,
+    "(6:15)": 375,
+    "6:15 a": 375,
+    "#1026": 626,
+    "24:05": 1445,
+    "29:59": 1799,
+    "30:00": INVALID,
+    "6:60": INVALID,
+    "-": INVALID,
+    "": INVALID,
+    "CROSSING": INVALID,
+    None: INVALID,
+}
+
+
+class FixtureSession:
+    """Stands in for the requests session, answering every GET with the saved listing page."""
+
+    class Response:
+        def __init__(self, text):
+            self.text = text
+            self.status_code = 200
+
+        def raise_for_status(self):
+            pass
+
+    def __init__(self, path):
+        with open(path, encoding='utf-8') as f:
+            self.text = f.read()
+
+    def get(self, url, **kwargs):
+        return self.Response(self.text)
+
+
+def quiet(func, *args, **kwargs):
+    """Call ``func`` with its prints suppressed."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def _random_queries(index, n, seed=SEED):
+    rng = random.Random(seed)
+    stations = index.stations
+    times = range(5 * 60, 23 * 60)
+    return [(rng.choice(['WEEKDAYS', 'WEEKENDS']), rng.choice(stations), rng.choice(stations), rng.choice(times))
+            for _ in range(n)]
+
+
+def benchmarks():
+    """
+    Return benchmark name -> (setup, run, repeat).
+
+    ``setup()`` runs once and is not timed; its result is passed to ``run``.
+    """
+    def listing_setup():
+        return FixtureSession(LISTING_FILE)
+
+    def dates_setup():
+        listing = quiet(scraper.get_ktmb_komuter_timetables, FixtureSession(LISTING_FILE))
+        return pd.concat([listing['Effective'], listing['PDF Links'].map(file_name)] * 50, ignore_index=True)
+
+    def dates_run(values):
+        normalize_dates(values)
+
+    def cells_setup():
+        tables = load_wide_tables(TIMETABLES_DIR)
+        return [df.iloc[:, 1:].to_numpy(dtype=object) for df in tables.values()]
+
+    def cells_run(grids):
+        for value in grids[0].ravel():
+            try:
+                parse_time_to_minutes(value)
+            except ValueError:
+                pass
+        for grid in grids:
+            parse_times(grid)
+
+    def camelot_run(pdf_paths):
+        for pdf_path in pdf_paths:
+            read_tables(pdf_path, extractor='camelot')
+
+    def text_run(pdf_paths):
+        for pdf_path in pdf_paths:
+            read_tables(pdf_path, extractor='text')
+
+    def screen_run(pdf_paths):
+        for pdf_path in pdf_paths:
+            timetable_pages(pdf_path)
+
+    def clean_run(raw_tables):
+        for pdf_name, tables in raw_tables.items():
+            for i, raw_df in enumerate(tables):
+                header = PDFS[pdf_name][1]
+                df = scraper.clean_utara_table(raw_df) if header == 'NOMBOR TREN' else scraper.clean_route_table(raw_df)
+                quiet(scraper.check_time_cells, f"{pdf_name}_{i + 1}", df)
+
+    def long_format_run(_):
+        build_long_format(load_wide_tables(TIMETABLES_DIR))
+
+    def write_setup():
+        stop_times = read_bundle(os.path.join(TIMETABLES_DIR, BUNDLE_FILE))[1]
+        return stop_times, tempfile.TemporaryDirectory(prefix="ktmb-bench-")
+
+    def write_run(state):
+        stop_times, temp_dir = state
+        path = os.path.join(temp_dir.name, "stop_times.parquet")
+        if os.path.exists(path):
+            os.remove(path)
+        write_parquet(stop_times, path)  # new file
+        write_parquet(stop_times, path)  # unchanged, compared and skipped
+
+    def bundle_run(_):
+        read_bundle(os.path.join(TIMETABLES_DIR, BUNDLE_FILE))
+
+    def tables_setup():
+        return read_bundle(os.path.join(TIMETABLES_DIR, BUNDLE_FILE))[:2]
+
+    def index_setup():
+        stations, stop_times = tables_setup()
+        index = TimetableIndex(stations, stop_times)
+        return index, _random_queries(index, QUERIES)
+
+    def next_trains_run(state):
+        index, queries = state
+        for day, origin, destination, after in queries:
+            index.schedule.next_trains(day, origin, destination, after)
+
+    def departures_run(state):
+        index, queries = state
+        for day, station, _, after in queries:
+            index.boards[day].next_departures(station, after)
+
+    def journeys_run(state):
+        index, queries = state
+        for day, origin, destination, after in queries[:200]:
+            index.planner.earliest_arrival(day, origin, destination, after)
+
+    def history_setup():
+        # One edition per quarter, each with every time shifted by a minute
+        stations, stop_times = tables_setup()
+        temp_dir = tempfile.TemporaryDirectory(prefix="ktmb-bench-")
+        stops = stop_times['departure'] != NO_STOP
+        for quarter in range(8):
+            edition = stop_times.copy()
+            edition.loc[stops, ['arrival', 'departure']] += quarter
+            recorded = f"{2024 + quarter // 4}-{quarter % 4 * 3 + 1:02d}-01"
+            record_editions(temp_dir.name, stations, edition, recorded=recorded)
+        index = HistoryIndex(*load_history(temp_dir.name))
+        temp_dir.cleanup()
+        rng = random.Random(SEED)
+        trains = stop_times['service_id'].astype(str).unique().tolist()
+        queries = [(rng.choice(index.routes()), rng.choice(trains),
+                    f"{rng.randint(2024, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}")
+                   for _ in range(200)]
+        return index, queries
+
+    def history_run(state):
+        index, queries = state
+        for route_key, service_id, on in queries:
+            index.timetable_on(route_key, on)
+            index.train_on(service_id, on)
+
+    suite = {
+        'listing_parse': (listing_setup, lambda session: quiet(scraper.get_ktmb_komuter_timetables, session), 20),
+        'effective_dates': (dates_setup, dates_run, 10),
+        'parse_time_cells': (cells_setup, cells_run, 10),
+        'camelot_extract': (lambda: [os.path.join(DATA_DIR, name) for name in PDFS], camelot_run, 1),
+        'text_extract': (lambda: [os.path.join(DATA_DIR, name) for name in PDFS], text_run, 5),
+        'page_screen': (lambda: [os.path.join(DATA_DIR, name) for name in PDFS], screen_run, 20),
+        'clean_tables': (fixture_raw_tables, clean_run, 10),
+        'long_format': (lambda: None, long_format_run, 5),
+        'write_parquet': (write_setup, write_run, 10),
+        'bundle_read': (lambda: None, bundle_run, 20),
+        'index_build': (tables_setup, lambda tables: TimetableIndex(*tables), 3),
+        'next_trains': (index_setup, next_trains_run, 5),
+        'departures': (index_setup, departures_run, 5),
+        'journeys': (index_setup, journeys_run, 5),
+        'history_query': (history_setup, history_run, 5),
+    }
+    if real_pdfs():
+        suite['real_text_extract'] = (real_pdfs, text_run, 3)
+    return suite
+
+
+def check_parsers():
+    """
+    Compare ``parse_date``, ``format_date`` and ``parse_times`` with the case tables.
+
+    Time cells are parsed both alone and padded past ``SMALL_BATCH`` distinct
+    values, so the regex loop and the pandas path are both checked.
+
+    Returns:
+    list: One message per case whose result differs from the expected one.
+    """
+    failures = []
+    for text, expected in DATE_CASES.items():
+        found = parse_date(text)
+        if found != expected:
+            failures.append(f"parse_date({text!r}) = {found}, expected {expected}")
+    for value, expected in FORMAT_CASES.items():
+        if format_date(value) != expected:
+            failures.append(f"format_date({value}) = {format_date(value)!r}, expected {expected!r}")
+
+    cells = list(TIME_CASES)
+    padding = [f"filler {i}" for i in range(300)]
+    for label, values in [('small batch', cells), ('large batch', cells + padding)]:
+        minutes, valid = parse_times(values)
+        for cell, got, ok in zip(cells, minutes, valid):
+            expected = TIME_CASES[cell]
+            if int(got) != expected or bool(ok) != (expected != INVALID):
+                failures.append(f"parse_times({cell!r}) = {int(got)} ({label}), expected {expected}")
+    return failures
+
+
+def run_benchmark(setup, run, repeat):
+    """
+    Time ``run(setup())`` in ``repeat`` samples after one warm-up call.
+
+    A sample runs ``loops`` calls, enough for ``MIN_SAMPLE_SECONDS``, and
+    counts the time per call.
+
+    Returns:
+    dict: median and min seconds per call, the number of samples and loops per sample.
+    """
+    state = setup()
+    start = time.perf_counter()
+    run(state)
+    loops = max(1, math.ceil(MIN_SAMPLE_SECONDS / max(time.perf_counter() - start, 1e-9)))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            run(state)
+        times.append((time.perf_counter() - start) / loops)
+    return {'median': statistics.median(times), 'min': min(times), 'repeat': repeat, 'loops': loops}
+
+
+def machine_key():
+    """Identify this machine's hardware: OS, architecture, CPU model and number of CPUs."""
+    cpu = platform.processor()
+    try:
+        with open('/proc/cpuinfo') as f:
+            cpu = next((line.split(':', 1)[1].strip() for line in f if line.startswith('model name')), cpu)
+    except OSError:
+        pass
+    return f"{platform.system()} {platform.machine()}, {cpu or 'unknown CPU'}, {os.cpu_count()} CPUs"
+
+
+def _load_machines(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f).get('machines', {})
+
+
+def load_baseline(path=BASELINE_FILE, machine=None):
+    """Return benchmark name -> baseline result of ``machine`` (this machine by default)."""
+    return _load_machines(path).get(machine or machine_key(), {}).get('benchmarks', {})
+
+
+def save_baseline(results, path=BASELINE_FILE, machine=None):
+    """Store ``results`` as the baseline of ``machine``, keeping the other machines' baselines."""
+    machines = _load_machines(path)
+    machines[machine or machine_key()] = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'benchmarks': results,
+    }
+    with open(path, 'w') as f:
+        json.dump({'machines': machines}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results, baseline, threshold=THRESHOLD, min_delta=MIN_DELTA):
+    """
+    Print every benchmark's best and median time next to its baseline.
+
+    Returns:
+    list: Names of the benchmarks whose best time is slower than the baseline's
+        by more than ``threshold`` and by at least ``min_delta`` seconds.
+    """
+    regressions = []
+    print(f"{'benchmark':<18} {'best':>10} {'median':>10} {'baseline':>10} {'change':>8}")
+    for name, result in results.items():
+        line = f"{name:<18} {result['min'] * 1000:>8.2f}ms {result['median'] * 1000:>8.2f}ms"
+        base = baseline.get(name)
+        if base:
+            change = result['min'] / base['min'] - 1
+            line += f" {base['min'] * 1000:>8.2f}ms {change:>+7.1%}"
+            if change > threshold and result['min'] - base['min'] >= min_delta:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument('--only', help="Comma-separated benchmark names to run.")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="Allowed slowdown as a fraction of the baseline (default: %(default)s).")
+    parser.add_argument('--min-delta', type=float, default=MIN_DELTA,
+                        help="Smallest slowdown in seconds that can count as a regression (default: %(default)s).")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Store the results as the new baseline instead of comparing.")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--check', action='store_true',
+                        help="Check the date and time parsers against their case tables instead of timing.")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        failures = check_parsers()
+        for failure in failures:
+            print(failure)
+        if failures:
+            print(f"{len(failures)} parser result(s) differ from the case tables")
+            return 1
+        print(f"All {len(DATE_CASES) + len(FORMAT_CASES) + len(TIME_CASES)} parser cases as expected")
+        return 0
+
+    suite = benchmarks()
+    names = args.only.split(',') if args.only else list(suite)
+    unknown = [name for name in names if name not in suite]
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    results = {}
+    for name in names:
+        results[name] = run_benchmark(*suite[name])
+
+    if args.save_baseline:
+        baseline = load_baseline(args.baseline)
+        baseline.update(results)
+        save_baseline(baseline, args.baseline)
+        compare(results, {})
+        print(f"Saved baseline of {machine_key()} to {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    regressions = compare(results, baseline, args.threshold, args.min_delta)
+    if not baseline:
+        print(f"No baseline for {machine_key()} in {args.baseline}; run with --save-baseline to record one.")
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
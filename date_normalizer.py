@@ -0,0 +1,127 @@
+"""
+Date Normalizer
+
+One parser for every date the scraper reads: "Effective ..." parts of listing
+titles, PDF file names and URLs, in English or Malay. It understands
+
+- day month year: "2nd January 2026", "16-Sept-2023", "15Mac2025", "1 Mac 24"
+- month day year: "January 2nd, 2026"
+- numeric dates:  "2024-01-01", "20240101", "12/01/2026", "12012026"
+
+Months may be full English or Malay names or any prefix of at least three
+letters ("Sep", "Sept", "Ogos", "Dis", "Julai"). Numeric dates are read as
+year-month-day when they start with the year, otherwise as day-month-year.
+
+``parse_date`` is memoized, so repeated titles and URLs cost a dictionary
+lookup, and ``normalize_dates`` parses a whole column by parsing each distinct
+value once.
+"""
+
+import re
+from datetime import date
+from functools import lru_cache
+from urllib.parse import unquote
+
+import pandas as pd
+
+MONTH_NAMES = {
+    1: ('january', 'januari'),
+    2: ('february', 'februari'),
+    3: ('march', 'mac'),
+    4: ('april',),
+    5: ('may', 'mei'),
+    6: ('june', 'jun'),
+    7: ('july', 'julai'),
+    8: ('august', 'ogos'),
+    9: ('september',),
+    10: ('october', 'oktober'),
+    11: ('november',),
+    12: ('december', 'disember'),
+}
+
+_ORDINAL = r'(?:st|nd|rd|th)?'
+_SEP = r'[\s\-_.,/]*'
+# Each pattern yields named groups day, month (name or number) and year
+PATTERNS = [
+    re.compile(rf'(?<!\d)(?P<day>\d{{1,2}}){_ORDINAL}{_SEP}(?P<month>[a-z]{{3,}}){_SEP}(?P<year>\d{{4}}|\d{{2}})(?!\d)'),
+    re.compile(rf'(?<![a-z])(?P<month>[a-z]{{3,}}){_SEP}(?P<day>\d{{1,2}}){_ORDINAL}{_SEP}(?P<year>\d{{4}})(?!\d)'),
+    re.compile(r'(?<!\d)(?P<year>20\d{2})[\-_.]?(?P<month>\d{2})[\-_.]?(?P<day>\d{2})(?!\d)'),
+    re.compile(r'(?<!\d)(?P<day>\d{1,2})[\-_./](?P<month>\d{1,2})[\-_./](?P<year>\d{4})(?!\d)'),
+    re.compile(r'(?<!\d)(?P<day>\d{2})(?P<month>\d{2})(?P<year>20\d{2})(?!\d)'),
+]
+
+
+@lru_cache(maxsize=None)
+def month_number(word):
+    """Month number of an English or Malay month name or prefix, or None."""
+    word = word.lower()
+    if len(word) < 3:
+        return None
+    for number, names in MONTH_NAMES.items():
+        if any(name.startswith(word) for name in names):
+            return number
+    return None
+
+
+def _to_date(match):
+    month = match.group('month')
+    month = int(month) if month.isdigit() else month_number(month)
+    if month is None:
+        return None
+    year = int(match.group('year'))
+    if year < 100:
+        year += 2000
+    try:
+        return date(year, month, int(match.group('day')))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def parse_date(text):
+    """
+    Find the first date in ``text``.
+
+    Returns:
+    datetime.date: The date, or None if ``text`` has no recognisable date.
+    """
+    if not isinstance(text, str):
+        return None
+    text = text.lower()
+    for pattern in PATTERNS:
+        # candidates may overlap ("ets 12 dis 2025"), so resume one character after a miss
+        match = pattern.search(text)
+        while match:
+            found = _to_date(match)
+            if found is not None:
+                return found
+            match = pattern.search(text, match.start() + 1)
+    return None
+
+
+def file_name(url):
+    """File name of a PDF URL without its extension, with %20 and friends decoded."""
+    name = unquote(str(url).split('/')[-1])
+    return name.rsplit('.', 1)[0] if '.' in name else name
+
+
+def normalize_dates(values):
+    """
+    Parse a whole column of date texts, each distinct value once.
+
+    Args:
+    values (pd.Series or list): Titles, effective date texts or file names.
+
+    Returns:
+    pd.Series: datetime64 dates aligned with ``values``, NaT where no date was found.
+    """
+    values = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    codes, uniques = pd.factorize(values)
+    # one trailing NaT for the missing values, which factorize codes as -1
+    parsed = pd.to_datetime(pd.Series([parse_date(value) for value in uniques] + [None], dtype=object))
+    return pd.Series(parsed.to_numpy()[codes], index=values.index)
+
+
+def format_date(value):
+    """Format a date as "16 September 2023", the style of KTMB's listing titles."""
+    return f"{value.day} {value:%B %Y}"
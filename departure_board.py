@@ -0,0 +1,119 @@
+"""
+Departure Board
+
+Answers "what leaves station X next, in any direction and on any line".
+
+For one service day, every route file is merged into a single departure list
+per station, sorted by time, with the train number, line, direction and
+terminus of each departure. The lists are stored back to back in flat numpy
+arrays with an offset per station, so a query is a binary search inside the
+station's slice and its cost does not depend on the number of routes.
+
+Built from the long-format tables (see ``timetable_schema``).
+"""
+
+from datetime import date as date_type
+
+import numpy as np
+import pandas as pd
+
+from time_parsing import format_minutes
+from timetable_schema import NO_STOP
+
+SERVICE_DAYS = ['WEEKDAYS', 'WEEKENDS']
+
+
+def service_day_for(day=None):
+    """Return the service day ("WEEKDAYS" or "WEEKENDS") of a date. Defaults to today."""
+    day = day or date_type.today()
+    return 'WEEKENDS' if day.weekday() >= 5 else 'WEEKDAYS'
+
+
+def trip_termini(stop_times):
+    """
+    Return the last stopping station of every trip.
+
+    Returns:
+    DataFrame: route_key, service_id and terminus_id, one row per trip.
+    """
+    stops = stop_times[stop_times['departure'] != NO_STOP]
+    last = stops.sort_values('stop_sequence').groupby(['route_key', 'service_id'], observed=True).tail(1)
+    return last[['route_key', 'service_id', 'station_id']].rename(columns={'station_id': 'terminus_id'})
+
+
+class DepartureBoard:
+    """
+    Sorted departures per station for one service day.
+
+    Args:
+    stations (DataFrame): stations table (station_id, station).
+    stop_times (DataFrame): stop_times table.
+    service_day (str): "WEEKDAYS" or "WEEKENDS". Daily routes are always included.
+    """
+
+    def __init__(self, stations, stop_times, service_day):
+        self.service_day = service_day
+        self.station_names = stations.set_index('station_id')['station']
+        self.station_ids = {name: sid for sid, name in self.station_names.items()}
+
+        day_stops = stop_times[
+            stop_times['service_day'].isin([service_day, 'DAILY'])
+            & (stop_times['departure'] != NO_STOP)
+        ]
+
+        # A train does not depart from its terminus
+        termini = trip_termini(day_stops)
+        departures = day_stops.merge(termini, on=['route_key', 'service_id'], how='inner')
+        departures = departures[departures['station_id'] != departures['terminus_id']]
+        departures = departures.sort_values(['station_id', 'departure'], kind='stable')
+
+        self.station_of = departures['station_id'].to_numpy(dtype=np.int16)
+        self.minutes = departures['departure'].to_numpy(dtype=np.int16)
+        self.service_id = departures['service_id'].astype(str).to_numpy()
+        self.line = departures['line'].astype(str).to_numpy()
+        self.direction = departures['direction'].to_numpy(dtype=np.int8)
+        self.terminus_id = departures['terminus_id'].to_numpy(dtype=np.int16)
+
+        # offsets[s]:offsets[s + 1] is the slice of station s
+        n_stations = int(stations['station_id'].max()) + 1 if len(stations) else 0
+        self.offsets = np.searchsorted(self.station_of, np.arange(n_stations + 1))
+
+    def __len__(self):
+        return len(self.minutes)
+
+    def next_departures(self, station, after_minutes=0, limit=10):
+        """
+        Next departures from ``station`` at or after ``after_minutes``.
+
+        Args:
+        station (str): Station name.
+        after_minutes (int): Minutes since midnight.
+        limit (int): Maximum number of departures. None for the rest of the day.
+
+        Returns:
+        DataFrame: Service_ID, Line, Direction, Terminus, Departure_Time and
+            Departure_Minutes, sorted by departure time.
+        """
+        station_id = self.station_ids.get(station)
+        if station_id is None:
+            return pd.DataFrame(columns=['Service_ID', 'Line', 'Direction', 'Terminus',
+                                         'Departure_Time', 'Departure_Minutes'])
+
+        start, end = self.offsets[station_id], self.offsets[station_id + 1]
+        first = start + np.searchsorted(self.minutes[start:end], after_minutes, side='left')
+        last = end if limit is None else min(first + limit, end)
+        rows = slice(first, last)
+
+        return pd.DataFrame({
+            'Service_ID': self.service_id[rows],
+            'Line': self.line[rows],
+            'Direction': self.direction[rows],
+            'Terminus': self.station_names.reindex(self.terminus_id[rows]).to_numpy(),
+            'Departure_Time': [format_minutes(m) for m in self.minutes[rows]],
+            'Departure_Minutes': self.minutes[rows],
+        })
+
+
+def build_departure_boards(stations, stop_times):
+    """Build a DepartureBoard for every service day."""
+    return {day: DepartureBoard(stations, stop_times, day) for day in SERVICE_DAYS}
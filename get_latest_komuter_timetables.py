@@ -14,24 +14,33 @@ This approach helps avoid unnecessary downloads and ensures we always work with
 import requests
 from bs4 import BeautifulSoup
 import pandas as pd
-import camelot
+import argparse
 import tempfile
 import os
 import re
-import requests
-import pandas as pd
+import sys
+import time
 from datetime import datetime
 
-print("#" * 60 )
-print(f"Starting the script")
-print(f"Loading the functions and features")
+from timetable_manifest import load_manifest, save_manifest, outputs_exist, update_entry
+from pdf_downloader import make_session, download_pdfs
+from pdf_extractor import extract_tables
+from parquet_writer import write_parquet
+from time_parsing import parse_times
+from timetable_schema import STATIONS_FILE, STOP_TIMES_FILE, build_long_format, load_wide_tables
+from timetable_bundle import BUNDLE_FILE, write_bundle
+from run_metrics import RunReport
+from timetable_history import HISTORY_DIR, load_history, record_editions
+from date_normalizer import file_name, format_date, normalize_dates, parse_date
 
+EFFECTIVE_PATTERN = re.compile(r'Effective\s+(.+)', re.IGNORECASE)
 
-def get_ktmb_komuter_timetables():
+def get_ktmb_komuter_timetables(session=None, report=None):
     url = "https://www.ktmb.com.my/TrainTime.html"
+    start = time.perf_counter()
     try:
         headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers)
+        response = (session or requests).get(url, headers=headers)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -62,17 +71,13 @@ def get_ktmb_komuter_timetables():
             title_tag = link.find('b')
             title = title_tag.get_text(strip=True) if title_tag else ''
             
-            # Step 1: Try to get date from title
+            # Effective date text from the title, resolved with the URL after the loop
             effective_date = pd.NA
             if title:
-                match = re.search(r'Effective\s+(.+)', title, re.IGNORECASE)
+                match = EFFECTIVE_PATTERN.search(title)
                 if match:
                     effective_date = match.group(1).strip()
 
-            # Step 2: If not found, parse from PDF URL filename
-            if pd.isna(effective_date):
-                effective_date = extract_date_from_pdf_url(pdf_url)
-
             records.append({
                 'Title': title.upper() if title else pd.NA,
                 'PDF Links': pdf_url,
@@ -80,8 +85,22 @@ def get_ktmb_komuter_timetables():
                 'Effective': effective_date
             })
             count += 1
-        
-        return pd.DataFrame(records)[['Title', 'PDF Links', 'Schedule', 'Effective']]
+
+        listing = pd.DataFrame(records, columns=['Title', 'PDF Links', 'Schedule', 'Effective'], dtype=object)
+
+        # Resolve every date in one batch: the title's "Effective ..." text first, then the PDF file name
+        url_dates = normalize_dates(listing['PDF Links'].map(file_name))
+        effective_dates = normalize_dates(listing['Effective']).fillna(url_dates)
+        # Missing dates stay pd.NA, not NaT/NaN, in these text columns
+        url_text = url_dates.map(format_date, na_action='ignore').astype(object).where(url_dates.notna(), pd.NA)
+        listing['Effective'] = listing['Effective'].fillna(url_text)
+        listing['Effective_Date'] = (effective_dates.dt.strftime('%Y-%m-%d').astype(object)
+                                     .where(effective_dates.notna(), pd.NA))
+
+        if report is not None:
+            report.add('listing', url, seconds=round(time.perf_counter() - start, 4),
+                       bytes=len(response.content), rows=len(records))
+        return listing
     
     except Exception as e:
         print(f"Error: {e}")
@@ -91,57 +110,12 @@ def get_ktmb_komuter_timetables():
 def extract_date_from_pdf_url(pdf_url):
     """
     Extracts a human-readable date string from KTMB PDF URLs like:
-    - .../2023/Jadual-Komuter-Utara-16-Sept-2023.pdf → "16 Sept 2023"
-    - .../BCPS_Komuter Weekday mulai 25 Ogos 2025 1.pdf → "25 Ogos 2025"
+    - .../2023/Jadual-Komuter-Utara-16-Sept-2023.pdf → "16 September 2023"
+    - .../BCPS_Komuter Weekday mulai 25 Ogos 2025 1.pdf → "25 August 2025"
     Returns pd.NA if no date found.
     """
-    try:
-        # Get filename from URL
-        filename = pdf_url.split('/')[-1]
-        # Remove .pdf extension
-        base = filename.rsplit('.', 1)[0]
-
-        # Normalize: replace underscores, multiple spaces, etc.
-        clean = re.sub(r'[^a-zA-Z0-9\s\-]', ' ', base)
-        clean = re.sub(r'\s+', ' ', clean).strip()
-
-        # Month mappings (English + Malay)
-        month_map = {
-            'jan': 'January', 'feb': 'February', 'mar': 'March', 'apr': 'April',
-            'may': 'May', 'jun': 'June', 'jul': 'July', 'aug': 'August',
-            'sep': 'September', 'oct': 'October', 'nov': 'November', 'dec': 'December',
-            'mac': 'March', 'mei': 'May', 'jun': 'June', 'jul': 'July',
-            'ogos': 'August', 'sept': 'September', 'okt': 'October', 'dis': 'December'
-        }
-
-        # Pattern: day-month-year (with - or space)
-        # e.g., "16-Sept-2023", "25 Ogos 2025"
-        date_pattern = r'(\d{1,2})[\-\s]+([a-zA-Z]{3,})[\-\s]+(\d{4})'
-        match = re.search(date_pattern, clean, re.IGNORECASE)
-        if match:
-            day = match.group(1)
-            month_abbr = match.group(2).lower()
-            year = match.group(3)
-
-            # Normalize month to full English name
-            for key in month_map:
-                if month_abbr.startswith(key):
-                    month_full = month_map[key]
-                    return f"{day} {month_full} {year}"
-
-            # If no match in map, return as-is (e.g., "16 Sept 2023")
-            return f"{day} {match.group(2)} {year}"
-
-        # Alternative: Look for "mulai DD Month YYYY"
-        mulai_match = re.search(r'mulai\s+(\d{1,2})\s+([a-zA-Z]+)\s+(\d{4})', clean, re.IGNORECASE)
-        if mulai_match:
-            day, month, year = mulai_match.groups()
-            return f"{day} {month} {year}"
-
-        return pd.NA
-
-    except Exception:
-        return pd.NA
+    found = parse_date(file_name(pdf_url))
+    return format_date(found) if found else pd.NA
 
 def get_train_route(departure, destination):
     """
@@ -201,346 +175,599 @@ def extract_keywords(route):
     return keywords
 
 def extract_date_from_link(link):
-    print(f"Extracting date from link: {link}")
+    """
+    Parse the date in the file name of ``link``, e.g. "15Mac2025" or "20240101".
 
-    # Normalize the link: remove spaces and common separators
-    filename = link.split('/')[-1]  # Get only the file name
-    clean = re.sub(r'[^\w\-]', ' ', filename).replace('_', '-').lower()
+    Returns:
+    datetime: The date, or None if no date found.
+    """
+    found = parse_date(file_name(link))
+    return datetime(found.year, found.month, found.day) if found else None
 
-    # Date patterns to match
-    patterns = [
-        (r'(\d{1,2})-?(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec|mac|mei|jun|jul|ogos|sept|okt|nov|dis)[\-\s]?(\d{2,4})', "%d-%b-%Y"),  # 16-Sept-2023 / 15Mac2025
-        (r'(\d{1,2})\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec|mac|mei|jun|jul|ogos|sept|okt|nov|dis)\s+(\d{2,4})', "%d-%b-%Y"),  # 1 Mac 2024
-        (r'(\d{4})-?(\d{2})-?(\d{2})', "%Y-%m-%d"),  # 20240101 or 2024-01-01
-    ]
+def check_time_cells(df_name, df):
+    """
+    Report timetable cells that are neither blank nor a valid time.
 
-    for pattern, date_format in patterns:
-        match = re.search(pattern, clean, re.IGNORECASE)
-        if match:
-            try:
-                if 'b' in date_format.lower():  # Month name pattern
-                    day = match.group(1)
-                    month = match.group(2).lower().replace("mac", "mar").replace("mei", "may").replace("ogos", "aug").replace("sept", "sep").replace("okt", "oct").replace("dis", "dec")
-                    year = match.group(3)
-                    date_str = f"{day}-{month.title()}-{year}"
-                    return datetime.strptime(date_str, "%d-%b-%Y")
-                else:
-                    return datetime.strptime(match.group(0), date_format)
-            except Exception as e:
-                print(f"Error parsing date: {e}")
-                continue
-    return None
+    Returns:
+    int: Number of unparseable cells.
+    """
+    values = df.iloc[:, 1:].to_numpy(dtype=object)
+    _, valid = parse_times(values)
+    text = pd.Series(values.ravel(), dtype=object).fillna('').astype(str).str.strip()
+    blank = text.isin(['', '-']).to_numpy()
+    invalid = ~valid & ~blank
+    if invalid.any():
+        samples = sorted(set(str(v) for v in values.ravel()[invalid]))[:5]
+        print(f"Warning: {invalid.sum()} cells in {df_name} are not times, e.g. {samples}")
+    return int(invalid.sum())
+
+def clean_route_table(raw_df):
+    """
+    Turn a raw Klang Valley table into the route format.
 
-print(f"functions and features [Completed]")
+    The third row holds the train numbers; the first column becomes "STATION"
+    and columns without a header are dropped.
+    """
+    df = raw_df.copy()
+    new_columns = df.iloc[2]  # Third row has column names
+    df = df[3:]  # Remove first three rows
+    df.columns = new_columns  # Apply new headers
+    df = df.reset_index(drop=True)
+
+    # Change the first column name to "STATION"
+    df = df.rename(columns={df.columns[0]: "STATION"})
+
+    # drop column names that are empty or NaN
+    df = df.loc[:, df.columns.notnull()]
+    df = df.loc[:, df.columns != '']
+    df = df.loc[:, df.columns.str.strip() != '']
+    return df
+
+def clean_utara_table(raw_df):
+    """
+    Turn a raw UTARA table into upper-case, stripped text with the third row as header.
 
-print("#" * 60)
-print(f"Entering main code.. Please wait")
+    The first column keeps its "NOMBOR TREN" header, which is used to name the route.
 
+    Returns:
+    DataFrame: Cleaned table, or None if the table has fewer than three rows.
+    """
+    if len(raw_df) < 3:
+        return None
 
-# Run the function
-timetables_df = get_ktmb_komuter_timetables()
+    df = raw_df.copy()
+    new_columns = df.iloc[2]
+    df = df[3:]
+    df.columns = new_columns
+    df = df.reset_index(drop=True)
 
-# Create a new column Effective_Date save as date format so that we can get the latest timetable
-timetables_df['Effective_Date'] = (
-    timetables_df['Effective']
-    .str.replace(r'(\d+)(st|nd|rd|th)', r'\1', regex=True)
-    .apply(pd.to_datetime, errors='coerce')
-    .dt.strftime('%Y-%m-%d')
-)
+    # Clean and standardize
+    df = df.astype(str).apply(lambda x: x.str.strip())
+    df.columns = [col.upper() for col in df.columns]
 
-# remove rows with NaT in 'Effective'
-timetables_df = timetables_df.dropna(subset=['Effective_Date'])
+    # Convert first column to uppercase
+    first_col = df.columns[0]
+    df[first_col] = df[first_col].str.upper()
+    return df
 
-# Save in a 'timetables' folder in the current working directory
-DATA_DIR = os.path.join(os.getcwd(), "timetables")
-print(f"Saving the timetables in {DATA_DIR} folder...")
+def clean_klang_tables(name, tables, report):
+    """
+    Clean the raw tables of a Klang Valley PDF.
 
-output_path = os.path.join(DATA_DIR, f"timetables_info.parquet")
-timetables_df.to_parquet(output_path, index=False)
-print(f"[{datetime.now()}] Saved timetables_df to {output_path}")
+    Args:
+    name (str): Schedule key, e.g. "klang_weekdays".
+    tables (list): Raw tables, in page order.
+    report (run_metrics.RunReport): Gets a "clean" record per table.
 
+    Returns:
+    dict: route_key ("<name>_route_N") -> cleaned DataFrame, in page order.
+    """
+    cleaned = {}
+    for i, raw_df in enumerate(tables):
 
-print(f"Total {len(timetables_df)} timetables found.")
+        df_name = f"{name}_route_{i+1}"
+        print(f"Printing length of the DataFrame: {len(raw_df)}")
 
-print("#" * 60)
-print(f"Filtering the timetables for only Klang Valley routes....")
-# Filter only needed routes and schedules
-route_titles = [
-    'TG. MALIM - PELABUHAN KLANG',
-    'BATU CAVES - PULAU SEBANG'
-]
+        # Setting up dataframe to be saved in parquet
+        with report.measure('clean', df_name) as record:
+            df = clean_route_table(raw_df)
+            record['rows'] = len(df)
+            record['invalid_cells'] = check_time_cells(df_name, df)
 
-# Step 1: Create a mask for filtering
-mask = timetables_df['Title'].str.contains('|'.join(route_titles), case=False, na=False) & \
-    timetables_df['Schedule'].isin(['WEEKDAYS', 'WEEKENDS'])
+        print(f"Saving table as {df_name}...")
+        cleaned[df_name] = df
+    return cleaned
 
-# Step 2: Apply mask and sort by Effective (descending) to get latest entries
-filtered_timetables = timetables_df[mask].copy()
+def clean_utara_tables(tables, report):
+    """
+    Clean the raw tables of the UTARA PDF and name them by route.
 
-# Step 3: Ensure datetime format for proper sorting (if needed)
-# Convert 'Effective' column to datetime if it's not already
-filtered_timetables['Effective_Date'] = pd.to_datetime(filtered_timetables['Effective_Date'], errors='coerce')
+    Tables are named "utara_ipoh_N" or "utara_padangbesar_N" from the
+    destinations in their NOMBOR TREN column, or "utara_route_N" by position.
 
-# Step 4: Sort and drop duplicates to get latest per Title + Schedule
-latest_timetables = (
-    filtered_timetables
-    .sort_values(by='Effective_Date', ascending=False)
-    .drop_duplicates(subset=['Title', 'Schedule'])
-)
+    Args:
+    tables (list): Raw tables, in page order.
+    report (run_metrics.RunReport): Gets a "clean" record per table.
 
-# Step 5: Sort final output by Title and Schedule
-latest_timetables = latest_timetables.sort_values(by=['Title', 'Schedule', 'Effective_Date'], ascending=[True, True, False])
+    Returns:
+    dict: route_key -> cleaned DataFrame, in page order.
+    """
+    cleaned = {}
 
+    # --- NEW: Track numbering per route type ---
+    route_counters = {"ipoh": 0, "butterworth": 0, "padangbesar": 0}
 
-print(f"Total {len(latest_timetables)} timetables found after filtering. We only need 4")
-latest_timetables
+    for i, raw_df in enumerate(tables):
+        print(f"Processing table {i+1}, original length: {len(raw_df)}")
 
-'''
-## Load PDF into Local Database
+        # Use third row as header; the record is renamed once the route is known
+        with report.measure('clean', f"utara_table_{i+1}") as record:
+            df = clean_utara_table(raw_df)
+            if df is not None:
+                # Default name in case no match
+                df_name = f"utara_route_{i+1}"
 
-To proceed, ensure the following:
+                # Check for NOMBOR TREN
+                if 'NOMBOR TREN' not in df.columns:
+                    print(f"Warning: 'NOMBOR TREN' column not found in table {i+1}. Using default name.")
+                else:
+                    tren_values = df['NOMBOR TREN'].str.upper()
+
+                    if (tren_values.str.contains(r'\bIPOH\b', regex=True, na=False)).any():
+                        route_type = "ipoh"
+                        route_counters[route_type] += 1
+                        df_name = f"utara_{route_type}_{route_counters[route_type]}"
+                    elif (tren_values.str.contains(r'\bPADANG BESAR\b', regex=True, na=False)).any():
+                        route_type = "padangbesar"
+                        route_counters[route_type] += 1
+                        df_name = f"utara_{route_type}_{route_counters[route_type]}"
+                    else:
+                        print(f"No Ipoh or Padang Besar found in NOMBOR TREN for table {i+1}. Using route fallback.")
+                        df_name = f"utara_route_{i+1}"
+
+                # Change the first column name to "STATION"
+                df = df.rename(columns={df.columns[0]: "STATION"})
+                record['name'] = df_name
+                record['rows'] = len(df)
+                record['invalid_cells'] = check_time_cells(df_name, df)
+
+        if df is None:
+            print(f"Skipping table {i+1}: Not enough rows to extract header.")
+            continue
 
-1. A total of **4 files** are required.
-2. Each route must include:
-   - **Weekday schedule**
-   - **Weekend schedule**
-'''
+        print(f"Saving table as {df_name}...")
+        cleaned[df_name] = df
+    return cleaned
 
-print("#" * 60)
-print("Extracting the latest timetable for Batu Caves and Pelabuhan Klang...")
+def record_listed_editions(listed, history_dir, session, report):
+    """
+    Record the older editions still linked from the listing page in the history store.
 
-# Extract latest schedules for Batu Caves and Pelabuhan Klang
-latest_batu_caves_weekends = latest_timetables[
-    (latest_timetables['Title'].str.contains('BATU CAVES', case=False)) &
-    (latest_timetables['Schedule'] == 'WEEKENDS')
-].sort_values(by='Effective_Date', ascending=False).head(1)
+    The nightly run only extracts the latest PDF of each schedule, but the
+    listing often still links the editions it replaced (e.g. an interim
+    timetable). Each of those PDFs is downloaded once, extracted through the
+    raw table cache and recorded with its listing effective date. PDFs the
+    store already has an edition from are not downloaded again.
 
-latest_batu_caves_weekdays = latest_timetables[
-    (latest_timetables['Title'].str.contains('BATU CAVES', case=False)) &
-    (latest_timetables['Schedule'] == 'WEEKDAYS')
-].sort_values(by='Effective_Date', ascending=False).head(1)
+    Args:
+    listed (list): (schedule_key, listing row) of every older edition.
+    history_dir (str): Folder of the history store.
+    session (requests.Session): Shared session to ktmb.com.my.
+    report (run_metrics.RunReport): Gets the download, extract and clean records.
 
-latest_klang_weekends = latest_timetables[
-    (latest_timetables['Title'].str.contains('PELABUHAN KLANG', case=False)) &
-    (latest_timetables['Schedule'] == 'WEEKENDS')
-].sort_values(by='Effective_Date', ascending=False).head(1)
+    Returns:
+    list: The appended edition rows (dicts).
+    """
+    editions, _ = load_history(history_dir)
+    known = set(editions['pdf_url'].dropna())
+    jobs = {}
+    for schedule_key, row in listed:
+        if row['PDF Links'] in known:
+            continue
+        known.add(row['PDF Links'])
+        key = f"{schedule_key}_{pd.Timestamp(row['Effective_Date']):%Y%m%d}"
+        while key in jobs:
+            key += "_"
+        jobs[key] = (schedule_key, row)
+    if not jobs:
+        return []
+
+    print(f"Downloading {len(jobs)} older timetable PDFs still on the listing page...")
+    download_dir = tempfile.TemporaryDirectory()
+    try:
+        downloads = download_pdfs([(key, row['PDF Links']) for key, (_, row) in jobs.items()],
+                                  download_dir.name, {}, session=session, report=report)
+        downloads = {key: result for key, result in downloads.items() if result['status'] != 'failed'}
+        extracted = extract_tables({key: result['pdf_path'] for key, result in downloads.items()},
+                                   hashes={key: result['sha256'] for key, result in downloads.items()},
+                                   report=report)
+    finally:
+        download_dir.cleanup()
+
+    # Oldest first, in the order the editions came into force
+    new_editions = []
+    for key in sorted(extracted, key=lambda key: pd.Timestamp(jobs[key][1]['Effective_Date'])):
+        schedule_key, row = jobs[key]
+        if schedule_key == 'utara':
+            wide_tables = clean_utara_tables(extracted[key], report)
+        else:
+            wide_tables = clean_klang_tables(schedule_key, extracted[key], report)
+        if not wide_tables:
+            continue
+        stations, stop_times = build_long_format(wide_tables)
+        effective_date = pd.Timestamp(row['Effective_Date']).strftime('%Y-%m-%d')
+        source = update_entry({}, schedule_key, row['PDF Links'], effective_date, downloads[key], list(wide_tables))
+        new_editions += record_editions(history_dir, stations, stop_times, {schedule_key: source})
+    return new_editions
 
-latest_klang_weekdays = latest_timetables[
-    (latest_timetables['Title'].str.contains('PELABUHAN KLANG', case=False)) &
-    (latest_timetables['Schedule'] == 'WEEKDAYS')
-].sort_values(by='Effective_Date', ascending=False).head(1)
+def save_parquet(report, name, df, path):
+    """
+    ``write_parquet`` recorded as a "parquet" stage of ``report``.
 
-# List of schedule entries to process
-schedule_entries = [
-    ('batu_caves_weekends', latest_batu_caves_weekends),
-    ('batu_caves_weekdays', latest_batu_caves_weekdays),
-    ('klang_weekends', latest_klang_weekends),
-    ('klang_weekdays', latest_klang_weekdays),
-]
+    Returns:
+    bool: True if the file was written, False if it was already up to date.
+    """
+    with report.measure('parquet', name, rows=len(df)) as record:
+        record['written'] = write_parquet(df, path)
+        record['bytes'] = os.path.getsize(path)
+    return record['written']
 
-# Save in a 'timetables' folder in the current working directory
-DATA_DIR = os.path.join(os.getcwd(), "timetables")
-print(f"Saving the timetables in {DATA_DIR} folder...")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download the latest KTMB Komuter timetables.")
+    parser.add_argument(
+        '--reprocess', action='store_true',
+        help="Re-run cleaning and naming for every timetable, using cached raw tables where available."
+    )
+    args = parser.parse_args(argv)
 
-if not os.path.exists(DATA_DIR):
-    os.makedirs(DATA_DIR)
+    print("#" * 60 )
+    print(f"Starting the script")
+    print(f"Loading the functions and features")
+    print(f"functions and features [Completed]")
 
+    print("#" * 60)
+    print(f"Entering main code.. Please wait")
 
-# Initialize list to hold enriched DataFrames
-dfs_with_key = []
 
-for name, df in schedule_entries:
-    # Add a column to identify the schedule key
-    df_copy = df.copy()
-    df_copy['schedule_key'] = name
-    dfs_with_key.append(df_copy)
+    # Wall time, bytes, table/row counts and peak memory of every stage, saved as run_report.json
+    report = RunReport()
 
-# Concatenate all into one DataFrame
-schedule_df = pd.concat(dfs_with_key, ignore_index=True)
+    # One pooled keep-alive session to ktmb.com.my for the listing page and all PDFs
+    session = make_session()
 
-# Reorder columns for clarity (optional)
-schedule_df = schedule_df[['schedule_key', 'Title', 'PDF Links', 'Schedule', 'Effective', 'Effective_Date']]
+    # Run the function
+    timetables_df = get_ktmb_komuter_timetables(session, report)
+    if timetables_df.empty:
+        print("No timetables found on the KTMB listing page, nothing to update.")
+        session.close()
+        return 1
 
-# Now you have a clean, unified DataFrame
-schedule_df
+    # remove rows without an Effective_Date (resolved by the listing stage)
+    timetables_df = timetables_df.dropna(subset=['Effective_Date'])
 
-# Dictionary to store resulting DataFrames
-timetable_data = {}
+    # Save in a 'timetables' folder in the current working directory
+    DATA_DIR = os.path.join(os.getcwd(), "timetables")
+    print(f"Saving the timetables in {DATA_DIR} folder...")
 
-with tempfile.TemporaryDirectory() as temp_dir:
-    for name, entry in schedule_entries:
-        if entry.empty:
-            print(f"No data found for {name}")
-            continue
+    if not os.path.exists(DATA_DIR):
+        os.makedirs(DATA_DIR)
 
-        # Get title and clean it for filename
-        title_str = entry['Title'].iloc[0].replace(' ', '_')
-        pdf_path = os.path.join(temp_dir, f"{title_str}.pdf")
+    output_path = os.path.join(DATA_DIR, f"timetables_info.parquet")
+    if save_parquet(report, 'timetables_info', timetables_df, output_path):
+        print(f"[{datetime.now()}] Saved timetables_df to {output_path}")
+    else:
+        print(f"[{datetime.now()}] timetables_df unchanged, keeping {output_path}")
 
-        # Download the PDF
-        pdf_url = entry['PDF Links'].iloc[0]
-        response = requests.get(pdf_url)
-        with open(pdf_path, 'wb') as f:
-            f.write(response.content)
+    # Load the PDF manifest (URL -> ETag/Last-Modified/SHA-256/effective date)
+    manifest = load_manifest(DATA_DIR)
+    print(f"Loaded manifest with {len(manifest)} entries.")
 
-        # Read tables from PDF
-        print(f"Reading {name} PDF: {pdf_path}")
-        # tables = camelot.read_pdf(pdf_path, pages='1-end')
-        tables = camelot.read_pdf(pdf_path, pages='1-end', backend='pdfium')
-        print(f"Extracted {len(tables)} tables from {pdf_path}")
 
-        # Save each table as a DataFrame in the dictionary
-        for i, table in enumerate(tables):
+    print(f"Total {len(timetables_df)} timetables found.")
 
-            df_name = f"{name}_route_{i+1}"
-            # Setting up dataframe to be saved in parquet
-            df = table.df.copy()
-            print(f"Printing length of the DataFrame: {len(df)}")
+    print("#" * 60)
+    print(f"Filtering the timetables for only Klang Valley routes....")
+    # Filter only needed routes and schedules
+    route_titles = [
+        'TG. MALIM - PELABUHAN KLANG',
+        'BATU CAVES - PULAU SEBANG'
+    ]
 
+    # Step 1: Create a mask for filtering
+    mask = timetables_df['Title'].str.contains('|'.join(route_titles), case=False, na=False) & \
+        timetables_df['Schedule'].isin(['WEEKDAYS', 'WEEKENDS'])
 
-            new_columns = df.iloc[2]  # Third row has column names
-            df = df[3:]  # Remove first three rows
-            df.columns = new_columns  # Apply new headers
-            df = df.reset_index(drop=True)
+    # Step 2: Apply mask and sort by Effective (descending) to get latest entries
+    filtered_timetables = timetables_df[mask].copy()
 
-            # Change the first column name to "STATION"
-            df = df.rename(columns={df.columns[0]: "STATION"})
+    # Step 3: Ensure datetime format for proper sorting (if needed)
+    # Convert 'Effective' column to datetime if it's not already
+    filtered_timetables['Effective_Date'] = pd.to_datetime(filtered_timetables['Effective_Date'], errors='coerce')
 
-            # drop column names that are empty or NaN            
-            df = df.loc[:, df.columns.notnull()]
-            df = df.loc[:, df.columns != '']
-            df = df.loc[:, df.columns.str.strip() != '']
+    # Step 4: Sort and drop duplicates to get latest per Title + Schedule
+    latest_timetables = (
+        filtered_timetables
+        .sort_values(by='Effective_Date', ascending=False)
+        .drop_duplicates(subset=['Title', 'Schedule'])
+    )
 
-            print(f"Saving table as {df_name}...")
-            timetable_data[df_name] = df
+    # Step 5: Sort final output by Title and Schedule
+    latest_timetables = latest_timetables.sort_values(by=['Title', 'Schedule', 'Effective_Date'], ascending=[True, True, False])
 
-# Save all tables as Parquet
-for df_name, df in timetable_data.items():
 
-    output_path = os.path.join(DATA_DIR, f"{df_name}.parquet")
-    df.to_parquet(output_path, index=False)
-    print(f"[{datetime.now()}] Saved {df_name} to {output_path}")
+    print(f"Total {len(latest_timetables)} timetables found after filtering. We only need 4")
 
+    '''
+    ## Load PDF into Local Database
 
-# Assign back to global variables
-globals().update(timetable_data)
-print("Klang Valley timetables extracted successfully.")
+    To proceed, ensure the following:
 
+    1. A total of **4 files** are required.
+    2. Each route must include:
+       - **Weekday schedule**
+       - **Weekend schedule**
+    '''
 
+    print("#" * 60)
+    print("Extracting the latest timetable for Batu Caves and Pelabuhan Klang...")
 
+    # Extract latest schedules for Batu Caves and Pelabuhan Klang
+    latest_batu_caves_weekends = latest_timetables[
+        (latest_timetables['Title'].str.contains('BATU CAVES', case=False)) &
+        (latest_timetables['Schedule'] == 'WEEKENDS')
+    ].sort_values(by='Effective_Date', ascending=False).head(1)
 
-print("#" * 60)
-print("Extracting the latest timetable for UTARA...")
-print("#" * 60)
+    latest_batu_caves_weekdays = latest_timetables[
+        (latest_timetables['Title'].str.contains('BATU CAVES', case=False)) &
+        (latest_timetables['Schedule'] == 'WEEKDAYS')
+    ].sort_values(by='Effective_Date', ascending=False).head(1)
 
-# Step 1: Filter timetables containing "UTARA" as a whole word (case-insensitive)
-mask = timetables_df['Title'].str.contains(r'\bUTARA\b', case=False, regex=True)
-north_filtered_timetables = timetables_df[mask].copy()
+    latest_klang_weekends = latest_timetables[
+        (latest_timetables['Title'].str.contains('PELABUHAN KLANG', case=False)) &
+        (latest_timetables['Schedule'] == 'WEEKENDS')
+    ].sort_values(by='Effective_Date', ascending=False).head(1)
 
-print(f"Total {len(north_filtered_timetables)} timetables found for UTARA routes.")
+    latest_klang_weekdays = latest_timetables[
+        (latest_timetables['Title'].str.contains('PELABUHAN KLANG', case=False)) &
+        (latest_timetables['Schedule'] == 'WEEKDAYS')
+    ].sort_values(by='Effective_Date', ascending=False).head(1)
 
-# Step 2: Get the most recent one based on Effective date
-latest_utara = north_filtered_timetables.sort_values(by='Effective_Date', ascending=False).head(1)
+    # List of schedule entries to process
+    schedule_entries = [
+        ('batu_caves_weekends', latest_batu_caves_weekends),
+        ('batu_caves_weekdays', latest_batu_caves_weekdays),
+        ('klang_weekends', latest_klang_weekends),
+        ('klang_weekdays', latest_klang_weekdays),
+    ]
 
-if latest_utara.empty:
-    print("No valid timetable found for UTARA.")
-else:
-    # Prepare directory to save extracted data
+    # Save in a 'timetables' folder in the current working directory
     DATA_DIR = os.path.join(os.getcwd(), "timetables")
-    os.makedirs(DATA_DIR, exist_ok=True)
+    print(f"Saving the timetables in {DATA_DIR} folder...")
 
-    # Store resulting DataFrames
-    timetable_data = {}
+    if not os.path.exists(DATA_DIR):
+        os.makedirs(DATA_DIR)
 
-    # Download and extract PDF
-    title_str = latest_utara['Title'].iloc[0].replace(' ', '_')
-    pdf_url = latest_utara['PDF Links'].iloc[0]
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        pdf_path = os.path.join(temp_dir, f"{title_str}.pdf")
+    # Initialize list to hold enriched DataFrames
+    dfs_with_key = []
 
-        print(f"Downloading UTARA timetable PDF from: {pdf_url}")
-        response = requests.get(pdf_url)
-        with open(pdf_path, 'wb') as f:
-            f.write(response.content)
+    for name, df in schedule_entries:
+        # Add a column to identify the schedule key
+        df_copy = df.copy()
+        df_copy['schedule_key'] = name
+        dfs_with_key.append(df_copy)
 
-        print(f"Reading UTARA PDF: {pdf_path}")
-        # tables = camelot.read_pdf(pdf_path, pages='1-end')
-        tables = camelot.read_pdf(pdf_path, pages='1-end', backend='pdfium')
-        tables_size = len(tables)
+    # Concatenate all into one DataFrame
+    schedule_df = pd.concat(dfs_with_key, ignore_index=True)
 
-        print(f"Extracted {tables_size} tables from {pdf_path}")
+    # Reorder columns for clarity (optional)
+    schedule_df = schedule_df[['schedule_key', 'Title', 'PDF Links', 'Schedule', 'Effective', 'Effective_Date']]
 
-        # --- NEW: Track numbering per route type ---
-        route_counters = {"ipoh": 0, "butterworth": 0, "padangbesar": 0}
+    print("#" * 60)
+    print("Selecting the latest timetable for UTARA...")
 
-        for i, table in enumerate(tables):
-            df = table.df.copy()
-            print(f"Processing table {i+1}, original length: {len(df)}")
+    # Filter timetables containing "UTARA" as a whole word (case-insensitive)
+    mask = timetables_df['Title'].str.contains(r'\bUTARA\b', case=False, regex=True)
+    north_filtered_timetables = timetables_df[mask].copy()
 
-            # Use third row as header
-            if len(df) < 3:
-                print(f"Skipping table {i+1}: Not enough rows to extract header.")
-                continue
+    print(f"Total {len(north_filtered_timetables)} timetables found for UTARA routes.")
 
-            new_columns = df.iloc[2]
-            df = df[3:]
-            df.columns = new_columns
-            df = df.reset_index(drop=True)
+    # Get the most recent one based on Effective date
+    latest_utara = north_filtered_timetables.sort_values(by='Effective_Date', ascending=False).head(1)
 
-            # Clean and standardize
-            df = df.astype(str).apply(lambda x: x.str.strip())
-            df.columns = [col.upper() for col in df.columns]
+    print("#" * 60)
+    print("Downloading the selected timetable PDFs...")
 
-            # Default name in case no match
-            df_name = f"utara_route_{i+1}"
+    # Download stage: every selected PDF is fetched concurrently over the shared session
+    download_jobs = [
+        (name, entry['PDF Links'].iloc[0])
+        for name, entry in schedule_entries + [('utara', latest_utara)]
+        if not entry.empty
+    ]
+    download_dir = tempfile.TemporaryDirectory()
+    # --reprocess downloads unconditionally so every PDF can be looked up in the raw table cache
+    downloads = download_pdfs(download_jobs, download_dir.name, {} if args.reprocess else manifest,
+                              session=session, report=report)
+    print(f"Downloaded {len(downloads)} PDFs.")
+
+    # Only new or changed PDFs (or PDFs whose parquet files are missing) are extracted
+    pdfs_to_extract = {}
+    for name, result in downloads.items():
+        if result['status'] == 'failed':
+            continue
+        if not args.reprocess and result['status'] != 'downloaded' and outputs_exist(manifest.get(name), DATA_DIR):
+            print(f"{name} PDF {result['status'].replace('_', ' ')}, skipping extraction.")
+            continue
+        pdfs_to_extract[name] = result['pdf_path']
 
-            # Check for NOMBOR TREN
-            if 'NOMBOR TREN' not in df.columns:
-                print(f"Warning: 'NOMBOR TREN' column not found in table {i+1}. Using default name.")
-            else:
-                tren_values = df['NOMBOR TREN'].str.upper()
-
-                if (tren_values.str.contains(r'\bIPOH\b', regex=True, na=False)).any():
-                    route_type = "ipoh"
-                    route_counters[route_type] += 1
-                    df_name = f"utara_{route_type}_{route_counters[route_type]}"
-                elif (tren_values.str.contains(r'\bPADANG BESAR\b', regex=True, na=False)).any():
-                    route_type = "padangbesar"
-                    route_counters[route_type] += 1
-                    df_name = f"utara_{route_type}_{route_counters[route_type]}"
-                else:
-                    print(f"No Ipoh or Padang Besar found in NOMBOR TREN for table {i+1}. Using route fallback.")
-                    df_name = f"utara_route_{i+1}"                
+    print("#" * 60)
+    print(f"Extracting tables from {len(pdfs_to_extract)} PDFs...")
 
+    # Extraction stage: raw tables come from the cache (keyed by PDF SHA-256) or from
+    # the text-layer extractor (camelot as fallback) running over a process pool, split by PDF and page range
+    extracted_tables = extract_tables(
+        pdfs_to_extract,
+        hashes={name: downloads[name]['sha256'] for name in pdfs_to_extract},
+        report=report
+    )
 
-            # Convert first column to uppercase
-            first_col = df.columns[0]
-            df[first_col] = df[first_col].str.upper()
+    # Dictionary to store resulting DataFrames
+    timetable_data = {}
 
-            # Change the first column name to "STATION"
-            df = df.rename(columns={df.columns[0]: "STATION"})
+    for name, entry in schedule_entries:
+        if entry.empty:
+            print(f"No data found for {name}")
+            continue
 
+        result = downloads[name]
+        if result['status'] == 'failed':
+            print(f"Skipping {name}: download failed ({result['error']})")
+            continue
 
-            print(f"Saving table as {df_name}...")
-            timetable_data[df_name] = df
+        pdf_url = entry['PDF Links'].iloc[0]
+        effective_date = entry['Effective_Date'].iloc[0].strftime('%Y-%m-%d')
 
-    # Save all tables as Parquet files
+        if name not in pdfs_to_extract:
+            update_entry(manifest, name, pdf_url, effective_date, result)
+            continue
+
+        if name not in extracted_tables:
+            print(f"Skipping {name}: table extraction failed")
+            continue
+
+        # Tables read from the PDF, in page order
+        tables = extracted_tables[name]
+        print(f"Cleaning {len(tables)} tables from {name} PDF")
+
+        # Save each table as a DataFrame in the dictionary
+        cleaned = clean_klang_tables(name, tables, report)
+        timetable_data.update(cleaned)
+
+        update_entry(manifest, name, pdf_url, effective_date, result, list(cleaned))
+
+    # Save all tables as Parquet
     for df_name, df in timetable_data.items():
+
         output_path = os.path.join(DATA_DIR, f"{df_name}.parquet")
-        df.to_parquet(output_path, index=False)
-        print(f"[{datetime.now()}] Saved {df_name} to {output_path}")
-
-    # Assign back to global variables for easy access
-    globals().update(timetable_data)
-
-print("UTARA timetables extracted successfully.")
-
-print("#" * 60)
-print("Listing all parquet files in the timetables folder...")
-data_dir = os.path.join(os.getcwd(), "timetables") 
-parquet_files = [f for f in os.listdir(data_dir) if f.endswith('.parquet')]
-print(f"Total {len(parquet_files)} parquet files found.")
-for i, f in enumerate(parquet_files, start=1):
-    print(f" {i} - {f}")
-print("Script completed.")
+        if save_parquet(report, df_name, df, output_path):
+            print(f"[{datetime.now()}] Saved {df_name} to {output_path}")
+        else:
+            print(f"[{datetime.now()}] {df_name} unchanged, keeping {output_path}")
+
+    print("Klang Valley timetables extracted successfully.")
+
+
+
+
+    print("#" * 60)
+    print("Extracting the latest timetable for UTARA...")
+    print("#" * 60)
+
+    if latest_utara.empty:
+        print("No valid timetable found for UTARA.")
+    elif downloads['utara']['status'] == 'failed':
+        print(f"Skipping UTARA: download failed ({downloads['utara']['error']})")
+    elif 'utara' in pdfs_to_extract and 'utara' not in extracted_tables:
+        print("Skipping UTARA: table extraction failed")
+    else:
+        pdf_url = latest_utara['PDF Links'].iloc[0]
+        effective_date = latest_utara['Effective_Date'].iloc[0]
+        result = downloads['utara']
+
+        # Tables read from the PDF, in page order (none if the PDF is unchanged)
+        skipped = 'utara' not in pdfs_to_extract
+        tables = [] if skipped else extracted_tables['utara']
+        tables_size = len(tables)
+
+        print(f"Cleaning {tables_size} tables from UTARA PDF")
+
+        # Store resulting DataFrames
+        timetable_data = clean_utara_tables(tables, report)
+
+        # Keep the previous outputs when extraction was skipped
+        update_entry(manifest, 'utara', pdf_url, effective_date, result,
+                     None if skipped else list(timetable_data))
+
+        # Save all tables as Parquet files
+        for df_name, df in timetable_data.items():
+            output_path = os.path.join(DATA_DIR, f"{df_name}.parquet")
+            if save_parquet(report, df_name, df, output_path):
+                print(f"[{datetime.now()}] Saved {df_name} to {output_path}")
+            else:
+                print(f"[{datetime.now()}] {df_name} unchanged, keeping {output_path}")
+
+    print("UTARA timetables extracted successfully.")
+
+    # Remove the downloaded PDFs
+    download_dir.cleanup()
+
+    if save_manifest(manifest, DATA_DIR):
+        print(f"[{datetime.now()}] Saved PDF manifest to {DATA_DIR}")
+    else:
+        print("PDF manifest unchanged.")
+
+    print("#" * 60)
+    print("Building the long-format timetable (stations / stop_times)...")
+    with report.measure('long_format') as record:
+        stations, stop_times = build_long_format(load_wide_tables(DATA_DIR))
+        record['rows'] = len(stop_times)
+    for long_file, df in [(STATIONS_FILE, stations), (STOP_TIMES_FILE, stop_times)]:
+        output_path = os.path.join(DATA_DIR, long_file)
+        if save_parquet(report, long_file, df, output_path):
+            print(f"[{datetime.now()}] Saved {long_file} ({len(df)} rows) to {output_path}")
+        else:
+            print(f"[{datetime.now()}] {long_file} unchanged, keeping {output_path}")
+
+    bundle_path = os.path.join(DATA_DIR, BUNDLE_FILE)
+    with report.measure('bundle', BUNDLE_FILE, rows=len(stop_times)) as record:
+        record['written'] = write_bundle(stations, stop_times, bundle_path, manifest)
+        record['bytes'] = os.path.getsize(bundle_path)
+    if record['written']:
+        print(f"[{datetime.now()}] Saved timetable bundle to {bundle_path}")
+    else:
+        print(f"[{datetime.now()}] Timetable bundle unchanged, keeping {bundle_path}")
+
+    print("#" * 60)
+    print("Recording new timetable editions in the history store...")
+    history_dir = os.path.join(DATA_DIR, HISTORY_DIR)
+    with report.measure('history', HISTORY_DIR) as record:
+        new_editions = record_editions(history_dir, stations, stop_times, manifest)
+        record['rows'] = len(new_editions)
+
+    # Older editions the listing still links, so the store also covers the
+    # timetables that were replaced before the scraper first saw them
+    selected_urls = set(schedule_df['PDF Links']) | set(latest_utara['PDF Links'])
+    listed = []
+    for _, row in filtered_timetables.dropna(subset=['Effective_Date']).iterrows():
+        line = 'batu_caves' if 'BATU CAVES' in row['Title'].upper() else 'klang'
+        listed.append((f"{line}_{row['Schedule'].lower()}", row))
+    listed += [('utara', row) for _, row in north_filtered_timetables.iterrows()]
+    listed = [(key, row) for key, row in listed if row['PDF Links'] not in selected_urls]
+    with report.measure('history', 'listed editions') as record:
+        listed_editions = record_listed_editions(listed, history_dir, session, report)
+        record['rows'] = len(listed_editions)
+    new_editions += listed_editions
+    session.close()
+
+    for edition in new_editions:
+        print(f"New edition of {edition['route_key']} effective {edition['effective_date']}")
+    if not new_editions:
+        print("No timetable changes, history unchanged.")
+
+    print("#" * 60)
+    print("Listing all parquet files in the timetables folder...")
+    data_dir = os.path.join(os.getcwd(), "timetables") 
+    parquet_files = [f for f in os.listdir(data_dir) if f.endswith('.parquet')]
+    print(f"Total {len(parquet_files)} parquet files found.")
+    for i, f in enumerate(parquet_files, start=1):
+        print(f" {i} - {f}")
+
+    print("#" * 60)
+    report.print_summary()
+    print(f"Saved run report to {report.write(DATA_DIR)}")
+    print("Script completed.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Journey Planner
+
+Earliest-arrival journeys across every line, including changes of train at
+shared stations such as KL Sentral or Kuala Lumpur.
+
+Uses the Connection Scan Algorithm: every trip is cut into elementary
+connections (one stop to the next), and the connections of a service day are
+kept in flat arrays sorted by departure time. A query binary-searches the first
+connection at or after the start time and scans forward once, stopping as soon
+as no later connection can improve the arrival at the destination.
+
+Changing trains requires a minimum transfer time at the station, which is
+``MIN_TRANSFER_MINUTES`` unless ``TRANSFER_MINUTES`` sets one for the station.
+
+Built from the long-format tables (see ``timetable_schema``).
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+from departure_board import SERVICE_DAYS
+from time_parsing import format_minutes
+from timetable_schema import NO_STOP, load_long_format
+
+MIN_TRANSFER_MINUTES = int(os.environ.get("KTMB_MIN_TRANSFER_MINUTES", 3))
+# Interchanges where changing trains means changing platforms or levels
+TRANSFER_MINUTES = {
+    'KL SENTRAL': 5,
+    'KUALA LUMPUR': 4,
+}
+LEG_COLUMNS = ['Service_ID', 'Line', 'Departure_Station', 'Departure_Time',
+               'Arrival_Station', 'Arrival_Time', 'Departure_Minutes', 'Arrival_Minutes']
+UNREACHED = np.iinfo(np.int32).max
+
+
+def build_connections(stop_times):
+    """
+    Cut every trip into connections between consecutive stops.
+
+    Returns:
+    DataFrame: service_day, trip, line, service_id, from_id, to_id, departure,
+        arrival and stop_sequence, one row per connection. ``trip`` numbers the trips.
+    """
+    stops = stop_times.loc[
+        stop_times['departure'] != NO_STOP,
+        ['route_key', 'line', 'service_day', 'service_id', 'stop_sequence', 'station_id', 'arrival', 'departure']
+    ]
+    stops = stops.sort_values(['route_key', 'service_id', 'stop_sequence'], kind='stable')
+    trip = stops.groupby(['route_key', 'service_id'], observed=True, sort=False).ngroup().to_numpy()
+
+    # A connection joins a stop to the next stop of the same trip
+    same_trip = trip[:-1] == trip[1:]
+    origin = np.flatnonzero(same_trip)
+    destination = origin + 1
+
+    station = stops['station_id'].to_numpy()
+    return pd.DataFrame({
+        'service_day': stops['service_day'].to_numpy()[origin],
+        'trip': trip[origin],
+        'line': stops['line'].astype(str).to_numpy()[origin],
+        'service_id': stops['service_id'].astype(str).to_numpy()[origin],
+        'from_id': station[origin],
+        'to_id': station[destination],
+        'departure': stops['departure'].to_numpy()[origin].astype(np.int32),
+        'arrival': stops['arrival'].to_numpy()[destination].astype(np.int32),
+        'stop_sequence': stops['stop_sequence'].to_numpy()[origin],
+    })
+
+
+class _Timetable:
+    """Connections of one service day, sorted by departure, as plain lists for the scan loop."""
+
+    def __init__(self, connections):
+        connections = connections.sort_values(['departure', 'arrival', 'stop_sequence'], kind='stable')
+        self.departure_array = connections['departure'].to_numpy()
+        self.departure = self.departure_array.tolist()
+        self.arrival = connections['arrival'].tolist()
+        self.from_id = connections['from_id'].tolist()
+        self.to_id = connections['to_id'].tolist()
+        self.trip = connections['trip'].tolist()
+        self.line = connections['line'].tolist()
+        self.service_id = connections['service_id'].tolist()
+
+
+class JourneyPlanner:
+    """
+    Earliest-arrival journey planner over all lines.
+
+    Args:
+    stations (DataFrame): stations table (station_id, station).
+    stop_times (DataFrame): stop_times table.
+    transfer_minutes (dict): station name -> minimum transfer time. Defaults to TRANSFER_MINUTES.
+    """
+
+    def __init__(self, stations, stop_times, transfer_minutes=None):
+        self.station_names = stations.set_index('station_id')['station']
+        self.station_ids = {name: sid for sid, name in self.station_names.items()}
+        self.n_stations = int(stations['station_id'].max()) + 1 if len(stations) else 0
+
+        transfer_minutes = TRANSFER_MINUTES if transfer_minutes is None else transfer_minutes
+        self.transfer = [MIN_TRANSFER_MINUTES] * self.n_stations
+        for name, minutes in transfer_minutes.items():
+            if name in self.station_ids:
+                self.transfer[self.station_ids[name]] = minutes
+
+        connections = build_connections(stop_times)
+        self.n_trips = int(connections['trip'].max()) + 1 if len(connections) else 0
+        self.timetables = {
+            day: _Timetable(connections[connections['service_day'].isin([day, 'DAILY'])])
+            for day in SERVICE_DAYS
+        }
+
+    def _scan(self, timetable, origin_id, destination_id, after_minutes):
+        """
+        Run the connection scan.
+
+        Returns:
+        tuple: (reached_by, leg_start) per station: the connection that arrives
+            there first and the connection where that train was boarded.
+        """
+        arrival = [UNREACHED] * self.n_stations
+        ready = [UNREACHED] * self.n_stations  # earliest time a new train can be boarded
+        legs = [0] * self.n_stations
+        reached_by = [-1] * self.n_stations
+        leg_start = [-1] * self.n_stations
+        boarded_at = [-1] * self.n_trips
+        trip_legs = [0] * self.n_trips
+        arrival[origin_id] = ready[origin_id] = after_minutes
+
+        departure, arrival_at = timetable.departure, timetable.arrival
+        from_id, to_id, trip = timetable.from_id, timetable.to_id, timetable.trip
+        transfer = self.transfer
+
+        first = int(np.searchsorted(timetable.departure_array, after_minutes, side='left'))
+        for c in range(first, len(departure)):
+            if departure[c] >= arrival[destination_id]:
+                break
+            t, f = trip[c], from_id[c]
+            # Board here if possible, moving the boarding point of a trip
+            # already boarded to a later station when that takes no more trains
+            if ready[f] <= departure[c] and (boarded_at[t] < 0 or legs[f] + 1 <= trip_legs[t]):
+                boarded_at[t] = c
+                trip_legs[t] = legs[f] + 1
+            elif boarded_at[t] < 0:
+                continue
+            s, a = to_id[c], arrival_at[c]
+            if a < arrival[s] or (a == arrival[s] and trip_legs[t] < legs[s]):
+                arrival[s] = a
+                ready[s] = a + transfer[s]
+                legs[s] = trip_legs[t]
+                reached_by[s] = c
+                leg_start[s] = boarded_at[t]
+        return reached_by, leg_start
+
+    def earliest_arrival(self, service_day, origin, destination, after_minutes=0):
+        """
+        Fastest journey from ``origin`` to ``destination`` leaving at or after ``after_minutes``.
+
+        Args:
+        service_day (str): "WEEKDAYS" or "WEEKENDS".
+        origin (str): Departure station name.
+        destination (str): Arrival station name.
+        after_minutes (int): Minutes since midnight.
+
+        Returns:
+        DataFrame: LEG_COLUMNS, one row per train taken. Empty if the destination
+            cannot be reached that day.
+        """
+        origin_id = self.station_ids.get(origin)
+        destination_id = self.station_ids.get(destination)
+        timetable = self.timetables.get(service_day)
+        if origin_id is None or destination_id is None or timetable is None or origin_id == destination_id:
+            return pd.DataFrame(columns=LEG_COLUMNS)
+
+        reached_by, leg_start = self._scan(timetable, origin_id, destination_id, after_minutes)
+
+        # Walk back from the destination, one train at a time
+        legs = []
+        station = destination_id
+        while station != origin_id:
+            alight = reached_by[station]
+            if alight < 0:
+                return pd.DataFrame(columns=LEG_COLUMNS)
+            board = leg_start[station]
+            legs.append((board, alight))
+            station = timetable.from_id[board]
+        legs.reverse()
+
+        return pd.DataFrame([{
+            'Service_ID': timetable.service_id[board],
+            'Line': timetable.line[board],
+            'Departure_Station': self.station_names[timetable.from_id[board]],
+            'Departure_Time': format_minutes(timetable.departure[board]),
+            'Arrival_Station': self.station_names[timetable.to_id[alight]],
+            'Arrival_Time': format_minutes(timetable.arrival[alight]),
+            'Departure_Minutes': timetable.departure[board],
+            'Arrival_Minutes': timetable.arrival[alight],
+        } for board, alight in legs], columns=LEG_COLUMNS)
+
+
+def build_journey_planner(data_dir):
+    """Build a JourneyPlanner from the long-format files in ``data_dir``."""
+    stations, stop_times = load_long_format(data_dir)
+    return JourneyPlanner(stations, stop_times)
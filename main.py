@@ -1,18 +1,78 @@
+import asyncio
 import flet as ft
-import pandas as pd
-import requests
-import io
+from collections import namedtuple
 from datetime import datetime
 
+from departure_board import service_day_for
+from schedule_index import ScheduleIndex
+from time_parsing import format_minutes
+from timetable_bundle import BUNDLE_FILE, read_bundle
+from timetable_client import GITHUB_BASE_URL, TimetableClient
+
 # Configuration
-GITHUB_BASE_URL = "https://raw.githubusercontent.com/ubaiiii/KTMB_Train_Schedule/main/timetables/"
-ROUTES = [
-    "batu_caves-pulau_sebang", "pulau_sebang-batu_caves",
-    "tg_malim-pel_klang", "pel_klang-tg_malim",
-    "padang_besar-ipoh", "ipoh-padang_besar",
-    "butterworth-padang_besar", "padang_besar-butterworth"
-    # Add all 12 routes from your repo here
-]
+# Display name -> line in stop_times.parquet
+ROUTES = {
+    "Batu Caves - Pulau Sebang": "batu_caves",
+    "Tanjung Malim - Pelabuhan Klang": "klang",
+    "Padang Besar - Butterworth": "utara_padangbesar",
+    "Ipoh - Butterworth": "utara_ipoh",
+}
+
+
+PAGE_SIZE = 20  # cards added to the result list at a time
+CARD_HEIGHT = 150
+
+# One search result, built once from the query output
+TrainRow = namedtuple("TrainRow", ["service_id", "departure", "arrival"])
+
+
+def train_rows(trains):
+    return [TrainRow(service_id, format_minutes(departure), format_minutes(arrival))
+            for service_id, departure, arrival in zip(trains.service_id, trains.departure.tolist(), trains.arrival.tolist())]
+
+
+class TrainCard:
+    # Result card whose text controls are updated in place for each new row
+    def __init__(self):
+        self.train = ft.Text(weight="bold", size=16)
+        self.departure = ft.Text(size=20, weight="bold")
+        self.arrival = ft.Text(size=20, weight="bold")
+        self.control = ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    self.train,
+                    ft.Container(
+                        content=ft.Text("On Time", size=12, color="white"),
+                        bgcolor="green500",
+                        padding=5,
+                        border_radius=5
+                    )
+                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+                ft.Divider(),
+                ft.Row([
+                    ft.Column([ft.Text("Origin"), self.departure]),
+                    ft.Icon(ft.icons.ARROW_FORWARD_ROUNDED),
+                    ft.Column([ft.Text("Arrival"), self.arrival], horizontal_alignment="end"),
+                ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN)
+            ]),
+            padding=15,
+            border_radius=15,
+            bgcolor="blueGrey50",
+            border=ft.border.all(1, "blueGrey100")
+        )
+
+    def show(self, row):
+        self.train.value = f"Train {row.service_id}"
+        self.departure.value = row.departure
+        self.arrival.value = row.arrival
+        return self.control
+
+
+def build_index(data):
+    # Every route is in the bundle, so one download serves all lines
+    stations, stop_times, _ = read_bundle(data)
+    return ScheduleIndex(stations, stop_times)
+
 
 class KomuterApp:
     def __init__(self, page: ft.Page):
@@ -20,12 +80,19 @@ class KomuterApp:
         self.page.title = "KTMB Komuter Tracker"
         self.page.theme_mode = ft.ThemeMode.LIGHT
         self.page.padding = 20
-        self.df = None
-        
+        self.index = None
+        # Running handler tasks; a new route or search cancels the stale one
+        self.route_task = None
+        self.search_task = None
+
+        # Cached on the device and revalidated with ETags; start the download now
+        self.client = TimetableClient(GITHUB_BASE_URL)
+        self.client.prefetch(BUNDLE_FILE, build_index)
+
         # UI Elements
         self.route_dd = ft.Dropdown(
             label="Select Route",
-            options=[ft.dropdown.Option(r.replace("_", " ").title()) for r in ROUTES],
+            options=[ft.dropdown.Option(r) for r in ROUTES],
             on_change=self.load_route_data,
             border_radius=10
         )
@@ -37,7 +104,15 @@ class KomuterApp:
             visible=False,
             style=ft.ButtonStyle(shape=ft.RoundedRectangleBorder(radius=10))
         )
-        self.results_list = ft.ListView(expand=True, spacing=10, padding=10)
+        # Fixed item_extent lets Flutter lay out only the visible cards
+        self.results_list = ft.ListView(
+            expand=True, spacing=10, padding=10, item_extent=CARD_HEIGHT,
+            on_scroll=self.load_more, on_scroll_interval=100
+        )
+        self.empty_text = ft.Text("No more trains today 😴", text_align="center")
+        self.cards = []  # TrainCard pool, reused between searches
+        self.rows = []
+        self.shown = 0
         self.loader = ft.ProgressBar(visible=False, color="blue")
 
         # Layout
@@ -54,78 +129,99 @@ class KomuterApp:
             self.results_list
         )
 
-    def load_route_data(self, e):
+    def replace_task(self, previous):
+        # Cancel the previous run of a handler and return the current task
+        current = asyncio.current_task()
+        if previous is not None and previous is not current and not previous.done():
+            previous.cancel()
+        return current
+
+    def show_progress(self, fraction):
+        # Called from the download thread: hand the update to the event loop
+        value = fraction if fraction < 1 else None  # indeterminate while decoding
+        self.loop.call_soon_threadsafe(self.set_progress, value)
+
+    def set_progress(self, value):
+        if self.loader.visible:
+            self.loader.value = value
+            self.page.update()
+
+    async def load_route_data(self, e):
+        self.route_task = task = self.replace_task(self.route_task)
+        self.loop = asyncio.get_running_loop()
+        line = ROUTES[self.route_dd.value]
+        self.loader.value = None
         self.loader.visible = True
         self.page.update()
-        
-        # Construct filename from selection
-        route_file = self.route_dd.value.lower().replace(" ", "_") + ".parquet"
-        url = f"{GITHUB_BASE_URL}{route_file}"
-        
+
         try:
-            response = requests.get(url)
-            self.df = pd.read_parquet(io.BytesIO(response.content))
-            
+            # All lines share one index; usually already prefetched. Download
+            # and decoding run in a worker thread so the UI stays responsive
+            self.index = await asyncio.to_thread(self.client.load, BUNDLE_FILE, build_index, self.show_progress)
+
             # Update Station Dropdowns
-            stations = self.df.columns[1:].tolist() # Assuming first col is Train ID/Time
+            stations = self.index.line_stations(line)
             self.origin_dd.options = [ft.dropdown.Option(s) for s in stations]
             self.dest_dd.options = [ft.dropdown.Option(s) for s in stations]
-            
+            self.origin_dd.value = None
+            self.dest_dd.value = None
+
             self.origin_dd.visible = True
             self.dest_dd.visible = True
             self.search_btn.visible = True
+        except asyncio.CancelledError:
+            # Superseded by a newer route selection, which owns the loader now
+            raise
         except Exception as ex:
             self.page.snack_bar = ft.SnackBar(ft.Text(f"Error loading data: {ex}"))
             self.page.snack_bar.open = True
-        
-        self.loader.visible = False
-        self.page.update()
 
-    def search_trains(self, e):
-        if not self.origin_dd.value or not self.dest_dd.value:
+        if self.route_task is task:
+            self.loader.visible = False
+            self.page.update()
+
+    async def search_trains(self, e):
+        if not self.origin_dd.value or not self.dest_dd.value or self.index is None:
+            return
+        self.search_task = task = self.replace_task(self.search_task)
+
+        now = datetime.now()
+
+        # All remaining trains of the selected line today
+        future_trains = await asyncio.to_thread(
+            self.index.next_trains,
+            service_day_for(now.date()), self.origin_dd.value, self.dest_dd.value,
+            after_minutes=now.hour * 60 + now.minute, limit=None, lines=[ROUTES[self.route_dd.value]]
+        )
+        if self.search_task is not task:
             return
 
+        # Row models are built once per search; cards are filled in as the list scrolls
+        self.show_results(train_rows(future_trains))
+        self.page.update()
+
+    def show_results(self, rows):
+        self.rows = rows
+        self.shown = 0
         self.results_list.controls.clear()
-        now = datetime.now().strftime("%H:%M")
-        
-        # Filter Logic (Based on your Streamlit logic)
-        # 1. Get schedule for Origin and Destination
-        relevant_data = self.df[['No. Tren', self.origin_dd.value, self.dest_dd.value]]
-        
-        # 2. Filter for future trains
-        future_trains = relevant_data[relevant_data[self.origin_dd.value] > now].sort_values(by=self.origin_dd.value)
-
-        if future_trains.empty:
-            self.results_list.controls.append(ft.Text("No more trains today 😴", text_align="center"))
+        if not rows:
+            self.results_list.controls.append(self.empty_text)
         else:
-            for _, row in future_trains.head(10).iterrows():
-                self.results_list.controls.append(
-                    ft.Container(
-                        content=ft.Column([
-                            ft.Row([
-                                ft.Text(f"Train {row['No. Tren']}", weight="bold", size=16),
-                                ft.Container(
-                                    content=ft.Text("On Time", size=12, color="white"),
-                                    bgcolor="green500",
-                                    padding=5,
-                                    border_radius=5
-                                )
-                            ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
-                            ft.Divider(),
-                            ft.Row([
-                                ft.Column([ft.Text("Origin"), ft.Text(row[self.origin_dd.value], size=20, weight="bold")]),
-                                ft.Icon(ft.icons.ARROW_FORWARD_ROUNDED),
-                                ft.Column([ft.Text("Arrival"), ft.Text(row[self.dest_dd.value], size=20, weight="bold")], horizontal_alignment="end"),
-                            ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN)
-                        ]),
-                        padding=15,
-                        border_radius=15,
-                        bgcolor="blueGrey50",
-                        border=ft.border.all(1, "blueGrey100")
-                    )
-                )
-        
-        self.page.update()
+            self.show_more()
+
+    def show_more(self):
+        # Append the next page of rows, reusing cards from earlier searches
+        batch = self.rows[self.shown:self.shown + PAGE_SIZE]
+        while len(self.cards) < self.shown + len(batch):
+            self.cards.append(TrainCard())
+        for i, row in enumerate(batch, start=self.shown):
+            self.results_list.controls.append(self.cards[i].show(row))
+        self.shown += len(batch)
+
+    def load_more(self, e):
+        if self.shown < len(self.rows) and e.pixels >= e.max_scroll_extent - 2 * CARD_HEIGHT:
+            self.show_more()
+            self.page.update()
 
 # ft.app(target=KomuterApp)
 ft.run(KomuterApp)
\ No newline at end of file
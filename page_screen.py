@@ -0,0 +1,78 @@
+"""
+Timetable Page Screening
+
+A cheap pass over the text and objects of every PDF page that decides which
+pages hold a timetable, so text-only cover pages, legends and notes never reach
+the table extractor.
+
+A page is a timetable page if its text has the "NOMBOR TREN" header or at
+least ``MIN_TIME_CELLS`` time values such as "5:27" or "05.30". Pages without
+any text layer are kept, since there is nothing to judge them by.
+
+The scraper names tables by their position in the PDF (``route_N``), so a
+skipped page must not hold any table the extractor would have returned. Tables
+are found from ruling lines, so a page is only skipped when it has no drawn
+content at all (paths, images, forms): any page that could hold a ruled table is
+extracted, whatever its text says, and skipping never changes the table count.
+
+Text is read with pypdfium2, which camelot already installs for its "pdfium"
+backend; a page takes a few milliseconds.
+"""
+
+import re
+
+TIMETABLE_MARKERS = ('NOMBOR TREN',)
+TIME_PATTERN = re.compile(r'(?<![\d:.])(?:[01]?\d|2[0-4])[:.][0-5]\d(?![\d:.])')
+MIN_TIME_CELLS = 20
+# Part of the raw table cache key (see table_cache.extractor_settings). Bump it
+# whenever a change here can change which pages are extracted.
+SCREEN_VERSION = 1
+
+
+def page_contents(pdf_path):
+    """
+    Read every page of ``pdf_path``, in page order.
+
+    Returns:
+    list: (text, has_drawing) per page, where has_drawing is True if the page
+        has any object other than text.
+    """
+    import pypdfium2 as pdfium
+    import pypdfium2.raw as pdfium_c
+
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        contents = []
+        for page in pdf:
+            textpage = page.get_textpage()
+            text = textpage.get_text_range()
+            textpage.close()
+            has_drawing = any(obj.type != pdfium_c.FPDF_PAGEOBJ_TEXT for obj in page.get_objects())
+            contents.append((text, has_drawing))
+            page.close()
+        return contents
+    finally:
+        pdf.close()
+
+
+def is_timetable_page(text):
+    """Check if page text looks like a timetable (or has no text to judge by)."""
+    if not text.strip():
+        return True
+    upper = text.upper()
+    if any(marker in upper for marker in TIMETABLE_MARKERS):
+        return True
+    return len(TIME_PATTERN.findall(text)) >= MIN_TIME_CELLS
+
+
+def timetable_pages(pdf_path):
+    """
+    Classify the pages of ``pdf_path``.
+
+    Returns:
+    tuple: (number of pages, page numbers that hold a timetable)
+    """
+    contents = page_contents(pdf_path)
+    keep = [number for number, (text, has_drawing) in enumerate(contents, start=1)
+            if has_drawing or is_timetable_page(text)]
+    return len(contents), keep
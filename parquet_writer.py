@@ -0,0 +1,114 @@
+"""
+Parquet Writer
+
+Writes the timetable parquet files so that the daily-scrape workflow only
+commits real timetable changes:
+
+- a file is skipped when its Arrow schema (column names and types) and its
+  canonical content (cell values) are the same as the new table, so a
+  dtype-only change such as int64 -> int16 or str -> category is still written
+- changed files are written to a temp file in the same folder and renamed over
+  the old file, so a crash never leaves a half-written parquet file
+- writer settings are fixed, so the same table always gives the same bytes
+  for a given pyarrow version
+"""
+
+import json
+import os
+import stat
+import tempfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+WRITE_OPTIONS = {
+    'compression': 'snappy',
+    'version': '2.6',
+    'data_page_version': '1.0',
+    'use_dictionary': True,
+    'write_statistics': True,
+}
+
+
+def canonical_frame(df):
+    """Column names as strings, a clean RangeIndex and missing values as None."""
+    df = df.reset_index(drop=True)
+    df.columns = [str(col) for col in df.columns]
+    return df.astype(object).where(df.notna(), None)
+
+
+def same_content(df, other):
+    """Check if two DataFrames hold the same column names and cell values."""
+    a, b = canonical_frame(df), canonical_frame(other)
+    if list(a.columns) != list(b.columns) or a.shape != b.shape:
+        return False
+    return bool((a.to_numpy() == b.to_numpy()).all())
+
+
+def _logical_type(arrow_type):
+    """Arrow type with large_string read as string: pandas 3 and pandas 2 pick different ones for str columns."""
+    if pa.types.is_large_string(arrow_type):
+        return pa.string()
+    if pa.types.is_dictionary(arrow_type):
+        return pa.dictionary(arrow_type.index_type, _logical_type(arrow_type.value_type), arrow_type.ordered)
+    return arrow_type
+
+
+def same_schema(schema, other):
+    """Check if two Arrow schemas have the same column names and types, ignoring metadata."""
+    if schema.names != other.names:
+        return False
+    return all(_logical_type(a.type) == _logical_type(b.type) for a, b in zip(schema, other))
+
+
+def to_table(df):
+    """Convert ``df`` to an Arrow table without the library versions in its metadata."""
+    table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    if b'pandas' in metadata:
+        pandas_metadata = table.schema.pandas_metadata
+        pandas_metadata.pop('creator', None)
+        pandas_metadata.pop('pandas_version', None)
+        metadata[b'pandas'] = json.dumps(pandas_metadata).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def atomic_write(path, write):
+    """
+    Write ``path`` through ``write(f)`` on a temp file in the same folder, then
+    rename it over ``path``. Keeps the permissions of an existing file.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    mode = stat.S_IMODE(os.stat(path).st_mode) if os.path.exists(path) else 0o644
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=folder)
+    try:
+        os.chmod(temp_path, mode)
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def write_parquet(df, path):
+    """
+    Write ``df`` to ``path`` if its content changed.
+
+    Returns:
+    bool: True if the file was written, False if it was already up to date.
+    """
+    table = to_table(df)
+    if os.path.exists(path):
+        try:
+            if same_schema(table.schema, pq.read_schema(path)) and same_content(df, pd.read_parquet(path)):
+                return False
+        except Exception as e:
+            print(f"Could not compare with existing {path}: {e}")
+
+    atomic_write(path, lambda f: pq.write_table(table, f, **WRITE_OPTIONS))
+    return True
@@ -0,0 +1,216 @@
+"""
+PDF Download Helpers
+
+Downloads timetable PDFs from ktmb.com.my using conditional requests so that
+unchanged PDFs are neither downloaded nor re-extracted.
+
+All PDFs selected by the scraper are fetched concurrently over a single
+``requests.Session`` so the connections to ktmb.com.my are pooled and kept
+alive. The number of parallel downloads is set by ``DOWNLOAD_WORKERS`` (or the
+``KTMB_DOWNLOAD_WORKERS`` environment variable).
+
+PDFs are streamed to a ``.part`` file in chunks and hashed as the bytes arrive,
+so memory use does not depend on the PDF size. An interrupted download is
+resumed with a Range request, and downloads larger than ``MAX_PDF_BYTES``
+(``KTMB_MAX_PDF_MB``) are aborted. PDFs are requested without content
+encoding, since Content-Length and Range offsets count the bytes on the wire.
+"""
+
+import hashlib
+import os
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from timetable_manifest import conditional_headers
+
+HEADERS = {'User-Agent': 'Mozilla/5.0'}
+# requests asks for gzip/deflate by default, which would make the body written to disk
+# differ in size from Content-Length and break the Range offsets of a resumed download
+PDF_HEADERS = dict(HEADERS, **{'Accept-Encoding': 'identity'})
+DOWNLOAD_WORKERS = int(os.environ.get('KTMB_DOWNLOAD_WORKERS', 4))
+MAX_PDF_BYTES = int(float(os.environ.get('KTMB_MAX_PDF_MB', 50)) * 1024 * 1024)
+DOWNLOAD_ATTEMPTS = 3
+CHUNK_SIZE = 64 * 1024
+TIMEOUT = (10, 60)
+
+
+def make_session(pool_size=DOWNLOAD_WORKERS):
+    """
+    Create a keep-alive session with a connection pool large enough for
+    ``pool_size`` concurrent downloads and retries on transient errors.
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+
+    retries = Retry(total=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(pool_size, 1), max_retries=retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _stream_to_file(response, part_path, digest, max_bytes, append):
+    """Write the response body to ``part_path`` chunk by chunk, updating ``digest``."""
+    size = os.path.getsize(part_path) if append else 0
+    with open(part_path, 'ab' if append else 'wb') as f:
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_bytes:
+                raise ValueError(f"PDF larger than {max_bytes} bytes")
+            f.write(chunk)
+            digest.update(chunk)
+    return size
+
+
+def fetch_pdf(pdf_url, pdf_path, entry=None, session=None, max_bytes=MAX_PDF_BYTES):
+    """
+    Download ``pdf_url`` to ``pdf_path`` unless the manifest says it is unchanged.
+
+    The body is streamed to ``pdf_path + '.part'`` and renamed once complete.
+    If the connection drops, the download is resumed from the partial file.
+
+    Args:
+    pdf_url (str): URL of the PDF.
+    pdf_path (str): Local path to write the PDF to.
+    entry (dict): Manifest entry of the schedule key, if any.
+    session (requests.Session): Session to use. A plain request is made if None.
+    max_bytes (int): Abort the download if the PDF is larger than this.
+
+    Returns:
+    dict: status, etag, last_modified, sha256 and size. Status is one of
+        - "not_modified": server answered 304, nothing was written
+        - "unchanged": PDF downloaded but has the same SHA-256 as before
+        - "downloaded": new or changed PDF written to ``pdf_path``
+    """
+    http = session or requests
+    part_path = pdf_path + '.part'
+    validator = None
+
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        headers = dict(PDF_HEADERS)
+        resume_from = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if resume_from and validator:
+            headers['Range'] = f"bytes={resume_from}-"
+            headers['If-Range'] = validator
+        else:
+            resume_from = 0
+            headers.update(conditional_headers(entry, pdf_url))
+
+        try:
+            with http.get(pdf_url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+                if response.status_code == 304:
+                    return {
+                        'status': 'not_modified',
+                        'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified'),
+                        'sha256': entry.get('SHA256') if entry else None,
+                        'size': None,
+                    }
+                response.raise_for_status()
+
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                # A server that encodes the body anyway gives no usable length or offsets
+                encoded = response.headers.get('Content-Encoding', 'identity').lower() != 'identity'
+                validator = None if encoded else etag or last_modified
+
+                # 206 continues the partial file, anything else starts over
+                append = resume_from > 0 and response.status_code == 206
+                expected = None if encoded else response.headers.get('Content-Length')
+                expected = int(expected) + (resume_from if append else 0) if expected else None
+                if expected and expected > max_bytes:
+                    raise ValueError(f"PDF is {expected} bytes, larger than {max_bytes} bytes")
+
+                digest = hashlib.sha256()
+                if append:
+                    with open(part_path, 'rb') as f:
+                        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                            digest.update(chunk)
+
+                size = _stream_to_file(response, part_path, digest, max_bytes, append)
+                if expected and size != expected:
+                    raise requests.exceptions.ConnectionError(
+                        f"Incomplete download: got {size} of {expected} bytes"
+                    )
+        except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout) as e:
+            if attempt == DOWNLOAD_ATTEMPTS:
+                raise
+            print(f"Download of {pdf_url} interrupted ({e}), resuming (attempt {attempt + 1})...")
+            continue
+        except Exception:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+        os.replace(part_path, pdf_path)
+        sha256 = digest.hexdigest()
+
+        status = 'downloaded'
+        if entry and entry.get('SHA256') == sha256:
+            status = 'unchanged'
+
+        return {
+            'status': status,
+            'etag': etag,
+            'last_modified': last_modified,
+            'sha256': sha256,
+            'size': size,
+        }
+
+
+def download_pdfs(jobs, download_dir, manifest, max_workers=DOWNLOAD_WORKERS, session=None, report=None):
+    """
+    Download all selected PDFs concurrently.
+
+    Args:
+    jobs (list): (schedule_key, pdf_url) tuples.
+    download_dir (str): Directory to write the PDFs to.
+    manifest (dict): Manifest loaded with ``timetable_manifest.load_manifest``.
+    max_workers (int): Maximum number of parallel downloads.
+    session (requests.Session): Shared session. One is created if None.
+    report (run_metrics.RunReport): Gets one "download" record per PDF, if given.
+
+    Returns:
+    dict: schedule_key -> result of ``fetch_pdf`` plus "pdf_path" and
+        "seconds". Failed downloads have status "failed" and an "error" message.
+    """
+    own_session = session is None
+    if own_session:
+        session = make_session(max_workers)
+
+    def _download(schedule_key, pdf_url):
+        pdf_path = os.path.join(download_dir, f"{schedule_key}.pdf")
+        print(f"Downloading {schedule_key} PDF from: {pdf_url}")
+        start = time.perf_counter()
+        result = fetch_pdf(pdf_url, pdf_path, manifest.get(schedule_key), session)
+        result['pdf_path'] = pdf_path
+        result['seconds'] = round(time.perf_counter() - start, 4)
+        return result
+
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            futures = {executor.submit(_download, *job): job[0] for job in jobs}
+            for future in as_completed(futures):
+                schedule_key = futures[future]
+                try:
+                    results[schedule_key] = future.result()
+                    print(f"{schedule_key} PDF {results[schedule_key]['status'].replace('_', ' ')}")
+                except Exception as e:
+                    print(f"Error downloading {schedule_key} PDF: {e}")
+                    results[schedule_key] = {'status': 'failed', 'error': str(e)}
+                if report is not None:
+                    result = results[schedule_key]
+                    report.add('download', schedule_key, status=result['status'], seconds=result.get('seconds'),
+                               bytes=result.get('size'), error=result.get('error'))
+    finally:
+        if own_session:
+            session.close()
+
+    return results
@@ -0,0 +1,271 @@
+"""
+PDF Table Extraction
+
+Runs ``camelot.read_pdf`` over a process pool. Each PDF is split into page
+ranges and every range is a separate task, so several PDFs and several pages
+of the same PDF are read on different cores at the same time.
+
+The tables are put back together in PDF order and page order, which is the
+order ``camelot.read_pdf(pdf_path, pages='1-end')`` returns them in, so the
+``route_N`` / ``utara_ipoh_N`` naming in the scraper is unchanged.
+
+The number of worker processes is set by ``EXTRACT_WORKERS`` (or the
+``KTMB_EXTRACT_WORKERS`` environment variable) and the number of pages per task
+by ``PAGES_PER_TASK`` (``KTMB_PAGES_PER_TASK``).
+
+Set ``EXTRACTOR`` (or ``KTMB_EXTRACTOR``) to "text" to read pages from the PDF
+text layer first (see ``pdf_text_extractor``), which rebuilds the ruled grid
+without rendering the page. Only pages that fail its confidence checks are then
+passed to ``camelot.read_pdf``. It matches camelot's lattice flavor on the
+benchmark PDFs but has not been compared on real KTMB PDFs yet, so camelot
+stays the default until ``benchmarks/fixtures.py --real`` shows the same
+tables on them.
+
+Before that, every page is screened (see ``page_screen``) and text-only pages
+without a timetable are skipped. Pages that could hold a ruled table are always
+extracted, so the tables and their ``route_N`` names are the same as without
+screening, and a PDF where no page is kept is extracted in full. Set
+``SCREEN_PAGES`` (or ``KTMB_SCREEN_PAGES=0``) to extract every page.
+
+Raw tables are cached by PDF SHA-256 and extractor settings (see
+``table_cache``), so a PDF is only extracted the first time it is seen.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from page_screen import SCREEN_VERSION, timetable_pages
+from pdf_text_extractor import EXTRACTOR_VERSION, read_text_tables
+from run_metrics import peak_rss_mb
+from table_cache import extractor_settings, file_sha256, load_tables, save_tables
+
+EXTRACT_WORKERS = int(os.environ.get('KTMB_EXTRACT_WORKERS', os.cpu_count() or 1))
+PAGES_PER_TASK = int(os.environ.get('KTMB_PAGES_PER_TASK', 1))
+CAMELOT_OPTIONS = {'backend': 'pdfium'}
+EXTRACTOR = os.environ.get('KTMB_EXTRACTOR', 'camelot')  # "camelot" or "text" (camelot as fallback)
+SCREEN_PAGES = os.environ.get('KTMB_SCREEN_PAGES', '1') != '0'
+
+
+def count_pages(pdf_path):
+    """Return the number of pages in ``pdf_path``."""
+    from pypdf import PdfReader
+    return len(PdfReader(pdf_path).pages)
+
+
+def _page_string(numbers):
+    if len(numbers) > 1 and numbers == list(range(numbers[0], numbers[-1] + 1)):
+        return f"{numbers[0]}-{numbers[-1]}"
+    return ",".join(str(n) for n in numbers)
+
+
+def read_camelot_tables(pdf_path, pages='1-end'):
+    """
+    Read the tables of ``pages`` in ``pdf_path`` with camelot.
+
+    Returns:
+    list: Raw ``table.df`` DataFrames in page order.
+    """
+    import camelot
+    tables = camelot.read_pdf(pdf_path, pages=pages, **CAMELOT_OPTIONS)
+    return [table.df for table in tables]
+
+
+def _read_tables(pdf_path, pages, extractor):
+    """``read_tables`` plus the page numbers that had to be read by camelot."""
+    if extractor == 'camelot':
+        return read_camelot_tables(pdf_path, pages), [pages]
+
+    try:
+        text_pages = read_text_tables(pdf_path, pages)
+    except Exception as e:
+        print(f"Text-layer extraction of {pdf_path} failed ({e}), using camelot.")
+        return read_camelot_tables(pdf_path, pages), [pages]
+
+    tables, camelot_pages = [], []
+    for page, page_tables in text_pages:
+        if page_tables is None:
+            camelot_pages.append(page)
+            tables.extend(read_camelot_tables(pdf_path, str(page)))
+        else:
+            tables.extend(pd.DataFrame(rows) for rows in page_tables)
+    return tables, camelot_pages
+
+
+def read_tables(pdf_path, pages='1-end', extractor=EXTRACTOR):
+    """
+    Read the tables of ``pages`` in ``pdf_path``.
+
+    With the "text" extractor pages are read from the PDF text layer and only
+    the pages that fail its confidence checks are read by camelot.
+
+    Returns:
+    list: Raw ``table.df`` DataFrames in page order.
+    """
+    return _read_tables(pdf_path, pages, extractor)[0]
+
+
+def _timed_read_tables(pdf_path, pages, extractor=EXTRACTOR):
+    """``_read_tables`` plus its wall time and the peak memory of the process that ran it."""
+    start = time.perf_counter()
+    tables, camelot_pages = _read_tables(pdf_path, pages, extractor)
+    return tables, camelot_pages, round(time.perf_counter() - start, 4), peak_rss_mb()
+
+
+def _record_read(report, key, pages, tables, camelot_pages, seconds, worker_rss):
+    if report is not None:
+        report.add('extract', key, pages=pages, camelot_pages=camelot_pages, seconds=seconds,
+                   tables=len(tables), rows=sum(len(df) for df in tables), peak_rss_mb=worker_rss)
+
+
+def _screen(pdf_path, screen):
+    """Return (number of pages, pages to extract) of ``pdf_path``."""
+    if screen:
+        try:
+            n_pages, keep = timetable_pages(pdf_path)
+            if keep:
+                return n_pages, keep
+            print(f"Screening found no timetable page in {pdf_path}, extracting all of them.")
+        except Exception as e:
+            print(f"Could not screen the pages of {pdf_path} ({e}), extracting all of them.")
+    n_pages = count_pages(pdf_path)
+    return n_pages, list(range(1, n_pages + 1))
+
+
+def _plan_tasks(pdf_paths, pages_per_task, screen=SCREEN_PAGES):
+    """
+    Split the PDFs into page tasks.
+
+    Returns:
+    tuple: (tasks, screening) where tasks are (key, position, pdf_path, pages,
+        page count) tuples and screening maps each key to its page count,
+        skipped pages and screening time.
+    """
+    tasks = []
+    screening = {}
+    for key, pdf_path in pdf_paths.items():
+        start = time.perf_counter()
+        try:
+            n_pages, keep = _screen(pdf_path, screen)
+        except Exception as e:
+            print(f"Could not count pages of {pdf_path} ({e}), reading it as one task.")
+            tasks.append((key, 0, pdf_path, '1-end', None))
+            continue
+        skipped = [n for n in range(1, n_pages + 1) if n not in keep]
+        screening[key] = {'pages': n_pages, 'skipped': skipped, 'seconds': round(time.perf_counter() - start, 4)}
+        if skipped:
+            print(f"{key}: skipping {len(skipped)} of {n_pages} pages without a timetable {skipped}")
+        step = max(pages_per_task, 1)
+        for position, i in enumerate(range(0, len(keep), step)):
+            chunk = keep[i:i + step]
+            tasks.append((key, position, pdf_path, _page_string(chunk), len(chunk)))
+    return tasks, screening
+
+
+def _report_screening(screening, report, seconds_per_page):
+    """Print and record the pages skipped by screening and the extraction time they would have cost."""
+    total = sum(info['pages'] for info in screening.values())
+    skipped = sum(len(info['skipped']) for info in screening.values())
+    if total:
+        saved = skipped * seconds_per_page if seconds_per_page is not None else None
+        saved_text = f", saving about {saved:.1f}s" if saved is not None else ""
+        print(f"Screening skipped {skipped} of {total} pages{saved_text}")
+    if report is not None:
+        for key, info in screening.items():
+            saved = len(info['skipped']) * seconds_per_page if seconds_per_page is not None else None
+            report.add('screen', key, seconds=info['seconds'], pages=info['pages'],
+                       skipped_pages=info['skipped'],
+                       saved_seconds=round(saved, 4) if saved is not None else None)
+
+
+def extract_tables(pdf_paths, max_workers=EXTRACT_WORKERS, pages_per_task=PAGES_PER_TASK,
+                   hashes=None, use_cache=True, report=None):
+    """
+    Extract the raw tables of several PDFs in parallel.
+
+    Args:
+    pdf_paths (dict): schedule_key -> local PDF path.
+    max_workers (int): Maximum number of worker processes. 1 runs in-process.
+    pages_per_task (int): Number of pages read by one task.
+    hashes (dict): schedule_key -> SHA-256 of the PDF, if already known.
+    use_cache (bool): Read and write the raw table cache.
+    report (run_metrics.RunReport): Gets an "extract" record per page task, listing
+        the pages read by camelot, a "screen" record per PDF with the skipped pages
+        and the estimated time saved, and a "table_cache" record per cache hit, if given.
+
+    Returns:
+    dict: schedule_key -> list of raw ``table.df`` DataFrames of the timetable
+        pages, in the same order as ``camelot.read_pdf`` returns them. PDFs that
+        failed to extract are left out.
+    """
+    results = {}
+    versions = {'text_extractor': EXTRACTOR_VERSION} if EXTRACTOR != 'camelot' else {}
+    if SCREEN_PAGES:
+        versions['page_screen'] = SCREEN_VERSION
+    settings = extractor_settings(CAMELOT_OPTIONS, pages='timetable pages' if SCREEN_PAGES else '1-end',
+                                  extractor=EXTRACTOR, versions=versions)
+    hashes = dict(hashes or {})
+
+    if use_cache:
+        pending = {}
+        for key, pdf_path in pdf_paths.items():
+            if not hashes.get(key):
+                hashes[key] = file_sha256(pdf_path)
+            cached = load_tables(hashes[key], settings)
+            if not cached:
+                pending[key] = pdf_path
+            else:
+                print(f"Loaded {len(cached)} cached tables for {key}")
+                results[key] = cached
+                if report is not None:
+                    report.add('table_cache', key, tables=len(cached), rows=sum(len(df) for df in cached))
+        pdf_paths = pending
+
+    tasks, screening = _plan_tasks(pdf_paths, pages_per_task, screen=SCREEN_PAGES)
+    print(f"Extracting {len(pdf_paths)} PDFs as {len(tasks)} page tasks with up to {max_workers} workers...")
+
+    chunks = {key: {} for key in pdf_paths}
+    failed = set()
+    extract_seconds, extracted_pages = 0.0, 0
+
+    if max_workers <= 1 or len(tasks) <= 1:
+        for key, position, pdf_path, pages, n_pages in tasks:
+            try:
+                tables, camelot_pages, seconds, worker_rss = _timed_read_tables(pdf_path, pages)
+                chunks[key][position] = tables
+                _record_read(report, key, pages, tables, camelot_pages, seconds, worker_rss)
+                if n_pages:
+                    extract_seconds, extracted_pages = extract_seconds + seconds, extracted_pages + n_pages
+            except Exception as e:
+                print(f"Error extracting pages {pages} of {key}: {e}")
+                failed.add(key)
+    else:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+            futures = {
+                executor.submit(_timed_read_tables, pdf_path, pages): (key, position, pages, n_pages)
+                for key, position, pdf_path, pages, n_pages in tasks
+            }
+            for future, (key, position, pages, n_pages) in futures.items():
+                try:
+                    tables, camelot_pages, seconds, worker_rss = future.result()
+                    chunks[key][position] = tables
+                    _record_read(report, key, pages, tables, camelot_pages, seconds, worker_rss)
+                    if n_pages:
+                        extract_seconds, extracted_pages = extract_seconds + seconds, extracted_pages + n_pages
+                except Exception as e:
+                    print(f"Error extracting pages {pages} of {key}: {e}")
+                    failed.add(key)
+
+    _report_screening(screening, report, extract_seconds / extracted_pages if extracted_pages else None)
+
+    for key, parts in chunks.items():
+        if key in failed:
+            continue
+        results[key] = [df for position in sorted(parts) for df in parts[position]]
+        print(f"Extracted {len(results[key])} tables from {key}")
+        # A PDF without tables is not cached, so it is read again on the next run
+        if use_cache and results[key]:
+            save_tables(hashes[key], settings, results[key])
+    return results
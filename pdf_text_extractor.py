@@ -0,0 +1,418 @@
+"""
+PDF Text-Layer Table Extraction
+
+KTMB timetable PDFs are generated documents: the station × train grid is drawn
+with vector ruling lines and every cell is real text. camelot's lattice flavor
+finds that grid by rendering each page to an image and running OpenCV over it.
+This module reads the same grid straight from the PDF instead:
+
+1. pdfminer lays out the page once, with camelot's layout parameters, giving
+   the positioned text lines and the ruling segments (lines, rectangles and
+   thin filled bars).
+2. Collinear segments are joined, short ones are dropped as camelot does, and
+   connected segments form a table. The x and y coordinates of the joints are
+   clustered into column and row boundaries.
+3. Each text line is placed in a cell exactly like ``camelot.read_pdf`` places
+   it (row by vertical midpoint, column by largest overlap, shifted left and up
+   out of spanning cells), so the DataFrames match ``table.df``.
+
+A page is only answered here when it passes a few confidence checks: it has
+upright text, no image or background fill over a table (camelot would see
+lines in those) and no two text lines competing for the same cell. Otherwise
+``read_text_tables`` reports the page as ``None`` and the caller hands it to
+camelot.
+"""
+
+import math
+
+from pdfminer.layout import (
+    LAParams, LTChar, LTContainer, LTCurve, LTImage, LTTextLineHorizontal, LTTextLineVertical,
+)
+
+# Same as camelot's get_page_layout, except that text boxes are not grouped
+# into a hierarchy (boxes_flow=None), which changes nothing at text line level
+LAPARAMS = LAParams(
+    line_overlap=0.5, char_margin=1.0, line_margin=0.5, word_margin=0.1,
+    boxes_flow=None, detect_vertical=True, all_texts=True,
+)
+LINE_SCALE = 15      # segments shorter than page size / LINE_SCALE are not table lines
+LINE_TOL = 2         # row/column boundaries closer than this are merged
+JOINT_TOL = 2        # how close a segment end must be to a boundary
+MAX_THICKNESS = 2    # thicker filled rectangles are backgrounds, not lines
+MIN_JOINTS = 5       # camelot ignores line networks with four joints or fewer
+# Part of the raw table cache key (see table_cache.extractor_settings). Bump it
+# whenever a change here (grid rebuild, cell placement, confidence checks) can
+# change the tables of a PDF, so cached tables from the old code are not reused.
+EXTRACTOR_VERSION = 1
+
+
+class Segment:
+    """An axis-aligned ruling segment in PDF coordinates (x0 <= x1, y0 <= y1)."""
+
+    __slots__ = ('x0', 'y0', 'x1', 'y1')
+
+    def __init__(self, x0, y0, x1, y1):
+        self.x0, self.x1 = min(x0, x1), max(x0, x1)
+        self.y0, self.y1 = min(y0, y1), max(y0, y1)
+
+    @property
+    def vertical(self):
+        return self.x1 - self.x0 < self.y1 - self.y0
+
+    def touches(self, other, tol=JOINT_TOL):
+        return (self.x0 - tol <= other.x1 and other.x0 - tol <= self.x1
+                and self.y0 - tol <= other.y1 and other.y0 - tol <= self.y1)
+
+
+def parse_pages(pages, n_pages):
+    """
+    Turn a camelot page string into page numbers.
+
+    Example:
+    parse_pages('1,3-end', 5) -> [1, 3, 4, 5]
+    """
+    numbers = []
+    for part in str(pages).replace(' ', '').split(','):
+        if '-' in part:
+            start, end = part.split('-')
+            end = n_pages if end == 'end' else int(end)
+            numbers.extend(range(int(start), end + 1))
+        else:
+            numbers.append(n_pages if part == 'end' else int(part))
+    return [n for n in numbers if 1 <= n <= n_pages]
+
+
+def _layout_objects(layout):
+    """Collect text lines, ruling shapes and images the way camelot walks the layout."""
+    found = {'horizontal': [], 'vertical': [], 'shapes': [], 'images': []}
+
+    def walk(container):
+        for obj in container:
+            if isinstance(obj, LTTextLineHorizontal):
+                found['horizontal'].append(obj)
+            elif isinstance(obj, LTTextLineVertical):
+                found['vertical'].append(obj)
+            elif isinstance(obj, LTImage):
+                found['images'].append(obj)
+            elif isinstance(obj, LTCurve):
+                found['shapes'].append(obj)
+            if isinstance(obj, LTContainer) and not isinstance(obj, LTChar):
+                walk(obj)
+
+    walk(layout)
+    return found
+
+
+def _shape_segments(shape):
+    """Ruling segments drawn by a pdfminer line, rectangle or path."""
+    width, height = shape.x1 - shape.x0, shape.y1 - shape.y0
+    if min(width, height) <= MAX_THICKNESS and (shape.stroke or shape.fill):
+        # hairline or thin filled bar: one segment through its middle
+        if width >= height:
+            y = (shape.y0 + shape.y1) / 2
+            return [Segment(shape.x0, y, shape.x1, y)]
+        x = (shape.x0 + shape.x1) / 2
+        return [Segment(x, shape.y0, x, shape.y1)]
+    if not shape.stroke:
+        return []
+    points = list(shape.pts or [])
+    if len(points) > 2 and points[0] != points[-1]:
+        points.append(points[0])  # closed path
+    segments = []
+    for (ax, ay), (bx, by) in zip(points, points[1:]):
+        if math.isclose(ax, bx, abs_tol=0.5) or math.isclose(ay, by, abs_tol=0.5):
+            segments.append(Segment(ax, ay, bx, by))
+    return segments
+
+
+def _join_collinear(segments, vertical):
+    """Join segments on the same line that touch or overlap."""
+    if vertical:
+        key, start, end = (lambda s: s.x0), (lambda s: s.y0), (lambda s: s.y1)
+    else:
+        key, start, end = (lambda s: s.y0), (lambda s: s.x0), (lambda s: s.x1)
+
+    joined = []
+    for segment in sorted(segments, key=lambda s: (round(key(s)), start(s))):
+        last = joined[-1] if joined else None
+        if (last is not None and math.isclose(key(last), key(segment), abs_tol=1)
+                and start(segment) <= end(last) + JOINT_TOL):
+            if vertical:
+                last.y1 = max(last.y1, segment.y1)
+            else:
+                last.x1 = max(last.x1, segment.x1)
+        else:
+            joined.append(Segment(segment.x0, segment.y0, segment.x1, segment.y1))
+    return joined
+
+
+def _line_segments(shapes, width, height):
+    """Vertical and horizontal table lines, long enough for camelot to detect them."""
+    segments = [segment for shape in shapes for segment in _shape_segments(shape)]
+    vertical = _join_collinear([s for s in segments if s.vertical], vertical=True)
+    horizontal = _join_collinear([s for s in segments if not s.vertical], vertical=False)
+    vertical = [s for s in vertical if s.y1 - s.y0 >= height / LINE_SCALE]
+    horizontal = [s for s in horizontal if s.x1 - s.x0 >= width / LINE_SCALE]
+    return vertical, horizontal
+
+
+def _networks(vertical, horizontal):
+    """Group touching segments into line networks, one per table."""
+    segments = vertical + horizontal
+    parent = list(range(len(segments)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, a in enumerate(segments):
+        for j in range(i + 1, len(segments)):
+            if a.vertical != segments[j].vertical and a.touches(segments[j]):
+                parent[find(i)] = find(j)
+
+    groups = {}
+    for i, segment in enumerate(segments):
+        groups.setdefault(find(i), []).append(segment)
+    return list(groups.values())
+
+
+def merge_close_lines(values, line_tol=LINE_TOL):
+    """Merge sorted coordinates closer than ``line_tol`` into their running mean (as camelot does)."""
+    merged = []
+    for value in values:
+        if merged and math.isclose(merged[-1], value, abs_tol=line_tol):
+            merged[-1] = (merged[-1] + value) / 2.0
+        else:
+            merged.append(value)
+    return merged
+
+
+class Grid:
+    """Rows, columns and cell edges of one ruled table."""
+
+    def __init__(self, segments):
+        self.vertical = [s for s in segments if s.vertical]
+        self.horizontal = [s for s in segments if not s.vertical]
+        self.bbox = (min(s.x0 for s in segments), min(s.y0 for s in segments),
+                     max(s.x1 for s in segments), max(s.y1 for s in segments))
+        self.joints = [
+            (v.x0, h.y0) for v in self.vertical for h in self.horizontal
+            if v.y0 - JOINT_TOL <= h.y0 <= v.y1 + JOINT_TOL and h.x0 - JOINT_TOL <= v.x0 <= h.x1 + JOINT_TOL
+        ]
+
+        x0, y0, x1, y1 = self.bbox
+        cols = merge_close_lines(sorted([x for x, _ in self.joints] + [x0, x1]))
+        rows = merge_close_lines(sorted([y for _, y in self.joints] + [y0, y1], reverse=True))
+        self.cols = list(zip(cols, cols[1:]))  # (left, right)
+        self.rows = list(zip(rows, rows[1:]))  # (top, bottom)
+        self._set_edges()
+
+    def _close(self, bounds, value):
+        for i, bound in enumerate(bounds):
+            if math.isclose(value, bound[0], abs_tol=JOINT_TOL):
+                return i
+        return None
+
+    def _set_edges(self):
+        n_rows, n_cols = len(self.rows), len(self.cols)
+        self.left = [[c == 0 for c in range(n_cols)] for _ in range(n_rows)]
+        self.top = [[r == 0] * n_cols for r in range(n_rows)]
+
+        for v in self.vertical:
+            start = self._close(self.rows, v.y1)
+            if start is None:
+                continue
+            end = self._close(self.rows, v.y0)
+            end = n_rows if end is None else end
+            index = self._close(self.cols, v.x0)
+            if index is not None:
+                for r in range(start, end):
+                    self.left[r][index] = True
+
+        for h in self.horizontal:
+            start = self._close(self.cols, h.x0)
+            if start is None:
+                continue
+            end = self._close(self.cols, h.x1)
+            end = n_cols if end is None else end
+            index = self._close(self.rows, h.y0)
+            if index is not None:
+                for c in range(start, end):
+                    self.top[index][c] = True
+
+    def cell_of(self, line):
+        """Row and column camelot assigns to a text line, or None if it is in no row."""
+        middle = (line.y0 + line.y1) / 2.0
+        for r, (top, bottom) in enumerate(self.rows):
+            if bottom < middle < top:
+                overlaps = []
+                for left, right in self.cols:
+                    if left <= line.x1 and right >= line.x0:
+                        overlaps.append(abs(max(left, line.x0) - min(right, line.x1)) / abs(left - right))
+                    else:
+                        overlaps.append(-1)
+                return r, overlaps.index(max(overlaps))
+        return None
+
+    def shift(self, r, c):
+        """Move a cell index left and up to the origin of the spanning cell it lies in."""
+        while c > 0 and not self.left[r][c]:
+            c -= 1
+        while r > 0 and not self.top[r][c]:
+            r -= 1
+        return r, c
+
+
+def _in_bbox(bbox, lines):
+    """Text lines whose middle is inside ``bbox``, without overlapping duplicates (camelot's text_in_bbox)."""
+    x0, y0, x1, y1 = bbox
+    inside = [
+        t for t in lines
+        if x0 - 2 <= (t.x0 + t.x1) / 2.0 <= x1 + 2 and y0 - 2 <= (t.y0 + t.y1) / 2.0 <= y1 + 2
+    ]
+    rest = set(inside)
+    for a in inside:
+        for b in rest.copy():
+            if a is b or not (a.x1 >= b.x0 and b.x1 >= a.x0 and a.y1 >= b.y0 and b.y1 >= a.y0):
+                continue
+            area = (a.x1 - a.x0) * (a.y1 - a.y0)
+            overlap = max(min(a.x1, b.x1) - max(a.x0, b.x0), 0) * max(min(a.y1, b.y1) - max(a.y0, b.y0), 0)
+            if (area == 0 or overlap / area > 0.8) and (b.x1 - b.x0) >= (a.x1 - a.x0):
+                rest.discard(a)
+    return list(rest)
+
+
+def _overlaps(bbox, obj):
+    x0, y0, x1, y1 = bbox
+    return obj.x0 < x1 and obj.x1 > x0 and obj.y0 < y1 and obj.y1 > y0
+
+
+def _grid_rows(grid, horizontal, vertical):
+    """
+    Fill ``grid`` with text as camelot does.
+
+    Returns:
+    list: Rows of stripped cell text, or None if two text lines compete for one cell.
+    """
+    cells = [[''] * len(grid.cols) for _ in grid.rows]
+    filled = set()
+    lines = (sorted(_in_bbox(grid.bbox, vertical), key=lambda t: (t.x0, -t.y0))
+             + sorted(_in_bbox(grid.bbox, horizontal), key=lambda t: (-t.y0, t.x0)))
+    for line in lines:
+        index = grid.cell_of(line)
+        if index is None:
+            continue
+        r, c = grid.shift(*index)
+        text = line.get_text()
+        if text.strip():
+            if (r, c) in filled:
+                return None
+            filled.add((r, c))
+        cells[r][c] = text
+    return [[text.strip() for text in row] for row in cells]
+
+
+def page_tables(layout):
+    """
+    Rebuild the ruled tables of one pdfminer page layout.
+
+    Returns:
+    list: Rows of cell text per table, top table first, or None if the page
+        fails a confidence check and should go to camelot.
+    """
+    found = _layout_objects(layout)
+    horizontal, vertical = found['horizontal'], found['vertical']
+    if not horizontal:
+        # camelot skips pages without text; image-only pages need its rendering path
+        return None if found['images'] else []
+    if len([t for t in horizontal if t.get_text().strip()]) < len([t for t in vertical if t.get_text().strip()]):
+        return None  # rotated page, camelot re-orients it first
+
+    width, height = layout.x1 - layout.x0, layout.y1 - layout.y0
+    v_lines, h_lines = _line_segments(found['shapes'], width, height)
+    grids = [Grid(network) for network in _networks(v_lines, h_lines)]
+    grids = [grid for grid in grids if len(grid.joints) >= MIN_JOINTS and grid.rows and grid.cols]
+    if not grids:
+        return None if found['images'] else []
+
+    backgrounds = [
+        shape for shape in found['shapes']
+        if shape.fill and min(shape.x1 - shape.x0, shape.y1 - shape.y0) > MAX_THICKNESS
+    ]
+    tables = []
+    for grid in sorted(grids, key=lambda g: g.bbox[1], reverse=True):
+        if any(_overlaps(grid.bbox, obj) for obj in found['images'] + backgrounds):
+            return None
+        rows = _grid_rows(grid, horizontal, vertical)
+        if rows is None:
+            return None
+        tables.append(rows)
+    return tables
+
+
+def read_text_tables(pdf_path, pages='1-end'):
+    """
+    Read the ruled tables of ``pages`` from the text layer of ``pdf_path``.
+
+    Returns:
+    list: (page number, tables) in page order. ``tables`` is a list of rows of
+        cell text per table, or None for a page that needs camelot.
+    """
+    from pdfminer.converter import PDFPageAggregator
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfparser import PDFParser
+
+    results = []
+    with open(pdf_path, 'rb') as f:
+        document = PDFDocument(PDFParser(f))
+        resources = PDFResourceManager()
+        device = PDFPageAggregator(resources, laparams=LAPARAMS)
+        interpreter = PDFPageInterpreter(resources, device)
+        all_pages = list(PDFPage.create_pages(document))
+        for number in parse_pages(pages, len(all_pages)):
+            if not document.is_extractable:
+                results.append((number, None))
+                continue
+            interpreter.process_page(all_pages[number - 1])
+            results.append((number, page_tables(device.get_result())))
+    return results
+
+
+def compare_with_camelot(pdf_path, pages='1-end'):
+    """
+    Check the text-layer tables of ``pdf_path`` against ``camelot.read_pdf``, page by page.
+
+    Returns:
+    bool: True if every page read from the text layer matches camelot's ``table.df``.
+    """
+    import pandas as pd
+    from pdf_extractor import read_camelot_tables
+
+    identical = True
+    for page, tables in read_text_tables(pdf_path, pages):
+        if tables is None:
+            print(f"{pdf_path} page {page}: sent to camelot")
+            continue
+        expected = read_camelot_tables(pdf_path, str(page))
+        same = len(tables) == len(expected) and all(
+            pd.DataFrame(rows).equals(df) for rows, df in zip(tables, expected)
+        )
+        identical &= same
+        print(f"{pdf_path} page {page}: {len(tables)} tables, {'identical' if same else 'DIFFERENT'}")
+    return identical
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Compare the text-layer tables of PDFs with camelot.")
+    parser.add_argument('pdf', nargs='+')
+    parser.add_argument('--pages', default='1-end')
+    args = parser.parse_args()
+    results = [compare_with_camelot(pdf_path, args.pages) for pdf_path in args.pdf]
+    sys.exit(0 if all(results) else 1)
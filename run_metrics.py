@@ -0,0 +1,133 @@
+"""
+Run Metrics
+
+Records what each stage of a scraper run cost, so a slow nightly run can be
+traced to the listing fetch, a PDF download, table extraction, cleaning or parquet
+writing. Every record has a stage, an optional name (schedule key or file),
+the wall time in seconds, the peak memory of the process so far and any
+counts the stage adds (bytes, tables, rows).
+
+The report is written as JSON to ``run_report.json`` next to
+``timetables_info.parquet``:
+
+    {
+      "started": "...", "finished": "...", "seconds": 41.2,
+      "peak_rss_mb": 412.5, "peak_rss_children_mb": 388.1,
+      "stages": {"download": {"count": 5, "seconds": 3.1, "bytes": 2123456}, ...},
+      "records": [{"stage": "download", "name": "utara", "seconds": 0.8, ...}, ...]
+    }
+
+``peak_rss_mb`` is the high-water mark of this process (and of the extraction
+worker processes for ``peak_rss_children_mb``), taken from ``getrusage``. It is
+``None`` on platforms without the ``resource`` module.
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPORT_FILE = "run_report.json"
+SUMMED_FIELDS = ('seconds', 'bytes', 'tables', 'rows', 'saved_seconds')
+
+
+def peak_rss_mb(children=False):
+    """Peak resident memory of this process (or its finished children) in MB."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(usage.ru_maxrss / scale, 1)
+
+
+class RunReport:
+    """Collects timing records of one scraper run."""
+
+    def __init__(self):
+        self.started = datetime.now()
+        self._start = time.perf_counter()
+        self.records = []
+
+    def add(self, stage, name=None, **fields):
+        """Add a record measured elsewhere, e.g. in a worker process."""
+        record = {'stage': stage, 'name': name}
+        record.update(fields)
+        record.setdefault('peak_rss_mb', peak_rss_mb())
+        self.records.append(record)
+        return record
+
+    @contextmanager
+    def measure(self, stage, name=None, **fields):
+        """
+        Time the ``with`` block as one record of ``stage``.
+
+        The record dict is yielded so counts known only at the end can be set
+        on it. A block that raises is recorded with its error and re-raised.
+
+        Example:
+        with report.measure('parquet', 'stations', rows=len(df)) as record:
+            record['written'] = write_parquet(df, path)
+        """
+        record = {'stage': stage, 'name': name}
+        record.update(fields)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record['seconds'] = round(time.perf_counter() - start, 4)
+            record['peak_rss_mb'] = peak_rss_mb()
+            self.records.append(record)
+
+    def stages(self):
+        """Totals per stage: number of records plus the summed counts."""
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['stage'], {'count': 0})
+            total['count'] += 1
+            for field in SUMMED_FIELDS:
+                if isinstance(record.get(field), (int, float)):
+                    total[field] = total.get(field, 0) + record[field]
+        for total in totals.values():
+            for field in ('seconds', 'saved_seconds'):
+                if field in total:
+                    total[field] = round(total[field], 4)
+        return totals
+
+    def to_dict(self):
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'seconds': round(time.perf_counter() - self._start, 4),
+            'python': platform.python_version(),
+            'peak_rss_mb': peak_rss_mb(),
+            'peak_rss_children_mb': peak_rss_mb(children=True),
+            'stages': self.stages(),
+            'records': self.records,
+        }
+
+    def write(self, data_dir):
+        """Write the report to ``data_dir/run_report.json`` and return its path."""
+        path = os.path.join(data_dir, REPORT_FILE)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+            f.write("\n")
+        return path
+
+    def print_summary(self):
+        print(f"{'stage':<14} {'count':>5} {'seconds':>9} {'bytes':>11} {'tables':>6} {'rows':>7}")
+        for stage, total in self.stages().items():
+            print(f"{stage:<14} {total['count']:>5} {total.get('seconds', 0):>9.2f} "
+                  f"{total.get('bytes', ''):>11} {total.get('tables', ''):>6} {total.get('rows', ''):>7}")
+        print(f"Peak memory: {peak_rss_mb()} MB (extraction workers: {peak_rss_mb(children=True)} MB)")
@@ -0,0 +1,195 @@
+"""
+Schedule Index
+
+Answers "next N trains from A to B after time t" without touching a DataFrame.
+
+Every trip of every route is expanded into its (origin, destination) pairs,
+and for each (service day, origin, destination) the departure minutes are kept
+sorted in flat numpy arrays, with the arrival time, train number and line of
+each trip alongside. A query looks up the pair's slice, binary-searches it for
+the first departure at or after ``t`` and returns the next ``limit`` rows as a
+``TrainSlice`` of array views; times stay in minutes and are formatted by the
+caller.
+
+Daily routes (UTARA) are included in both service days. Built from the
+long-format tables (see ``timetable_schema``).
+"""
+
+import numpy as np
+import pandas as pd
+
+from departure_board import SERVICE_DAYS
+from time_parsing import format_minutes
+from timetable_schema import NO_STOP, load_long_format
+
+SCHEDULE_COLUMNS = ['Service_ID', 'Line', 'Departure_Station', 'Departure_Time',
+                    'Arrival_Station', 'Arrival_Time', 'Departure_Minutes', 'Arrival_Minutes']
+
+
+class TrainSlice:
+    """
+    Trains returned by ``ScheduleIndex.next_trains``, sorted by departure time.
+
+    ``service_id``, ``line``, ``departure`` and ``arrival`` are numpy arrays
+    (views of the index when no line filter is given), with times in minutes
+    since midnight. Use ``to_frame`` for a DataFrame with formatted times.
+    """
+
+    __slots__ = ('origin', 'destination', 'service_id', 'line', 'departure', 'arrival')
+
+    def __init__(self, origin, destination, service_id, line, departure, arrival):
+        self.origin = origin
+        self.destination = destination
+        self.service_id = service_id
+        self.line = line
+        self.departure = departure
+        self.arrival = arrival
+
+    def __len__(self):
+        return len(self.departure)
+
+    def to_frame(self):
+        """Return the trains as a DataFrame with SCHEDULE_COLUMNS."""
+        return pd.DataFrame({
+            'Service_ID': self.service_id,
+            'Line': self.line,
+            'Departure_Station': self.origin,
+            'Departure_Time': [format_minutes(m) for m in self.departure],
+            'Arrival_Station': self.destination,
+            'Arrival_Time': [format_minutes(m) for m in self.arrival],
+            'Departure_Minutes': self.departure,
+            'Arrival_Minutes': self.arrival,
+        }, columns=SCHEDULE_COLUMNS)
+
+
+def trip_pairs(stop_times):
+    """
+    Expand every trip into all of its (origin, destination) stop pairs.
+
+    Returns:
+    DataFrame: service_day, line, service_id, origin_id, destination_id,
+        departure and arrival, one row per pair of stops on the same trip.
+    """
+    stops = stop_times.loc[
+        stop_times['departure'] != NO_STOP,
+        ['route_key', 'line', 'service_day', 'service_id', 'stop_sequence', 'station_id', 'arrival', 'departure']
+    ]
+    stops = stops.sort_values(['route_key', 'service_id', 'stop_sequence'], kind='stable')
+
+    # Trips are contiguous after sorting, so pair every stop with the later
+    # stops of its own trip: stop k of a trip with n stops pairs with k+1..n-1
+    trip = stops.groupby(['route_key', 'service_id'], observed=True, sort=False).ngroup().to_numpy()
+    trip_start = np.flatnonzero(np.r_[True, trip[1:] != trip[:-1]])
+    trip_size = np.diff(np.r_[trip_start, len(trip)])
+    position = np.arange(len(trip)) - np.repeat(trip_start, trip_size)
+    later = np.repeat(trip_size, trip_size) - position - 1
+
+    origin = np.repeat(np.arange(len(trip)), later)
+    first_later = np.repeat(np.cumsum(later) - later, later)
+    destination = origin + 1 + (np.arange(len(origin)) - first_later)
+
+    station = stops['station_id'].to_numpy()
+    return pd.DataFrame({
+        'service_day': stops['service_day'].to_numpy()[origin],
+        'line': stops['line'].astype(str).to_numpy()[origin],
+        'service_id': stops['service_id'].astype(str).to_numpy()[origin],
+        'origin_id': station[origin],
+        'destination_id': station[destination],
+        'departure': stops['departure'].to_numpy()[origin],
+        'arrival': stops['arrival'].to_numpy()[destination],
+    })
+
+
+class ScheduleIndex:
+    """
+    Sorted departures per (service day, origin, destination).
+
+    Args:
+    stations (DataFrame): stations table (station_id, station).
+    stop_times (DataFrame): stop_times table.
+    """
+
+    def __init__(self, stations, stop_times):
+        self.station_names = stations.set_index('station_id')['station']
+        self.station_ids = {name: sid for sid, name in self.station_names.items()}
+        self.n_stations = int(stations['station_id'].max()) + 1 if len(stations) else 0
+
+        # Station order of each line, following its first route file
+        by_route = stop_times.sort_values(['route_key', 'stop_sequence'], kind='stable')
+        self.line_station_ids = {
+            str(line): group['station_id'].drop_duplicates().tolist()
+            for line, group in by_route.groupby('line', observed=True)
+        }
+
+        pairs = trip_pairs(stop_times)
+        parts = []
+        for day in SERVICE_DAYS:
+            part = pairs[pairs['service_day'].isin([day, 'DAILY'])].copy()
+            part['day'] = SERVICE_DAYS.index(day)
+            parts.append(part)
+        pairs = pd.concat(parts, ignore_index=True) if parts else pairs.assign(day=0)
+        pairs = pairs.sort_values(['day', 'origin_id', 'destination_id', 'departure'], kind='stable')
+
+        self.departure = pairs['departure'].to_numpy(dtype=np.int16)
+        self.arrival = pairs['arrival'].to_numpy(dtype=np.int16)
+        self.service_id = pairs['service_id'].to_numpy()
+        self.line = pairs['line'].to_numpy()
+
+        # One sortable code per (day, origin, destination); offsets are found
+        # by binary search over the sorted codes
+        self._codes = self._code(pairs['day'].to_numpy(), pairs['origin_id'].to_numpy(),
+                                 pairs['destination_id'].to_numpy())
+
+    def __len__(self):
+        return len(self.departure)
+
+    def _code(self, day, origin_id, destination_id):
+        n = np.int64(self.n_stations)
+        return (np.asarray(day, dtype=np.int64) * n + origin_id) * n + destination_id
+
+    def _slice(self, service_day, origin, destination):
+        origin_id = self.station_ids.get(origin)
+        destination_id = self.station_ids.get(destination)
+        if origin_id is None or destination_id is None or service_day not in SERVICE_DAYS:
+            return 0, 0
+        code = self._code(SERVICE_DAYS.index(service_day), origin_id, destination_id)
+        return (int(np.searchsorted(self._codes, code, side='left')),
+                int(np.searchsorted(self._codes, code, side='right')))
+
+    def next_trains(self, service_day, origin, destination, after_minutes=0, limit=10, lines=None):
+        """
+        Next trains from ``origin`` to ``destination`` at or after ``after_minutes``.
+
+        Args:
+        service_day (str): "WEEKDAYS" or "WEEKENDS".
+        origin (str): Departure station name.
+        destination (str): Arrival station name.
+        after_minutes (int): Minutes since midnight. 0 for the whole day.
+        limit (int): Maximum number of trains. None for the rest of the day.
+        lines (list): Only return trains of these lines, e.g. ["klang"].
+
+        Returns:
+        TrainSlice: The trains, sorted by departure time.
+        """
+        start, end = self._slice(service_day, origin, destination)
+        first = start + int(np.searchsorted(self.departure[start:end], after_minutes, side='left'))
+
+        if lines is None:
+            rows = slice(first, end if limit is None else min(first + limit, end))
+        else:
+            rows = first + np.flatnonzero(np.isin(self.line[first:end], list(lines)))
+            if limit is not None:
+                rows = rows[:limit]
+
+        return TrainSlice(origin, destination, self.service_id[rows], self.line[rows],
+                          self.departure[rows], self.arrival[rows])
+
+    def line_stations(self, line):
+        """Return the station names of ``line`` in route order."""
+        return self.station_names.reindex(self.line_station_ids.get(line, [])).tolist()
+
+
+def build_schedule_index(data_dir):
+    """Build a ScheduleIndex from the long-format files in ``data_dir``."""
+    stations, stop_times = load_long_format(data_dir)
+    return ScheduleIndex(stations, stop_times)
@@ -0,0 +1,129 @@
+"""
+Raw Table Cache
+
+Content-addressed cache of the raw ``table.df`` outputs of the table extractor.
+Entries are keyed by the SHA-256 of the PDF plus a hash of the extractor
+settings (extractor, camelot and pdfminer versions, the version of our own
+extraction code, backend, pages), so:
+
+- the cleaning and naming stages can be re-run without extracting again
+- a PDF that has been seen once, including an older edition, is never
+  extracted twice with the same settings
+
+Each entry is a directory holding one parquet file per table and an
+``index.json`` written last, so a half-written entry is never read.
+
+The cache lives in ``.cache/raw_tables`` (or ``KTMB_TABLE_CACHE``) and is kept
+between nightly runs by the daily-scrape workflow.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import pandas as pd
+from importlib.metadata import version, PackageNotFoundError
+
+CACHE_DIR = os.environ.get('KTMB_TABLE_CACHE', os.path.join(os.getcwd(), ".cache", "raw_tables"))
+INDEX_FILE = "index.json"
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of the file at ``path``."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _package_version(name):
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+
+def extractor_settings(options, pages='1-end', extractor='camelot', versions=None):
+    """
+    Settings that change the raw tables produced for the same PDF.
+
+    Args:
+    options (dict): camelot.read_pdf options.
+    pages (str): Pages extracted, or a label for how they are chosen.
+    extractor (str): "text" or "camelot".
+    versions (dict): Versions of the repo's own extraction code, e.g.
+        {'text_extractor': 1}. Bumping one invalidates the cached tables.
+    """
+    settings = {
+        'extractor': extractor,
+        'camelot': _package_version('camelot-py'),
+        'options': options,
+        'pages': pages,
+    }
+    if extractor != 'camelot':
+        settings['pdfminer'] = _package_version('pdfminer.six')
+    if versions:
+        settings['versions'] = dict(versions)
+    return settings
+
+
+def cache_key(sha256, settings):
+    """Cache key for a PDF hash and extractor settings."""
+    settings_hash = hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+    return f"{sha256}-{settings_hash[:16]}"
+
+
+def load_tables(sha256, settings, cache_dir=CACHE_DIR):
+    """
+    Load the cached raw tables of a PDF.
+
+    Returns:
+    list: Raw DataFrames in page order, or None if the PDF is not cached.
+    """
+    entry_dir = os.path.join(cache_dir, cache_key(sha256, settings))
+    index_path = os.path.join(entry_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None
+
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+        tables = []
+        for file_name in index['tables']:
+            df = pd.read_parquet(os.path.join(entry_dir, file_name))
+            df.columns = [int(col) for col in df.columns]
+            tables.append(df)
+        return tables
+    except Exception as e:
+        print(f"Ignoring unreadable cache entry {entry_dir}: {e}")
+        return None
+
+
+def save_tables(sha256, settings, tables, cache_dir=CACHE_DIR):
+    """Store the raw tables of a PDF in the cache."""
+    key = cache_key(sha256, settings)
+    entry_dir = os.path.join(cache_dir, key)
+    if os.path.exists(os.path.join(entry_dir, INDEX_FILE)):
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(prefix=f".{key}-", dir=cache_dir)
+    try:
+        file_names = []
+        for i, df in enumerate(tables):
+            file_name = f"table_{i + 1:03d}.parquet"
+            df = df.copy()
+            df.columns = [str(col) for col in df.columns]
+            df.to_parquet(os.path.join(temp_dir, file_name), index=False)
+            file_names.append(file_name)
+
+        with open(os.path.join(temp_dir, INDEX_FILE), 'w') as f:
+            json.dump({'sha256': sha256, 'settings': settings, 'tables': file_names}, f, indent=2)
+
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(temp_dir, entry_dir)
+    except Exception as e:
+        print(f"Could not cache tables for {sha256}: {e}")
+        shutil.rmtree(temp_dir, ignore_errors=True)
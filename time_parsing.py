@@ -0,0 +1,96 @@
+"""
+Timetable Time Parsing
+
+Batch parser for the time cells found in KTMB timetable PDFs. A whole column
+(or any array) of raw cells is parsed in one pass and returned as minutes since
+midnight plus a validity mask.
+
+Accepted forms:
+- "6:15", "06:15", "6.15", "18::12" (doubled separator typo)
+- "615", "1026" (no separator, last two digits are the minutes)
+- footnote markers around the time, e.g. "6:15*", "(6:15)", "6:15 a", "#1026"
+
+Anything else ("-", "", "CROSSING", None, NaN, ...) is invalid.
+
+Each distinct cell value is parsed once, so repeated values cost nothing.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+
+INVALID = -1
+MAX_HOUR = 29  # some timetables write trains after midnight as 24:xx - 29:xx
+
+TIME_PATTERN = (
+    r'^[^0-9]*?'
+    r'(?:(?P<h>[0-9]{1,2})\s*[:.]+\s*(?P<m>[0-9]{2})'
+    r'|(?P<hc>[0-9]{1,2})(?P<mc>[0-9]{2}))'
+    r'[^0-9]*$'
+)
+TIME_RE = re.compile(TIME_PATTERN)
+SMALL_BATCH = 256  # up to this many distinct values, a plain regex loop beats pandas' overhead
+
+
+def _parse_one(text):
+    """Parse one stripped cell into minutes since midnight, INVALID if it is not a time."""
+    match = TIME_RE.match(text)
+    if not match:
+        return INVALID
+    hours = int(match.group('h') or match.group('hc'))
+    minutes = int(match.group('m') or match.group('mc'))
+    return hours * 60 + minutes if hours <= MAX_HOUR and minutes < 60 else INVALID
+
+
+def parse_times(values):
+    """
+    Parse raw timetable cells into minutes since midnight.
+
+    Args:
+    values: list, numpy array or pandas Series of raw cells.
+
+    Returns:
+    tuple: (minutes, valid)
+        minutes (numpy.ndarray[int16]): minutes since midnight, INVALID where
+            the cell is not a time
+        valid (numpy.ndarray[bool]): True where the cell is a time
+    """
+    values = np.asarray(values, dtype=object).ravel()
+    if len(values) == 0:
+        return np.empty(0, dtype=np.int16), np.empty(0, dtype=bool)
+
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    if len(uniques) <= SMALL_BATCH:
+        unique_minutes = np.array([_parse_one(str(u).strip()) for u in uniques], dtype=np.int16)
+    else:
+        text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+        parts = text.str.extract(TIME_PATTERN)
+
+        hours = pd.to_numeric(parts['h'].fillna(parts['hc']), errors='coerce')
+        minutes = pd.to_numeric(parts['m'].fillna(parts['mc']), errors='coerce')
+        ok = hours.notna() & minutes.notna() & (hours <= MAX_HOUR) & (minutes < 60)
+        unique_minutes = (hours * 60 + minutes).where(ok, INVALID).to_numpy(dtype=np.int16)
+
+    # Missing values (code -1) map to the extra INVALID slot at the end
+    lookup = np.append(unique_minutes, np.int16(INVALID))
+    parsed = lookup[codes]
+    return parsed, parsed != INVALID
+
+
+def parse_time_to_minutes(t):
+    """
+    Convert a single timetable value into minutes since midnight.
+
+    Raises:
+    ValueError: if the value is not a time.
+    """
+    minutes, valid = parse_times([t])
+    if not valid[0]:
+        raise ValueError(f"Not a timetable time: {t!r}")
+    return int(minutes[0])
+
+
+def format_minutes(minutes):
+    """Format minutes since midnight as "H:MM". Times past midnight wrap to the next day."""
+    minutes = int(minutes) % (24 * 60)
+    return f"{minutes // 60}:{minutes % 60:02d}"
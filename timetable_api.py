@@ -0,0 +1,275 @@
+"""
+Timetable API
+
+Small standalone HTTP service answering timetable queries as JSON, so the apps
+and other tools can share one backend:
+
+GET /stations
+GET /departures?station=KL SENTRAL[&after=17:30][&day=WEEKDAYS][&limit=10]
+GET /schedules?from=KL SENTRAL&to=KAJANG[&after=...][&day=...][&limit=...][&line=batu_caves]
+GET /journeys?from=KAJANG&to=SHAH ALAM[&after=...][&day=...]
+GET /health
+
+``after`` is "H:MM" or minutes since midnight, at most ``MAX_HOUR``:00, and
+defaults to the current time in Kuala Lumpur; ``day`` defaults to today's
+service day.
+
+The index is built from the ``timetables/`` folder and reloaded in the
+background when the files change (see ``timetable_index.IndexWatcher``).
+Encoded responses are cached per data version, answered with an ETag, and
+connections are kept alive (HTTP/1.1).
+
+Usage:
+    python timetable_api.py [--host 127.0.0.1] [--port 8000] [--data-dir timetables]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from departure_board import SERVICE_DAYS, service_day_for
+from time_parsing import MAX_HOUR, format_minutes, parse_time_to_minutes
+from timetable_index import IndexWatcher
+
+DATA_DIR = "timetables"
+CACHE_SIZE = int(os.environ.get("KTMB_API_CACHE_SIZE", 4096))  # cached responses
+MAX_LIMIT = 500
+KL_TIMEZONE = timezone(timedelta(hours=8))
+# Endpoints taking ``after`` and ``day``
+TIMED_ENDPOINTS = {'/departures', '/schedules', '/journeys'}
+
+
+class BadRequest(Exception):
+    """Invalid query parameters, answered with 400."""
+
+
+def _json_default(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _records(df):
+    return df.to_dict('records')
+
+
+# "H:MM" of every minute a train can run at, computed once
+_time_label = lru_cache(maxsize=None)(format_minutes)
+
+
+def _train_records(trains):
+    """JSON records of a ``schedule_index.TrainSlice``, built from its arrays without a DataFrame."""
+    origin, destination = trains.origin, trains.destination
+    return [
+        {'Service_ID': service_id, 'Line': line,
+         'Departure_Station': origin, 'Departure_Time': _time_label(departure),
+         'Arrival_Station': destination, 'Arrival_Time': _time_label(arrival),
+         'Departure_Minutes': departure, 'Arrival_Minutes': arrival}
+        for service_id, line, departure, arrival in zip(
+            trains.service_id.tolist(), trains.line.tolist(), trains.departure.tolist(), trains.arrival.tolist())
+    ]
+
+
+class TimetableAPI:
+    """
+    Query handlers and response cache, independent of the HTTP server.
+
+    Args:
+    watcher (IndexWatcher): Source of the current TimetableIndex.
+    cache_size (int): Number of encoded responses to keep.
+    """
+
+    def __init__(self, watcher, cache_size=CACHE_SIZE):
+        self.watcher = watcher
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # (version, path, params) -> (etag, body)
+        self._lock = threading.Lock()
+        self.routes = {
+            '/stations': self.stations,
+            '/departures': self.departures,
+            '/schedules': self.schedules,
+            '/journeys': self.journeys,
+            '/health': self.health,
+        }
+
+    # --- parameters ---
+
+    def _station(self, index, params, name):
+        station = params.get(name, '').strip().upper()
+        if not station:
+            raise BadRequest(f"Missing parameter: {name}")
+        if station not in index.schedule.station_ids:
+            raise BadRequest(f"Unknown station: {station}")
+        return station
+
+    def _after(self, params):
+        value = params['after'].strip()
+        try:
+            minutes = int(value) if value.isdigit() else parse_time_to_minutes(value)
+        except ValueError:
+            raise BadRequest(f"Invalid time: {value}")
+        if minutes > MAX_HOUR * 60:
+            raise BadRequest(f"Invalid time: {value} (at most {MAX_HOUR}:00)")
+        return minutes
+
+    def _day(self, params):
+        day = params['day'].strip().upper()
+        if day not in SERVICE_DAYS:
+            raise BadRequest(f"Invalid day: {day} (expected one of {', '.join(SERVICE_DAYS)})")
+        return day
+
+    def _limit(self, params, default):
+        try:
+            limit = int(params.get('limit', default))
+        except ValueError:
+            raise BadRequest(f"Invalid limit: {params['limit']}")
+        return max(1, min(limit, MAX_LIMIT))
+
+    # --- endpoints ---
+
+    def health(self, index, params):
+        return {'status': 'ok'}
+
+    def stations(self, index, params):
+        return {'stations': index.stations}
+
+    def departures(self, index, params):
+        station = self._station(index, params, 'station')
+        day, after = self._day(params), self._after(params)
+        board = index.boards[day].next_departures(station, after, limit=self._limit(params, 10))
+        return {'station': station, 'day': day, 'after': after, 'departures': _records(board)}
+
+    def schedules(self, index, params):
+        origin, destination = self._station(index, params, 'from'), self._station(index, params, 'to')
+        day, after = self._day(params), self._after(params)
+        lines = [params['line']] if params.get('line') else None
+        trains = index.schedule.next_trains(day, origin, destination, after, limit=self._limit(params, 20), lines=lines)
+        return {'from': origin, 'to': destination, 'day': day, 'after': after, 'trains': _train_records(trains)}
+
+    def journeys(self, index, params):
+        origin, destination = self._station(index, params, 'from'), self._station(index, params, 'to')
+        day, after = self._day(params), self._after(params)
+        legs = index.planner.earliest_arrival(day, origin, destination, after)
+        return {'from': origin, 'to': destination, 'day': day, 'after': after, 'legs': _records(legs)}
+
+    # --- dispatch ---
+
+    def respond(self, target):
+        """
+        Answer a GET request for ``target`` (path and query string).
+
+        Returns:
+        tuple: (status, etag, body bytes). The etag is None for errors.
+        """
+        url = urlsplit(target)
+        path = url.path.rstrip('/')
+        handler = self.routes.get(path)
+        if handler is None:
+            return 404, None, json.dumps({'error': f"Not found: {url.path}"}).encode()
+
+        index = self.watcher.index
+        params = dict(parse_qsl(url.query))
+        if path in TIMED_ENDPOINTS:
+            # Defaults follow the clock, so they are resolved before the cache lookup
+            now = datetime.now(KL_TIMEZONE)
+            params.setdefault('after', str(now.hour * 60 + now.minute))
+            params.setdefault('day', service_day_for(now.date()))
+        key = (index.version, path, tuple(sorted(params.items())))
+
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                return (200,) + hit
+
+        try:
+            payload = handler(index, params)
+        except BadRequest as e:
+            return 400, None, json.dumps({'error': str(e)}).encode()
+        payload['version'] = index.version
+        body = json.dumps(payload, default=_json_default, ensure_ascii=False).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+
+        with self._lock:
+            self._cache[key] = (etag, body)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return 200, etag, body
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive; every response has a Content-Length
+    # Headers and body go out in one send: with separate small writes, Nagle's
+    # algorithm and delayed ACKs stall every keep-alive response by ~40 ms
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+    api = None
+
+    def do_GET(self):
+        try:
+            status, etag, body = self.api.respond(self.path)
+        except Exception as e:
+            print(f"[{datetime.now()}] Error answering {self.path}: {e}")
+            status, etag, body = 500, None, json.dumps({'error': 'Internal error'}).encode()
+
+        if etag is not None and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'public, max-age=30')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # One line per request is too much at thousands of requests per second
+        pass
+
+
+def make_server(host, port, data_dir=DATA_DIR):
+    """Create the HTTP server with a watched index of ``data_dir``."""
+    watcher = IndexWatcher(data_dir).start()
+    handler = type('TimetableRequestHandler', (RequestHandler,), {'api': TimetableAPI(watcher)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the KTMB timetables as a JSON API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    args = parser.parse_args(argv)
+
+    server = make_server(args.host, args.port, args.data_dir)
+    print(f"[{datetime.now()}] Serving timetables from {args.data_dir} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
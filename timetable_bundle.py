@@ -0,0 +1,162 @@
+"""
+Timetable Bundle
+
+Packs every route, the station table and the route metadata into one file,
+``timetable_bundle.arrow``, so a client needs a single download or read:
+
+- the stop_times table (see ``timetable_schema``) as an uncompressed Arrow IPC
+  file. Numeric columns can be memory-mapped, and route_key, line, service_day
+  and service_id are dictionary-encoded.
+- a JSON document in the schema metadata with:
+    format_version   layout version of the bundle, checked when reading
+    version          content hash, changes whenever the timetables change
+    stations         station names, position = station_id
+    routes           route_key -> line, service_day, direction, trains,
+                     schedule_key, effective_date and pdf_url
+"""
+
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from parquet_writer import atomic_write
+from timetable_manifest import route_sources
+from timetable_schema import STOP_TIMES_COLUMNS, load_long_format, parse_route_key
+
+BUNDLE_FILE = "timetable_bundle.arrow"
+BUNDLE_FORMAT_VERSION = 1
+METADATA_KEY = b'ktmb_bundle'
+
+
+def route_metadata(stop_times, manifest=None):
+    """
+    Describe every route in ``stop_times``, with its effective date and PDF from the manifest.
+
+    Args:
+    stop_times (DataFrame): stop_times table.
+    manifest (dict): PDF manifest (see ``timetable_manifest``), or None.
+
+    Returns:
+    dict: route_key -> route metadata.
+    """
+    sources = route_sources(manifest)
+    trains = stop_times.groupby('route_key', observed=True)['service_id'].nunique()
+    routes = {}
+    for route_key in sorted(trains.index.astype(str)):
+        info = parse_route_key(route_key) or {'line': route_key, 'service_day': 'DAILY', 'direction': 1}
+        schedule_key, entry = sources.get(route_key, (None, {}))
+        routes[route_key] = {
+            'line': info['line'],
+            'service_day': info['service_day'],
+            'direction': info['direction'],
+            'trains': int(trains[route_key]),
+            'schedule_key': schedule_key,
+            'effective_date': entry.get('Effective_Date'),
+            'pdf_url': entry.get('PDF Links'),
+        }
+    return routes
+
+
+def _serialize(table):
+    """Serialize ``table`` as an uncompressed Arrow IPC file."""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def build_bundle(stations, stop_times, manifest=None):
+    """
+    Build the bundle bytes.
+
+    Returns:
+    tuple: (bytes, metadata dict)
+    """
+    stop_times = stop_times[STOP_TIMES_COLUMNS].reset_index(drop=True)
+    for col in ['route_key', 'line', 'service_day', 'service_id']:
+        stop_times[col] = stop_times[col].astype(str).astype('category')
+    table = pa.Table.from_pandas(stop_times, preserve_index=False).replace_schema_metadata(None)
+
+    info = {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'stations': stations.sort_values('station_id')['station'].tolist(),
+        'routes': route_metadata(stop_times, manifest),
+    }
+    # The version hashes the data and the metadata, so it is stable across runs
+    digest = hashlib.sha256(_serialize(table).to_pybytes())
+    digest.update(json.dumps(info, sort_keys=True).encode())
+    info['version'] = digest.hexdigest()[:16]
+
+    table = table.replace_schema_metadata({METADATA_KEY: json.dumps(info, sort_keys=True).encode()})
+    return _serialize(table).to_pybytes(), info
+
+
+def bundle_version(path):
+    """Return the version of the bundle at ``path``, or None if it cannot be read."""
+    try:
+        with pa.memory_map(path, 'r') as source:
+            schema = pa.ipc.open_file(source).schema
+        return json.loads(schema.metadata[METADATA_KEY])['version']
+    except Exception:
+        return None
+
+
+def write_bundle(stations, stop_times, path, manifest=None):
+    """
+    Write the bundle to ``path`` if its content changed.
+
+    Returns:
+    bool: True if the file was written.
+    """
+    data, info = build_bundle(stations, stop_times, manifest)
+    if os.path.exists(path) and bundle_version(path) == info['version']:
+        return False
+    atomic_write(path, lambda f: f.write(data))
+    return True
+
+
+def read_bundle(source):
+    """
+    Read a bundle from a file path (memory-mapped) or from bytes.
+
+    Returns:
+    tuple: (stations DataFrame, stop_times DataFrame, metadata dict)
+
+    Raises:
+    ValueError: if the bundle has an unsupported format version.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        table = pa.ipc.open_file(pa.py_buffer(source)).read_all()
+    else:
+        with pa.memory_map(source, 'r') as mapped:
+            table = pa.ipc.open_file(mapped).read_all()
+
+    info = json.loads(table.schema.metadata[METADATA_KEY])
+    if info.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported timetable bundle format: {info.get('format_version')}")
+
+    stations = pd.DataFrame({
+        'station_id': np.arange(len(info['stations']), dtype=np.int16),
+        'station': info['stations'],
+    })
+    # split_blocks keeps the numeric columns as views of the mapped buffers
+    stop_times = table.to_pandas(split_blocks=True)
+    return stations, stop_times, info
+
+
+def load_timetables(data_dir):
+    """
+    Read stations and stop_times from the bundle in ``data_dir``, or from the
+    separate long-format parquet files when there is no bundle.
+
+    Returns:
+    tuple: (stations DataFrame, stop_times DataFrame)
+    """
+    path = os.path.join(data_dir, BUNDLE_FILE)
+    if os.path.exists(path):
+        stations, stop_times, _ = read_bundle(path)
+        return stations, stop_times
+    return load_long_format(data_dir)
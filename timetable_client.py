@@ -0,0 +1,195 @@
+"""
+Timetable Client
+
+Data layer for the apps that read the timetables from GitHub instead of the
+local folder:
+
+- downloaded files are kept in an on-device cache folder and revalidated with
+  If-None-Match / If-Modified-Since, so an unchanged file costs a 304
+- decoded objects (e.g. a ScheduleIndex built from the bundle) are kept in an
+  in-memory LRU and reused for ``MAX_AGE_SECONDS`` without any request
+- files can be prefetched in the background when the app starts
+- when the network is down, the last good copy on disk is used
+- callers can follow a download through a progress callback
+
+Settings can be changed with the ``KTMB_CLIENT_CACHE_DIR``,
+``KTMB_CLIENT_MAX_AGE`` and ``KTMB_CLIENT_MEMORY_ITEMS`` environment variables.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from parquet_writer import atomic_write
+
+GITHUB_BASE_URL = "https://raw.githubusercontent.com/ubaiiii/KTMB_Train_Schedule/main/timetables/"
+# Flet sets FLET_APP_STORAGE_DATA to the app's writable storage on mobile
+CACHE_DIR = os.environ.get(
+    "KTMB_CLIENT_CACHE_DIR",
+    os.path.join(os.environ.get("FLET_APP_STORAGE_DATA") or os.path.expanduser("~/.cache"), "ktmb_timetables"),
+)
+MAX_AGE_SECONDS = int(os.environ.get("KTMB_CLIENT_MAX_AGE", 300))
+MEMORY_ITEMS = int(os.environ.get("KTMB_CLIENT_MEMORY_ITEMS", 8))
+PREFETCH_WORKERS = 2
+CHUNK_SIZE = 64 * 1024
+TIMEOUT = (5, 30)  # (connect, read) seconds
+
+
+class TimetableClient:
+    """
+    Cached access to the published timetable files.
+
+    Args:
+    base_url (str): URL of the timetables folder.
+    cache_dir (str): On-device cache folder.
+    max_age (int): Seconds a decoded object is used before it is revalidated.
+    memory_items (int): Number of decoded objects kept in memory.
+    """
+
+    def __init__(self, base_url=GITHUB_BASE_URL, cache_dir=CACHE_DIR, max_age=MAX_AGE_SECONDS,
+                 memory_items=MEMORY_ITEMS):
+        self.base_url = base_url
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.memory_items = memory_items
+        self.session = requests.Session()
+        self._memory = OrderedDict()  # (name, decode) -> (loaded_at, etag, value)
+        self._pending = {}  # (name, decode) -> Future of a load in progress
+        self._listeners = {}  # (name, decode) -> progress callbacks of the load in progress
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="timetable-client")
+
+    def _paths(self, name):
+        path = os.path.join(self.cache_dir, name)
+        return path, path + ".json"
+
+    def _read_cached(self, name):
+        """Return (bytes, validators) of the cached copy, or (None, {})."""
+        path, meta_path = self._paths(name)
+        if not os.path.exists(path):
+            return None, {}
+        validators = {}
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                validators = json.load(f)
+        with open(path, 'rb') as f:
+            return f.read(), validators
+
+    def fetch(self, name, progress=None):
+        """
+        Return the content of ``name``, revalidating the on-device copy.
+
+        Args:
+        name (str): File name in the timetables folder.
+        progress (callable): Called with the downloaded fraction (0 to 1) as data arrives.
+
+        Returns:
+        tuple: (bytes, etag). The etag is None when the server sent none.
+
+        Raises:
+        requests.RequestException: if the file cannot be downloaded and there is no cached copy.
+        """
+        cached, validators = self._read_cached(name)
+        headers = {}
+        if cached is not None and validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if cached is not None and validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        try:
+            with self.session.get(f"{self.base_url}{name}", headers=headers, timeout=TIMEOUT, stream=True) as response:
+                if response.status_code == 304 and cached is not None:
+                    if progress:
+                        progress(1.0)
+                    return cached, validators.get('etag')
+                response.raise_for_status()
+
+                total = int(response.headers.get('Content-Length') or 0)
+                data = bytearray()
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    data.extend(chunk)
+                    if progress and total:
+                        progress(min(len(data) / total, 1.0))
+                data = bytes(data)
+        except requests.RequestException as e:
+            if cached is None:
+                raise
+            print(f"Could not refresh {name} ({e}), using the cached copy")
+            return cached, validators.get('etag')
+
+        validators = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        path, meta_path = self._paths(name)
+        atomic_write(path, lambda f: f.write(data))
+        atomic_write(meta_path, lambda f: f.write(json.dumps(validators).encode()))
+        return data, validators['etag']
+
+    def _notify(self, key, fraction):
+        with self._lock:
+            listeners = list(self._listeners.get(key, []))
+        for listener in listeners:
+            listener(fraction)
+
+    def _load(self, name, decode):
+        key = (name, decode)
+        try:
+            data, etag = self.fetch(name, lambda fraction: self._notify(key, fraction))
+            with self._lock:
+                hit = self._memory.get(key)
+            # Unchanged on the server: keep the decoded object, skip decoding
+            if hit is not None and etag is not None and hit[1] == etag:
+                value = hit[2]
+            else:
+                value = decode(data)
+            with self._lock:
+                self._memory[key] = (time.monotonic(), etag, value)
+                self._memory.move_to_end(key)
+                while len(self._memory) > self.memory_items:
+                    self._memory.popitem(last=False)
+            return value
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+                self._listeners.pop(key, None)
+
+    def _submit(self, name, decode, progress=None):
+        """Return the in-progress load of ``name`` or start one. Call with the lock held."""
+        key = (name, decode)
+        if progress is not None:
+            self._listeners.setdefault(key, []).append(progress)
+        future = self._pending.get(key)
+        if future is None:
+            future = self._executor.submit(self._load, name, decode)
+            self._pending[key] = future
+        return future
+
+    def load(self, name, decode, progress=None):
+        """
+        Return ``decode(content of name)``, from memory when it is fresh enough.
+
+        Args:
+        name (str): File name in the timetables folder, e.g. "timetable_bundle.arrow".
+        decode (callable): Turns the file bytes into the object to return. Use
+            the same function for every call, it is part of the cache key.
+        progress (callable): Called from a worker thread with the downloaded
+            fraction, also when joining a download that is already running.
+        """
+        with self._lock:
+            hit = self._memory.get((name, decode))
+            if hit is not None and time.monotonic() - hit[0] < self.max_age:
+                self._memory.move_to_end((name, decode))
+                return hit[2]
+            future = self._submit(name, decode, progress)
+        return future.result()
+
+    def prefetch(self, name, decode):
+        """Start loading ``name`` in the background. Returns the Future."""
+        with self._lock:
+            return self._submit(name, decode)
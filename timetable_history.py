@@ -0,0 +1,334 @@
+"""
+Timetable History
+
+Keeps every timetable edition the scraper has seen, so old timetables can be
+looked up after KTMB replaces them. The store lives in ``timetables/history``:
+
+editions.parquet
+    One row per edition of a route, appended in the order they were seen:
+    edition_id, route_key, effective_date (YYYY-MM-DD), content_id,
+    schedule_key, pdf_url, pdf_sha256, recorded (date of the run), trains, stops
+
+stop_times.parquet
+    The stops of every distinct route content, once per content_id:
+    content_id, service_id, stop_sequence, station, arrival, departure
+    (minutes since midnight, as in ``timetable_schema``)
+
+Rows are only ever appended. A route gets a new edition when its content
+differs from the edition in force on its effective date (or from its latest
+edition, when that came from the same PDF), and the stops are
+only stored when that content has not been seen before, so the store grows
+with the number of real timetable changes rather than the number of runs.
+
+An edition is valid from its effective date until the effective date of the
+next edition of the same route. When two editions share an effective date
+(a corrected PDF), the one recorded later wins. ``HistoryIndex`` keeps the
+editions of each route sorted by effective date and the stops grouped by
+content and train, so "which timetable was in force for route R on date D"
+is a binary search and "what did train X look like on date D" a dictionary
+lookup on top of it:
+
+    python timetable_history.py 2025-06-01 --route klang_weekdays_route_1
+    python timetable_history.py 2025-06-01 --train 2105
+"""
+
+import argparse
+import hashlib
+import os
+from datetime import date
+import numpy as np
+import pandas as pd
+
+from parquet_writer import write_parquet
+from time_parsing import format_minutes
+from timetable_manifest import route_sources
+from timetable_schema import NO_STOP
+
+HISTORY_DIR = "history"
+EDITIONS_FILE = "editions.parquet"
+CONTENTS_FILE = "stop_times.parquet"
+EDITION_COLUMNS = ['edition_id', 'route_key', 'effective_date', 'content_id', 'schedule_key',
+                   'pdf_url', 'pdf_sha256', 'recorded', 'trains', 'stops']
+CONTENT_COLUMNS = ['content_id', 'service_id', 'stop_sequence', 'station', 'arrival', 'departure']
+
+
+def _date_string(value):
+    """Format a date, datetime or date string as YYYY-MM-DD. None if missing."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+
+def route_contents(stations, stop_times):
+    """
+    Split the long-format tables into the stops of each route.
+
+    Station names are used instead of station ids, since ids are renumbered
+    whenever the set of stations changes.
+
+    Returns:
+    dict: route_key -> DataFrame with the CONTENT_COLUMNS except content_id.
+    """
+    names = stations.set_index('station_id')['station']
+    contents = {}
+    for route_key, rows in stop_times.groupby('route_key', observed=True, sort=True):
+        contents[str(route_key)] = pd.DataFrame({
+            'service_id': rows['service_id'].astype(str).to_numpy(),
+            'stop_sequence': rows['stop_sequence'].to_numpy(dtype=np.int16),
+            'station': rows['station_id'].map(names).to_numpy(),
+            'arrival': rows['arrival'].to_numpy(dtype=np.int16),
+            'departure': rows['departure'].to_numpy(dtype=np.int16),
+        })
+    return contents
+
+
+def content_id(rows):
+    """Content hash of the stops of one route."""
+    return hashlib.sha256(rows.to_csv(index=False).encode()).hexdigest()[:16]
+
+
+def load_history(history_dir):
+    """
+    Read the history store in ``history_dir``.
+
+    Returns:
+    tuple: (editions DataFrame, stop_times DataFrame), empty if there is no store yet.
+    """
+    editions_path = os.path.join(history_dir, EDITIONS_FILE)
+    contents_path = os.path.join(history_dir, CONTENTS_FILE)
+    if not os.path.exists(editions_path) or not os.path.exists(contents_path):
+        return pd.DataFrame(columns=EDITION_COLUMNS), pd.DataFrame(columns=CONTENT_COLUMNS)
+    return pd.read_parquet(editions_path), pd.read_parquet(contents_path)
+
+
+class HistoryIndex:
+    """
+    As-of lookups over the history store.
+
+    Args:
+    editions (DataFrame): editions table.
+    contents (DataFrame): stop_times table of the history store.
+    """
+
+    def __init__(self, editions, contents):
+        editions = editions.astype({'route_key': str, 'effective_date': str, 'content_id': str})
+        editions = editions.sort_values(['route_key', 'effective_date', 'edition_id'], kind='stable')
+        editions = editions.reset_index(drop=True)
+
+        # An edition is valid until the next edition of its route starts
+        route = editions['route_key'].to_numpy(dtype=object)
+        self.valid_from = np.array(editions['effective_date'].tolist(), dtype='datetime64[D]')
+        valid_to = np.full(len(route), np.datetime64('NaT'), dtype='datetime64[D]')
+        valid_to[:-1] = self.valid_from[1:]
+        valid_to[:-1][route[1:] != route[:-1]] = np.datetime64('NaT')
+        editions['valid_from'] = self.valid_from
+        editions['valid_to'] = valid_to
+        self.editions = editions
+
+        # Offsets of each route's editions in the sorted table
+        starts = np.flatnonzero(np.r_[True, route[1:] != route[:-1]]) if len(route) else np.array([], dtype=int)
+        stops = np.r_[starts[1:], len(route)]
+        self._routes = {route[start]: (int(start), int(stop)) for start, stop in zip(starts, stops)}
+
+        # Queries take rows from plain numpy columns, DataFrames are only built for the result
+        self._edition_columns = {col: editions[col].to_numpy() for col in editions.columns}
+        self._edition_columns.update(valid_from=self.valid_from, valid_to=valid_to)
+
+        contents = contents.astype({'content_id': str, 'service_id': str, 'station': str})
+        contents = contents.reset_index(drop=True)
+        self._content_columns = {col: contents[col].to_numpy() for col in CONTENT_COLUMNS[1:]}
+        self._contents = contents.groupby('content_id', sort=False).indices
+        self._trains = contents.groupby(['content_id', 'service_id'], sort=False).indices
+
+        # Routes each train has ever run on, to answer train lookups without a scan
+        content_routes = editions.groupby('content_id')['route_key'].unique()
+        self._train_routes = {}
+        for cid, service_id in self._trains:
+            for route_key in content_routes.get(cid, []):
+                self._train_routes.setdefault(service_id, set()).add(route_key)
+
+    def __len__(self):
+        return len(self.editions)
+
+    def routes(self):
+        """Return every route_key in the store."""
+        return sorted(self._routes)
+
+    def _position(self, route_key, on):
+        start, stop = self._routes.get(route_key, (0, 0))
+        day = np.datetime64(_date_string(on), 'D')
+        position = start + int(np.searchsorted(self.valid_from[start:stop], day, side='right')) - 1
+        return position if position >= start else None
+
+    def edition_on(self, route_key, on):
+        """
+        The edition of ``route_key`` in force on date ``on``.
+
+        Returns:
+        dict: Edition row with valid_from and valid_to (NaT while still in
+            force), or None if the route had no edition yet on that date.
+        """
+        position = self._position(route_key, on)
+        if position is None:
+            return None
+        return {col: values[position] for col, values in self._edition_columns.items()}
+
+    def latest_edition(self, route_key):
+        """The edition of ``route_key`` with the latest effective date, or None if it has none."""
+        start, stop = self._routes.get(route_key, (0, 0))
+        if stop == start:
+            return None
+        return {col: values[stop - 1] for col, values in self._edition_columns.items()}
+
+    def route_history(self, route_key):
+        """Return every edition of ``route_key`` with its validity interval, oldest first."""
+        start, stop = self._routes.get(route_key, (0, 0))
+        return self.editions.iloc[start:stop].reset_index(drop=True)
+
+    def _rows(self, positions, **columns):
+        rows = {col: np.broadcast_to(value, len(positions)) for col, value in columns.items()}
+        rows.update((col, values[positions]) for col, values in self._content_columns.items())
+        return pd.DataFrame(rows)
+
+    def timetable_on(self, route_key, on):
+        """
+        The stops of ``route_key`` as they were on date ``on``.
+
+        Returns:
+        DataFrame: service_id, stop_sequence, station, arrival, departure.
+            Empty if the route had no edition yet on that date.
+        """
+        edition = self.edition_on(route_key, on)
+        positions = np.array([], dtype=int) if edition is None else self._contents[edition['content_id']]
+        return self._rows(positions)
+
+    def train_on(self, service_id, on):
+        """
+        The stops of train ``service_id`` on date ``on``, on every route it ran on.
+
+        Returns:
+        DataFrame: route_key, effective_date and the stops of the train.
+            Empty if the train did not run on that date.
+        """
+        service_id = str(service_id)
+        parts = []
+        for route_key in sorted(self._train_routes.get(service_id, ())):
+            edition = self.edition_on(route_key, on)
+            positions = None if edition is None else self._trains.get((edition['content_id'], service_id))
+            if positions is None:
+                continue
+            parts.append(self._rows(positions, route_key=route_key, effective_date=edition['effective_date']))
+        if not parts:
+            return self._rows(np.array([], dtype=int), route_key='', effective_date='')
+        return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+
+def record_editions(history_dir, stations, stop_times, manifest=None, recorded=None):
+    """
+    Append the routes of ``stop_times`` that are new editions to the history store.
+
+    Args:
+    history_dir (str): Folder of the history store.
+    stations (DataFrame): stations table.
+    stop_times (DataFrame): stop_times table of the current timetables.
+    manifest (dict): PDF manifest, for each route's effective date and source PDF.
+        Routes without one are recorded as effective from ``recorded``.
+    recorded (date): Date of the run. Today if None.
+
+    Returns:
+    list: The appended edition rows (dicts). Empty if nothing changed.
+    """
+    recorded = _date_string(recorded or date.today())
+    editions, contents = load_history(history_dir)
+    index = HistoryIndex(editions, contents)
+    sources = route_sources(manifest)
+    known = set(contents['content_id'].astype(str))
+    next_id = int(editions['edition_id'].max()) + 1 if len(editions) else 1
+
+    new_editions, new_contents = [], []
+    for route_key, rows in route_contents(stations, stop_times).items():
+        cid = content_id(rows)
+        schedule_key, entry = sources.get(route_key, (None, {}))
+        effective_date = _date_string(entry.get('Effective_Date')) or recorded
+        current = index.edition_on(route_key, effective_date)
+        if current is not None and current['content_id'] == cid:
+            continue
+        # A route first recorded on the run date (no manifest entry) must not be added
+        # again when a later run knows the real, earlier effective date of the same PDF.
+        # An older PDF with the same content is a separate edition and is kept.
+        latest = index.latest_edition(route_key)
+        if latest is not None and latest['content_id'] == cid and \
+                (pd.isna(latest['pdf_url']) or latest['pdf_url'] == entry.get('PDF Links')):
+            continue
+
+        new_editions.append({
+            'edition_id': next_id,
+            'route_key': route_key,
+            'effective_date': effective_date,
+            'content_id': cid,
+            'schedule_key': schedule_key,
+            'pdf_url': entry.get('PDF Links'),
+            'pdf_sha256': entry.get('SHA256'),
+            'recorded': recorded,
+            'trains': rows['service_id'].nunique(),
+            'stops': int((rows['departure'] != NO_STOP).sum()),
+        })
+        next_id += 1
+        if cid not in known:
+            known.add(cid)
+            new_contents.append(rows.assign(content_id=cid))
+
+    if not new_editions:
+        return []
+
+    editions = pd.concat([editions, pd.DataFrame(new_editions)], ignore_index=True)[EDITION_COLUMNS]
+    editions = editions.astype({'edition_id': np.int32, 'trains': np.int16, 'stops': np.int32})
+    if new_contents:
+        contents = pd.concat([contents.astype({col: str for col in ['content_id', 'service_id', 'station']})]
+                             + new_contents, ignore_index=True)[CONTENT_COLUMNS]
+        for col in ['content_id', 'service_id', 'station']:
+            contents[col] = contents[col].astype(str).astype('category')
+        contents = contents.astype({'stop_sequence': np.int16, 'arrival': np.int16, 'departure': np.int16})
+        # Stops first, so the editions never refer to a content that is not stored
+        write_parquet(contents, os.path.join(history_dir, CONTENTS_FILE))
+    write_parquet(editions, os.path.join(history_dir, EDITIONS_FILE))
+    return new_editions
+
+
+def build_history_index(data_dir):
+    """Build a HistoryIndex from the history store of the timetables in ``data_dir``."""
+    return HistoryIndex(*load_history(os.path.join(data_dir, HISTORY_DIR)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Look up the KTMB timetables in force on a date.")
+    parser.add_argument('on', help="Date, e.g. 2025-06-01")
+    parser.add_argument('--route', help="Route file name, e.g. klang_weekdays_route_1")
+    parser.add_argument('--train', help="Train number, e.g. 2105")
+    parser.add_argument('--data-dir', default=os.path.join(os.getcwd(), "timetables"))
+    args = parser.parse_args(argv)
+
+    index = build_history_index(args.data_dir)
+    print(f"{len(index)} editions of {len(index.routes())} routes in the history store.")
+
+    routes = [args.route] if args.route else ([] if args.train else index.routes())
+    for route_key in routes:
+        edition = index.edition_on(route_key, args.on)
+        if edition is None:
+            print(f"{route_key}: no timetable in force on {args.on}")
+            continue
+        valid_to = 'now' if np.isnat(edition['valid_to']) else edition['valid_to']
+        source = f" from {edition['pdf_url']}" if pd.notna(edition['pdf_url']) else ""
+        print(f"{route_key}: edition {edition['edition_id']} effective {edition['effective_date']} "
+              f"to {valid_to}, {edition['trains']} trains{source}")
+
+    if args.train:
+        stops = index.train_on(args.train, args.on)
+        if stops.empty:
+            print(f"Train {args.train} did not run on {args.on}")
+        for row in stops[stops['departure'] != NO_STOP].itertuples(index=False):
+            print(f"{row.route_key:<28} {row.station:<24} {format_minutes(row.departure)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Timetable Index
+
+One read-only object with every query engine the apps use, built from one
+version of the timetable data:
+
+- ``schedule``  ScheduleIndex, next trains between two stations
+- ``boards``    DepartureBoard per service day
+- ``planner``   JourneyPlanner, journeys with changes of train
+- ``stations``  all station names
+
+``data_version`` identifies the data on disk cheaply (the bundle's content hash,
+or the size and modification time of the parquet files when there is no
+bundle), so a server can build the index once per version and share it between
+all sessions. The numpy arrays of the engines are made read-only, so a shared
+index cannot be modified by accident.
+
+``IndexWatcher`` keeps an index up to date while the app runs. It notices new
+data on disk, e.g. after the nightly scrape is pulled, rebuilds in the
+background and swaps the new index in.
+"""
+
+import hashlib
+import os
+import threading
+from datetime import datetime
+import numpy as np
+
+from departure_board import build_departure_boards
+from journey_planner import JourneyPlanner
+from schedule_index import ScheduleIndex
+from timetable_bundle import BUNDLE_FILE, bundle_version, load_timetables
+
+RELOAD_INTERVAL = float(os.environ.get("KTMB_RELOAD_INTERVAL", 30))  # seconds between data checks
+
+
+def data_version(data_dir):
+    """Return a string that changes whenever the timetable data in ``data_dir`` changes."""
+    version = bundle_version(os.path.join(data_dir, BUNDLE_FILE))
+    if version:
+        return version
+
+    digest = hashlib.sha256()
+    for file_name in sorted(os.listdir(data_dir)):
+        if file_name.endswith('.parquet'):
+            info = os.stat(os.path.join(data_dir, file_name))
+            digest.update(f"{file_name}:{info.st_size}:{info.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+
+def _freeze(engine):
+    """Make the numpy arrays held by ``engine`` read-only."""
+    for value in vars(engine).values():
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+
+
+class TimetableIndex:
+    """
+    Every query engine for one version of the timetables.
+
+    Args:
+    stations (DataFrame): stations table (station_id, station).
+    stop_times (DataFrame): stop_times table.
+    version (str): Data version the index was built from.
+    """
+
+    def __init__(self, stations, stop_times, version=None):
+        self.version = version
+        self.stations = stations['station'].tolist()
+        self.schedule = ScheduleIndex(stations, stop_times)
+        self.boards = build_departure_boards(stations, stop_times)
+        self.planner = JourneyPlanner(stations, stop_times)
+
+        _freeze(self.schedule)
+        for board in self.boards.values():
+            _freeze(board)
+        for timetable in self.planner.timetables.values():
+            _freeze(timetable)
+
+    def line_stations(self, line):
+        """Return the station names of ``line`` in route order."""
+        return self.schedule.line_stations(line)
+
+
+def build_timetable_index(data_dir):
+    """Build a TimetableIndex from the timetables in ``data_dir``."""
+    version = data_version(data_dir)
+    stations, stop_times = load_timetables(data_dir)
+    return TimetableIndex(stations, stop_times, version)
+
+
+class IndexWatcher:
+    """
+    Keeps a TimetableIndex in sync with the data in ``data_dir``.
+
+    The first index is built when the watcher is created. After ``start()``, a
+    daemon thread checks ``data_version`` every ``interval`` seconds. When the
+    version changes, that thread builds a new index and swaps it in with a single
+    reference assignment. Readers of ``watcher.index`` always get a complete index
+    and never wait for a rebuild. If a rebuild fails, the old index stays.
+
+    Args:
+    data_dir (str): Folder with the timetable files.
+    interval (float): Seconds between checks.
+    """
+
+    def __init__(self, data_dir, interval=RELOAD_INTERVAL):
+        self.data_dir = data_dir
+        self.interval = interval
+        self.index = build_timetable_index(data_dir)
+        self._failed_version = None  # not retried until the data changes again
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """
+        Rebuild and swap the index if the data changed.
+
+        Returns:
+        bool: True if a new index was swapped in.
+        """
+        version = data_version(self.data_dir)
+        if version in (self.index.version, self._failed_version):
+            return False
+        try:
+            index = build_timetable_index(self.data_dir)
+        except Exception as e:
+            self._failed_version = version
+            print(f"[{datetime.now()}] Could not reload timetables from {self.data_dir}: {e}")
+            return False
+        self.index = index
+        print(f"[{datetime.now()}] Reloaded timetables, data version {index.version}")
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"[{datetime.now()}] Timetable watcher error: {e}")
+
+    def start(self):
+        """Start the background thread. Returns the watcher."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="timetable-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,124 @@
+"""
+PDF Manifest
+
+Keeps track of every timetable PDF the scraper has processed, one row per
+schedule key (e.g. ``klang_weekdays`` or ``utara``):
+
+- PDF URL
+- ETag / Last-Modified returned by ktmb.com.my (used for conditional requests)
+- SHA-256 of the downloaded PDF
+- Effective date of the timetable
+- Parquet files produced from the PDF
+
+The manifest is stored next to the timetables as ``pdf_manifest.parquet`` so it
+is committed together with them by the daily-scrape workflow.
+"""
+
+import os
+import pandas as pd
+
+from parquet_writer import write_parquet
+
+MANIFEST_FILE = "pdf_manifest.parquet"
+MANIFEST_COLUMNS = ['schedule_key', 'PDF Links', 'ETag', 'Last-Modified', 'SHA256', 'Effective_Date', 'Outputs']
+
+
+def load_manifest(data_dir):
+    """
+    Load the manifest from ``data_dir``.
+
+    Returns:
+    dict: schedule_key -> manifest entry (dict). Empty if no manifest exists yet.
+    """
+    path = os.path.join(data_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        df = pd.read_parquet(path)
+    except Exception as e:
+        print(f"Could not read manifest {path}: {e}")
+        return {}
+
+    manifest = {}
+    for record in df.to_dict('records'):
+        record = {k: (None if pd.isna(v) else v) for k, v in record.items()}
+        record['Outputs'] = [o for o in (record.get('Outputs') or '').split(',') if o]
+        manifest[record['schedule_key']] = record
+    return manifest
+
+
+def save_manifest(manifest, data_dir):
+    """
+    Save the manifest to ``data_dir`` if its content changed.
+
+    Returns:
+    bool: True if the file was written.
+    """
+    path = os.path.join(data_dir, MANIFEST_FILE)
+    rows = []
+    for key in sorted(manifest):
+        entry = dict(manifest[key])
+        entry['schedule_key'] = key
+        entry['Outputs'] = ','.join(sorted(entry.get('Outputs') or []))
+        rows.append({col: entry.get(col) for col in MANIFEST_COLUMNS})
+    df = pd.DataFrame(rows, columns=MANIFEST_COLUMNS).astype(object)
+    return write_parquet(df, path)
+
+
+def route_sources(manifest):
+    """Return route_key -> (schedule_key, manifest entry) for every output in ``manifest``."""
+    sources = {}
+    for schedule_key, entry in (manifest or {}).items():
+        for route_key in entry.get('Outputs') or []:
+            sources[route_key] = (schedule_key, entry)
+    return sources
+
+
+def conditional_headers(entry, pdf_url):
+    """
+    Build If-None-Match / If-Modified-Since headers for ``pdf_url``.
+
+    Validators are only sent when the manifest entry refers to the same URL.
+    """
+    headers = {}
+    if not entry or entry.get('PDF Links') != pdf_url:
+        return headers
+    if entry.get('ETag'):
+        headers['If-None-Match'] = entry['ETag']
+    if entry.get('Last-Modified'):
+        headers['If-Modified-Since'] = entry['Last-Modified']
+    return headers
+
+
+def outputs_exist(entry, data_dir):
+    """Check that every parquet file recorded for the entry is still on disk."""
+    if not entry or not entry.get('Outputs'):
+        return False
+    return all(os.path.exists(os.path.join(data_dir, f"{name}.parquet")) for name in entry['Outputs'])
+
+
+def update_entry(manifest, schedule_key, pdf_url, effective_date, result, outputs=None):
+    """
+    Record the outcome of a download for ``schedule_key``.
+
+    Args:
+    manifest (dict): Manifest loaded with ``load_manifest``.
+    schedule_key (str): Schedule key, e.g. "klang_weekdays".
+    pdf_url (str): URL of the PDF.
+    effective_date (str): Effective date of the timetable (YYYY-MM-DD).
+    result (dict): Result of ``pdf_downloader.fetch_pdf``.
+    outputs (list): Names of the parquet files produced. Keeps the previous
+        outputs when None.
+    """
+    previous = manifest.get(schedule_key) or {}
+    manifest[schedule_key] = {
+        'schedule_key': schedule_key,
+        'PDF Links': pdf_url,
+        'ETag': result.get('etag') or previous.get('ETag'),
+        'Last-Modified': result.get('last_modified') or previous.get('Last-Modified'),
+        'SHA256': result.get('sha256') or previous.get('SHA256'),
+        'Effective_Date': effective_date,
+        'Outputs': list(outputs) if outputs is not None else previous.get('Outputs', []),
+    }
+    return manifest[schedule_key]
@@ -0,0 +1,184 @@
+"""
+Long-Format Timetable Schema
+
+The route parquet files are wide tables of strings: a ``STATION`` column plus
+one column per train. This module turns them into a normalized long form that
+query code can use as compact numeric arrays:
+
+stations.parquet
+    station_id (int16), station (str)
+
+stop_times.parquet
+    route_key (category)    e.g. "klang_weekdays_route_1"
+    line (category)         e.g. "klang", "utara_ipoh"
+    service_day (category)  "WEEKDAYS", "WEEKENDS" or "DAILY"
+    direction (int8)        route number of the file (1 or 2)
+    service_id (category)   train number
+    stop_sequence (int16)   position of the station on the route, from 1
+    station_id (int16)
+    arrival (int16)         minutes since midnight of the service day
+    departure (int16)       minutes since midnight of the service day
+
+Every station of a route has a row for every train. Trains that do not stop
+there have ``NO_STOP`` as arrival and departure. Times after midnight are
+given as 1440 + minutes so they stay in order along a trip.
+"""
+
+import os
+import re
+import numpy as np
+import pandas as pd
+
+from time_parsing import parse_times, INVALID
+
+STATIONS_FILE = "stations.parquet"
+STOP_TIMES_FILE = "stop_times.parquet"
+NO_STOP = INVALID
+MINUTES_PER_DAY = 24 * 60
+
+# klang_weekdays_route_1, batu_caves_weekends_route_2, utara_ipoh_1, utara_route_3
+ROUTE_FILE_PATTERN = re.compile(
+    r'^(?P<line>[a-z_]+?)_(?:(?P<day>weekdays|weekends)_)?(?:route_)?(?P<direction>\d+)$'
+)
+STOP_TIMES_COLUMNS = [
+    'route_key', 'line', 'service_day', 'direction', 'service_id',
+    'stop_sequence', 'station_id', 'arrival', 'departure'
+]
+
+
+def parse_route_key(route_key):
+    """
+    Split a route file name into line, service day and direction.
+
+    Returns:
+    dict: line, service_day and direction, or None if the name is not a route file.
+    """
+    match = ROUTE_FILE_PATTERN.match(route_key)
+    if not match:
+        return None
+    return {
+        'line': match.group('line'),
+        'service_day': (match.group('day') or 'daily').upper(),
+        'direction': int(match.group('direction')),
+    }
+
+
+def route_files(data_dir):
+    """Return route_key -> parquet path for every route file in ``data_dir``."""
+    files = {}
+    for file_name in sorted(os.listdir(data_dir)):
+        route_key, ext = os.path.splitext(file_name)
+        if ext == '.parquet' and parse_route_key(route_key):
+            files[route_key] = os.path.join(data_dir, file_name)
+    return files
+
+
+def _unwrap_midnight(grid):
+    """
+    Add a day to times that run past midnight, per train column.
+
+    A time more than 12 hours earlier than the previous stop of the same train
+    is taken to be on the next day.
+    """
+    grid = grid.copy()
+    for j in range(grid.shape[1]):
+        column = grid[:, j]
+        stops = np.flatnonzero(column != NO_STOP)
+        if len(stops) < 2:
+            continue
+        times = column[stops]
+        days = np.concatenate(([0], np.cumsum(np.diff(times) < -MINUTES_PER_DAY // 2)))
+        column[stops] = times + days * MINUTES_PER_DAY
+    return grid
+
+
+def time_grid(df):
+    """
+    Return the stations x trains grid of a wide route table as int16 minutes.
+
+    Returns:
+    numpy.ndarray: shape (len(df), len(df.columns) - 1), NO_STOP where the train
+        does not stop.
+    """
+    trains = df.columns[1:]
+    if len(trains) == 0:
+        return np.empty((len(df), 0), dtype=np.int16)
+    values = df[trains].to_numpy(dtype=object)
+    minutes, _ = parse_times(values)
+    grid = minutes.astype(np.int32).reshape(values.shape)
+    return _unwrap_midnight(grid).astype(np.int16)
+
+
+def build_long_format(wide_tables):
+    """
+    Build the stations and stop_times tables from wide route tables.
+
+    Args:
+    wide_tables (dict): route_key -> wide DataFrame with a STATION column.
+
+    Returns:
+    tuple: (stations DataFrame, stop_times DataFrame)
+    """
+    names = set()
+    for df in wide_tables.values():
+        names.update(df['STATION'].astype(str).str.strip().str.upper())
+    names.discard('')
+    stations = pd.DataFrame({'station': sorted(names)})
+    stations.insert(0, 'station_id', np.arange(len(stations), dtype=np.int16))
+    station_ids = dict(zip(stations['station'], stations['station_id']))
+
+    parts = []
+    for route_key in sorted(wide_tables):
+        df = wide_tables[route_key]
+        info = parse_route_key(route_key) or {'line': route_key, 'service_day': 'DAILY', 'direction': 1}
+        station_names = df['STATION'].astype(str).str.strip().str.upper()
+        keep = (station_names != '').to_numpy()
+        grid = time_grid(df)[keep]
+        ids = station_names[keep].map(station_ids).to_numpy(dtype=np.int16)
+        n_stations, n_trains = grid.shape
+        if n_stations == 0 or n_trains == 0:
+            continue
+
+        # Column-major so that each train's stops are contiguous and in route order
+        times = grid.ravel(order='F')
+        parts.append(pd.DataFrame({
+            'route_key': route_key,
+            'line': info['line'],
+            'service_day': info['service_day'],
+            'direction': np.int8(info['direction']),
+            'service_id': np.repeat([str(col).strip() for col in df.columns[1:]], n_stations),
+            'stop_sequence': np.tile(np.arange(1, n_stations + 1, dtype=np.int16), n_trains),
+            'station_id': np.tile(ids, n_trains),
+            'arrival': times,
+            'departure': times,
+        }))
+
+    if parts:
+        stop_times = pd.concat(parts, ignore_index=True)
+    else:
+        stop_times = pd.DataFrame(columns=STOP_TIMES_COLUMNS)
+
+    for col in ['route_key', 'line', 'service_day', 'service_id']:
+        stop_times[col] = stop_times[col].astype('category')
+    stop_times = stop_times.astype({
+        'direction': np.int8, 'stop_sequence': np.int16, 'station_id': np.int16,
+        'arrival': np.int16, 'departure': np.int16,
+    })
+    return stations, stop_times[STOP_TIMES_COLUMNS]
+
+
+def load_wide_tables(data_dir):
+    """Read every route parquet file in ``data_dir``."""
+    return {route_key: pd.read_parquet(path) for route_key, path in route_files(data_dir).items()}
+
+
+def load_long_format(data_dir):
+    """
+    Read stations.parquet and stop_times.parquet from ``data_dir``.
+
+    Returns:
+    tuple: (stations DataFrame, stop_times DataFrame)
+    """
+    stations = pd.read_parquet(os.path.join(data_dir, STATIONS_FILE))
+    stop_times = pd.read_parquet(os.path.join(data_dir, STOP_TIMES_FILE))
+    return stations, stop_times
@@ -1,351 +1,378 @@
-import streamlit as st
-import pandas as pd
-from datetime import datetime, timedelta
-
-# --- CONFIG ---
-st.set_page_config(
-    page_title="KTM Train Schedule",
-    page_icon="🚆",
-    layout="centered"
-)
-
-# --- GLOBAL TIME ---
-# kl_time = datetime.now()
-kl_time = datetime.now() + timedelta(hours=8)  # UTC+8 for Kuala Lumpur
-time_depart = kl_time.time().replace(second=0, microsecond=0)
-
-# --- CACHE FILE LOADING ---
-@st.cache_data
-def load_parquet(path):
-    return pd.read_parquet(path)
-
-
-# --- TIME HELPERS ---
-def parse_time_to_minutes(t):
-    """Convert timetable value into minutes since midnight."""
-    t_str = str(t).strip()
-    if ":" in t_str:
-        h, m = t_str.split(":")
-    elif len(t_str) <= 3:  # e.g. "615" -> "6:15"
-        h, m = "0", t_str.zfill(2)
-    else:  # e.g. "1026" -> "10:26"
-        h, m = t_str[:-2], t_str[-2:]
-    return int(h) * 60 + int(m)
-
-
-def get_train_schedules(file_map, selected_route, selected_schedule, departure, destination, filter_time=None):
-    key = (selected_route, selected_schedule)
-    if key not in file_map:
-        return pd.DataFrame()
-
-    files = file_map[key]
-    if len(files) != 2:
-        return pd.DataFrame()
-
-    try:
-        df1, df2 = load_parquet(files[0]), load_parquet(files[1])
-    except Exception:
-        return pd.DataFrame()
-
-    # Pick the dataframe where departure appears first
-    idx1 = df1.index[df1['STATION'] == departure].tolist()
-    idx2 = df2.index[df2['STATION'] == departure].tolist()
-    chosen_df = df1 if (idx1 and (not idx2 or idx1[0] <= idx2[0])) else df2
-
-    if departure not in chosen_df['STATION'].values or destination not in chosen_df['STATION'].values:
-        return pd.DataFrame()
-
-    valid_services = []
-    for col in chosen_df.columns[1:]:
-        dep_time = chosen_df.loc[chosen_df['STATION'] == departure, col].values[0]
-        dest_time = chosen_df.loc[chosen_df['STATION'] == destination, col].values[0]
-
-        if pd.isna(dep_time) or pd.isna(dest_time):
-            continue
-
-        dep_time_str, dest_time_str = str(dep_time).strip(), str(dest_time).strip()
-        if not dep_time_str or not dest_time_str:
-            continue
-
-        # Filter based on current/custom time if provided
-        if filter_time is not None:
-            try:
-                dep_minutes = parse_time_to_minutes(dep_time_str)
-                if dep_minutes < filter_time:
-                    continue
-            except Exception:
-                pass
-
-        valid_services.append({
-            "Service_ID": col,
-            "Departure_Station": departure,
-            "Departure_Time": dep_time_str,
-            "Arrival_Station": destination,
-            "Arrival_Time": dest_time_str
-        })
-
-    return pd.DataFrame(valid_services)
-
-
-# --- FILE MAPPING ---
-file_map = {
-    ("Batu Caves - Pulau Sebang", "Weekdays"): [
-        "timetables/batu_caves_weekdays_route_1.parquet",
-        "timetables/batu_caves_weekdays_route_2.parquet",
-    ],
-    ("Batu Caves - Pulau Sebang", "Weekends"): [
-        "timetables/batu_caves_weekends_route_1.parquet",
-        "timetables/batu_caves_weekends_route_2.parquet",
-    ],
-    ("Tanjung Malim - Pelabuhan Klang", "Weekdays"): [
-        "timetables/klang_weekdays_route_1.parquet",
-        "timetables/klang_weekdays_route_2.parquet",
-    ],
-    ("Tanjung Malim - Pelabuhan Klang", "Weekends"): [
-        "timetables/klang_weekends_route_1.parquet",
-        "timetables/klang_weekends_route_2.parquet",
-    ],
-    ("Padang Besar - Butterworth", "Not applicable"): [
-        "timetables/utara_padangbesar_1.parquet",
-        "timetables/utara_padangbesar_2.parquet",
-    ],
-    ("Ipoh - Butterworth", "Not applicable"): [
-        "timetables/utara_ipoh_1.parquet",
-        "timetables/utara_ipoh_2.parquet",
-    ],
-}
-
-# --- HEADER ---
-st.markdown("""
-<div style="text-align: center; padding: 0.5rem 1rem;">
-    <h1 style="color:#2563eb; font-size:1.8rem; margin:0; font-weight:700;">
-        🚆 KTM <span style="color:#fbbf24;">Schedule</span>
-    </h1>
-    <p style="color:#6b7280; font-size:0.9rem; margin:0.25rem 0;">
-        Check KTMB train schedules across Malaysia
-    </p>
-</div>
-""", unsafe_allow_html=True)
-
-
-# --- INPUTS ---
-
-
-with st.expander("🎯 Select Journey", expanded=True):
-
-    col1, col2 = st.columns([2, 1])
-
-    routes = [
-        "Batu Caves - Pulau Sebang",
-        "Tanjung Malim - Pelabuhan Klang",
-        "Padang Besar - Butterworth",
-        "Ipoh - Butterworth"
-    ]
-
-    with col1:
-        selected_route = st.selectbox("Route", ["Select a route"] + routes)
-
-    with col2:
-        if selected_route in ["Padang Besar - Butterworth", "Ipoh - Butterworth"]:
-            selected_schedule = "Not applicable"
-            st.selectbox("Schedule Type", ["Not applicable"], disabled=True)
-        else:
-            selected_schedule = st.selectbox("Schedule Type", ["Select schedule type", "Weekdays", "Weekends"])
-
-    # --- STATIONS ---
-    if selected_route != "Select a route":
-        key = (selected_route, selected_schedule)
-        if key in file_map:
-            try:
-                df = load_parquet(file_map[key][0])
-                station_list = sorted(df["STATION"].dropna().unique())
-            except Exception:
-                st.error("⚠️ Could not load station list.")
-                st.stop()
-
-            # --- Station Selection ---
-            st.markdown("### 🎯 Select Stations")
-            col1, col2 = st.columns(2)
-            departure = col1.selectbox("From", ["Select departure"] + station_list)
-            destination = col2.selectbox("To", ["Select destination"] + station_list)
-
-            # --- TIME FILTER ---
-            st.caption(f"⏰ Current time: **{time_depart.strftime('%I:%M %p')}**")
-            use_custom_time = st.checkbox("Show past schedules / choose custom time")
-            if use_custom_time:
-                time_depart = st.slider("Select departure time", value=time_depart, step=timedelta(minutes=15))
-                filter_minutes = time_depart.hour * 60 + time_depart.minute
-            else:
-                filter_minutes = kl_time.hour * 60 + kl_time.minute  # filter by *current* KL time
-
-# --- DISPLAY RESULT ---
-if selected_route != "Select a route":
-    if 'departure' in locals() and 'destination' in locals():
-        if departure != "Select departure" and destination != "Select destination":
-            if departure == destination:
-                st.warning("📍 Departure and destination cannot be the same.")
-            else:
-                st.markdown(f"""
-                    <div style="background:#e6f7ff; padding:12px; border-radius:8px; border-left:5px solid #1f77b4; text-align:center;">
-                        <h3 style="color:#1f77b4; margin:0;">🚆 {departure} → {destination}</h3>
-                    </div>
-                """, unsafe_allow_html=True)
-
-                with st.spinner("🕒 Loading schedule..."):
-                    schedule_df = get_train_schedules(
-                        file_map, selected_route, selected_schedule,
-                        departure, destination, filter_time=filter_minutes
-                    )
-                    if not schedule_df.empty:
-                        try:
-                            # --- Find the next train ---
-                            schedule_df["Dep_Minutes"] = schedule_df["Departure_Time"].apply(parse_time_to_minutes)
-                            next_train_idx = schedule_df["Dep_Minutes"].idxmin()
-
-                            def highlight_next(row):
-                                return ['background-color: #d1fae5; font-weight: bold;' if row.name == next_train_idx else '' for _ in row]
-
-                            styled_df = (
-                                schedule_df.drop(columns=["Dep_Minutes"])
-                                .style
-                                .apply(highlight_next, axis=1)
-                                .hide(axis="index")   # 🔹 Hide index
-                                .set_table_styles([   # 🔹 Bold header
-                                    {'selector': 'th',
-                                    'props': [('font-weight', 'bold'),
-                                            ('background-color', '#f9fafb')]}
-                                ])
-                                .set_properties(      # 🔹 Center align Departure & Arrival
-                                    subset=["Departure_Time", "Arrival_Time"],
-                                    **{'text-align': 'center'}
-                                )
-                            )
-
-                            st.dataframe(styled_df, use_container_width=True, height=400)
-                            st.success(f"✅ Next available train: **{schedule_df.loc[next_train_idx, 'Departure_Time']}** from {departure}")
-                        except Exception:
-                            st.dataframe(schedule_df, use_container_width=True, height=400)
-                    else:
-                        st.info("📭 No upcoming train schedule found.")
-
-else:
-    st.info("🚆 Please select a route to begin.")
-
-# --- FOOTER ---
-st.markdown("---")
-st.markdown("<p style='text-align:center; font-size:0.8rem; color:#6b7280;'>Created by: ubaid</p>", unsafe_allow_html=True)
-
-
-
-
-
-
-
-
-
-
-# with st.expander("🎯 Select Journey", expanded=True):
-
-#     col1, col2 = st.columns([2, 1])
-
-#     routes = [
-#         "Batu Caves - Pulau Sebang",
-#         "Tanjung Malim - Pelabuhan Klang",
-#         "Padang Besar - Butterworth",
-#         "Ipoh - Butterworth"
-#     ]
-
-#     with col1:
-#         selected_route = st.selectbox("Route", ["Select a route"] + routes)
-
-#     with col2:
-#         if selected_route in ["Padang Besar - Butterworth", "Ipoh - Butterworth"]:
-#             selected_schedule = "Not applicable"
-#             st.selectbox("Schedule Type", ["Not applicable"], disabled=True)
-#         else:
-#             selected_schedule = st.selectbox("Schedule Type", ["Select schedule type", "Weekdays", "Weekends"])
-
-
-# # --- STATIONS ---
-# if selected_route != "Select a route":
-#     key = (selected_route, selected_schedule)
-#     if key in file_map:
-#         try:
-#             df = load_parquet(file_map[key][0])
-#             station_list = sorted(df["STATION"].dropna().unique())
-#         except Exception:
-#             st.error("⚠️ Could not load station list.")
-#             st.stop()
-
-
-#         # --- Station Selection ---
-#         st.markdown("### 🎯 Select Stations")
-#         col1, col2 = st.columns(2)
-#         departure = col1.selectbox("From", ["Select departure"] + station_list)
-#         destination = col2.selectbox("To", ["Select destination"] + station_list)
-
-#         # --- TIME FILTER ---
-#         st.caption(f"⏰ Current time: **{time_depart.strftime('%I:%M %p')}**")
-#         use_custom_time = st.checkbox("Show past schedules / choose custom time")
-#         if use_custom_time:
-#             time_depart = st.slider("Select departure time", value=time_depart, step=timedelta(minutes=15))
-#             filter_minutes = time_depart.hour * 60 + time_depart.minute
-#         else:
-#             filter_minutes = kl_time.hour * 60 + kl_time.minute  # filter by *current* KL time
-
-#         # --- DISPLAY RESULT ---
-#         if departure != "Select departure" and destination != "Select destination":
-#             if departure == destination:
-#                 st.warning("📍 Departure and destination cannot be the same.")
-#             else:
-#                 st.markdown(f"""
-#                     <div style="background:#e6f7ff; padding:12px; border-radius:8px; border-left:5px solid #1f77b4; text-align:center;">
-#                         <h3 style="color:#1f77b4; margin:0;">🚆 {departure} → {destination}</h3>
-#                     </div>
-#                 """, unsafe_allow_html=True)
-
-#                 with st.spinner("🕒 Loading schedule..."):
-#                     schedule_df = get_train_schedules(
-#                         file_map, selected_route, selected_schedule,
-#                         departure, destination, filter_time=filter_minutes
-#                     )
-#                     if not schedule_df.empty:
-#                         try:
-#                             # --- Find the next train ---
-#                             schedule_df["Dep_Minutes"] = schedule_df["Departure_Time"].apply(parse_time_to_minutes)
-#                             next_train_idx = schedule_df["Dep_Minutes"].idxmin()
-
-#                             def highlight_next(row):
-#                                 return ['background-color: #d1fae5; font-weight: bold;' if row.name == next_train_idx else '' for _ in row]
-
-#                             styled_df = (
-#                                 schedule_df.drop(columns=["Dep_Minutes"])
-#                                 .style
-#                                 .apply(highlight_next, axis=1)
-#                                 .hide(axis="index")   # 🔹 Hide index
-#                                 .set_table_styles([   # 🔹 Bold header
-#                                     {'selector': 'th',
-#                                     'props': [('font-weight', 'bold'),
-#                                             ('background-color', '#f9fafb')]}
-#                                 ])
-#                                 .set_properties(      # 🔹 Center align Departure & Arrival
-#                                     subset=["Departure_Time", "Arrival_Time"],
-#                                     **{'text-align': 'center'}
-#                                 )
-#                             )
-
-#                             st.dataframe(styled_df, use_container_width=True, height=400)
-#                             st.success(f"✅ Next available train: **{schedule_df.loc[next_train_idx, 'Departure_Time']}** from {departure}")
-#                         except Exception:
-#                             st.dataframe(schedule_df, use_container_width=True, height=400)
-#                     else:
-#                         st.info("📭 No upcoming train schedule found.")
-
-
-
-# else:
-#     st.info("🚆 Please select a route to begin.")
-
-# # --- FOOTER ---
-# st.markdown("---")
-# st.markdown("<p style='text-align:center; font-size:0.8rem; color:#6b7280;'>Created by: ubaid</p>", unsafe_allow_html=True)
+import streamlit as st
+import os
+import pandas as pd
+from datetime import datetime, timedelta
+
+from time_parsing import parse_times
+from timetable_schema import parse_route_key
+from timetable_index import IndexWatcher
+from departure_board import SERVICE_DAYS, service_day_for
+
+# --- CONFIG ---
+st.set_page_config(
+    page_title="KTM Train Schedule",
+    page_icon="🚆",
+    layout="centered"
+)
+
+# --- GLOBAL TIME ---
+# kl_time = datetime.now()
+kl_time = datetime.now() + timedelta(hours=8)  # UTC+8 for Kuala Lumpur
+time_depart = kl_time.time().replace(second=0, microsecond=0)
+
+# --- SHARED TIMETABLE INDEX ---
+# One watcher per process: it rebuilds the index in the background when the
+# timetables on disk change and swaps it in, so reruns never wait for a reload.
+# The index is shared by every session and read-only: never modify it in place.
+@st.cache_resource
+def get_index_watcher(data_dir="timetables"):
+    return IndexWatcher(data_dir).start()
+
+
+def get_timetable_index(data_dir="timetables"):
+    return get_index_watcher(data_dir).index
+
+
+def route_info_for(files):
+    # Line and service day come from the route file names, e.g. klang_weekdays_route_1
+    return parse_route_key(os.path.splitext(os.path.basename(files[0]))[0])
+
+
+def get_train_schedules(file_map, selected_route, selected_schedule, departure, destination, filter_time=None):
+    key = (selected_route, selected_schedule)
+    if key not in file_map:
+        return pd.DataFrame()
+
+    route_info = route_info_for(file_map[key])
+    if route_info is None:
+        return pd.DataFrame()
+    service_day = route_info["service_day"]
+    if service_day not in SERVICE_DAYS:  # DAILY routes run on every service day
+        service_day = service_day_for(kl_time.date())
+
+    try:
+        index = get_timetable_index()
+    except Exception:
+        return pd.DataFrame()
+
+    schedule = index.schedule.next_trains(
+        service_day, departure, destination,
+        after_minutes=filter_time or 0, limit=None, lines=[route_info["line"]]
+    ).to_frame()
+    return schedule[["Service_ID", "Departure_Station", "Departure_Time", "Arrival_Station", "Arrival_Time"]]
+
+
+# --- FILE MAPPING ---
+file_map = {
+    ("Batu Caves - Pulau Sebang", "Weekdays"): [
+        "timetables/batu_caves_weekdays_route_1.parquet",
+        "timetables/batu_caves_weekdays_route_2.parquet",
+    ],
+    ("Batu Caves - Pulau Sebang", "Weekends"): [
+        "timetables/batu_caves_weekends_route_1.parquet",
+        "timetables/batu_caves_weekends_route_2.parquet",
+    ],
+    ("Tanjung Malim - Pelabuhan Klang", "Weekdays"): [
+        "timetables/klang_weekdays_route_1.parquet",
+        "timetables/klang_weekdays_route_2.parquet",
+    ],
+    ("Tanjung Malim - Pelabuhan Klang", "Weekends"): [
+        "timetables/klang_weekends_route_1.parquet",
+        "timetables/klang_weekends_route_2.parquet",
+    ],
+    ("Padang Besar - Butterworth", "Not applicable"): [
+        "timetables/utara_padangbesar_1.parquet",
+        "timetables/utara_padangbesar_2.parquet",
+    ],
+    ("Ipoh - Butterworth", "Not applicable"): [
+        "timetables/utara_ipoh_1.parquet",
+        "timetables/utara_ipoh_2.parquet",
+    ],
+}
+
+# --- HEADER ---
+st.markdown("""
+<div style="text-align: center; padding: 0.5rem 1rem;">
+    <h1 style="color:#2563eb; font-size:1.8rem; margin:0; font-weight:700;">
+        🚆 KTM <span style="color:#fbbf24;">Schedule</span>
+    </h1>
+    <p style="color:#6b7280; font-size:0.9rem; margin:0.25rem 0;">
+        Check KTMB train schedules across Malaysia
+    </p>
+</div>
+""", unsafe_allow_html=True)
+
+
+# --- INPUTS ---
+
+
+with st.expander("🎯 Select Journey", expanded=True):
+
+    col1, col2 = st.columns([2, 1])
+
+    routes = [
+        "Batu Caves - Pulau Sebang",
+        "Tanjung Malim - Pelabuhan Klang",
+        "Padang Besar - Butterworth",
+        "Ipoh - Butterworth"
+    ]
+
+    with col1:
+        selected_route = st.selectbox("Route", ["Select a route"] + routes)
+
+    with col2:
+        if selected_route in ["Padang Besar - Butterworth", "Ipoh - Butterworth"]:
+            selected_schedule = "Not applicable"
+            st.selectbox("Schedule Type", ["Not applicable"], disabled=True)
+        else:
+            selected_schedule = st.selectbox("Schedule Type", ["Select schedule type", "Weekdays", "Weekends"])
+
+    # --- STATIONS ---
+    if selected_route != "Select a route":
+        key = (selected_route, selected_schedule)
+        if key in file_map:
+            try:
+                route_info = route_info_for(file_map[key])
+                station_list = sorted(get_timetable_index().line_stations(route_info["line"]))
+            except Exception:
+                st.error("⚠️ Could not load station list.")
+                st.stop()
+
+            # --- Station Selection ---
+            st.markdown("### 🎯 Select Stations")
+            col1, col2 = st.columns(2)
+            departure = col1.selectbox("From", ["Select departure"] + station_list)
+            destination = col2.selectbox("To", ["Select destination"] + station_list)
+
+            # --- TIME FILTER ---
+            st.caption(f"⏰ Current time: **{time_depart.strftime('%I:%M %p')}**")
+            use_custom_time = st.checkbox("Show past schedules / choose custom time")
+            if use_custom_time:
+                time_depart = st.slider("Select departure time", value=time_depart, step=timedelta(minutes=15))
+                filter_minutes = time_depart.hour * 60 + time_depart.minute
+            else:
+                filter_minutes = kl_time.hour * 60 + kl_time.minute  # filter by *current* KL time
+
+# --- DISPLAY RESULT ---
+if selected_route != "Select a route":
+    if 'departure' in locals() and 'destination' in locals():
+        if departure != "Select departure" and destination != "Select destination":
+            if departure == destination:
+                st.warning("📍 Departure and destination cannot be the same.")
+            else:
+                st.markdown(f"""
+                    <div style="background:#e6f7ff; padding:12px; border-radius:8px; border-left:5px solid #1f77b4; text-align:center;">
+                        <h3 style="color:#1f77b4; margin:0;">🚆 {departure} → {destination}</h3>
+                    </div>
+                """, unsafe_allow_html=True)
+
+                with st.spinner("🕒 Loading schedule..."):
+                    schedule_df = get_train_schedules(
+                        file_map, selected_route, selected_schedule,
+                        departure, destination, filter_time=filter_minutes
+                    )
+                    if not schedule_df.empty:
+                        try:
+                            # --- Find the next train ---
+                            dep_minutes, dep_valid = parse_times(schedule_df["Departure_Time"])
+                            schedule_df["Dep_Minutes"] = pd.Series(dep_minutes, index=schedule_df.index).where(dep_valid)
+                            next_train_idx = schedule_df["Dep_Minutes"].idxmin()
+
+                            def highlight_next(row):
+                                return ['background-color: #d1fae5; font-weight: bold;' if row.name == next_train_idx else '' for _ in row]
+
+                            styled_df = (
+                                schedule_df.drop(columns=["Dep_Minutes"])
+                                .style
+                                .apply(highlight_next, axis=1)
+                                .hide(axis="index")   # 🔹 Hide index
+                                .set_table_styles([   # 🔹 Bold header
+                                    {'selector': 'th',
+                                    'props': [('font-weight', 'bold'),
+                                            ('background-color', '#f9fafb')]}
+                                ])
+                                .set_properties(      # 🔹 Center align Departure & Arrival
+                                    subset=["Departure_Time", "Arrival_Time"],
+                                    **{'text-align': 'center'}
+                                )
+                            )
+
+                            st.dataframe(styled_df, use_container_width=True, height=400)
+                            st.success(f"✅ Next available train: **{schedule_df.loc[next_train_idx, 'Departure_Time']}** from {departure}")
+                        except Exception:
+                            st.dataframe(schedule_df, use_container_width=True, height=400)
+                    else:
+                        st.info("📭 No upcoming train schedule found.")
+
+else:
+    st.info("🚆 Please select a route to begin.")
+
+# --- DEPARTURE BOARD ---
+with st.expander("🚉 Departure Board"):
+    try:
+        timetable_index = get_timetable_index()
+    except Exception:
+        st.error("⚠️ Could not load departure board.")
+    else:
+        board_station = st.selectbox("Station", ["Select station"] + timetable_index.stations)
+        if board_station != "Select station":
+            board = timetable_index.boards[service_day_for(kl_time.date())]
+            board_df = board.next_departures(board_station, kl_time.hour * 60 + kl_time.minute, limit=15)
+            if board_df.empty:
+                st.info("📭 No more departures today.")
+            else:
+                st.dataframe(
+                    board_df.drop(columns=["Departure_Minutes"]),
+                    use_container_width=True, hide_index=True
+                )
+
+# --- JOURNEY PLANNER ---
+with st.expander("🔀 Plan a Journey (with transfers)"):
+    try:
+        timetable_index = get_timetable_index()
+        planner, all_stations = timetable_index.planner, timetable_index.stations
+    except Exception:
+        st.error("⚠️ Could not load journey planner.")
+    else:
+        col1, col2 = st.columns(2)
+        journey_from = col1.selectbox("From", ["Select departure"] + all_stations, key="journey_from")
+        journey_to = col2.selectbox("To", ["Select destination"] + all_stations, key="journey_to")
+        if journey_from != "Select departure" and journey_to != "Select destination":
+            if journey_from == journey_to:
+                st.warning("📍 Departure and destination cannot be the same.")
+            else:
+                journey_df = planner.earliest_arrival(
+                    service_day_for(kl_time.date()), journey_from, journey_to,
+                    after_minutes=kl_time.hour * 60 + kl_time.minute
+                )
+                if journey_df.empty:
+                    st.info("📭 No journey found for the rest of today.")
+                else:
+                    changes = len(journey_df) - 1
+                    st.success(
+                        f"✅ Arrive at **{journey_df['Arrival_Time'].iloc[-1]}** "
+                        f"({changes} change{'s' if changes != 1 else ''})"
+                    )
+                    st.dataframe(
+                        journey_df.drop(columns=["Departure_Minutes", "Arrival_Minutes"]),
+                        use_container_width=True, hide_index=True
+                    )
+
+# --- FOOTER ---
+st.markdown("---")
+st.markdown("<p style='text-align:center; font-size:0.8rem; color:#6b7280;'>Created by: ubaid</p>", unsafe_allow_html=True)
+
+
+
+
+
+
+
+
+
+
+# with st.expander("🎯 Select Journey", expanded=True):
+
+#     col1, col2 = st.columns([2, 1])
+
+#     routes = [
+#         "Batu Caves - Pulau Sebang",
+#         "Tanjung Malim - Pelabuhan Klang",
+#         "Padang Besar - Butterworth",
+#         "Ipoh - Butterworth"
+#     ]
+
+#     with col1:
+#         selected_route = st.selectbox("Route", ["Select a route"] + routes)
+
+#     with col2:
+#         if selected_route in ["Padang Besar - Butterworth", "Ipoh - Butterworth"]:
+#             selected_schedule = "Not applicable"
+#             st.selectbox("Schedule Type", ["Not applicable"], disabled=True)
+#         else:
+#             selected_schedule = st.selectbox("Schedule Type", ["Select schedule type", "Weekdays", "Weekends"])
+
+
+# # --- STATIONS ---
+# if selected_route != "Select a route":
+#     key = (selected_route, selected_schedule)
+#     if key in file_map:
+#         try:
+#             df = load_parquet(file_map[key][0])
+#             station_list = sorted(df["STATION"].dropna().unique())
+#         except Exception:
+#             st.error("⚠️ Could not load station list.")
+#             st.stop()
+
+
+#         # --- Station Selection ---
+#         st.markdown("### 🎯 Select Stations")
+#         col1, col2 = st.columns(2)
+#         departure = col1.selectbox("From", ["Select departure"] + station_list)
+#         destination = col2.selectbox("To", ["Select destination"] + station_list)
+
+#         # --- TIME FILTER ---
+#         st.caption(f"⏰ Current time: **{time_depart.strftime('%I:%M %p')}**")
+#         use_custom_time = st.checkbox("Show past schedules / choose custom time")
+#         if use_custom_time:
+#             time_depart = st.slider("Select departure time", value=time_depart, step=timedelta(minutes=15))
+#             filter_minutes = time_depart.hour * 60 + time_depart.minute
+#         else:
+#             filter_minutes = kl_time.hour * 60 + kl_time.minute  # filter by *current* KL time
+
+#         # --- DISPLAY RESULT ---
+#         if departure != "Select departure" and destination != "Select destination":
+#             if departure == destination:
+#                 st.warning("📍 Departure and destination cannot be the same.")
+#             else:
+#                 st.markdown(f"""
+#                     <div style="background:#e6f7ff; padding:12px; border-radius:8px; border-left:5px solid #1f77b4; text-align:center;">
+#                         <h3 style="color:#1f77b4; margin:0;">🚆 {departure} → {destination}</h3>
+#                     </div>
+#                 """, unsafe_allow_html=True)
+
+#                 with st.spinner("🕒 Loading schedule..."):
+#                     schedule_df = get_train_schedules(
+#                         file_map, selected_route, selected_schedule,
+#                         departure, destination, filter_time=filter_minutes
+#                     )
+#                     if not schedule_df.empty:
+#                         try:
+#                             # --- Find the next train ---
+#                             schedule_df["Dep_Minutes"] = schedule_df["Departure_Time"].apply(parse_time_to_minutes)
+#                             next_train_idx = schedule_df["Dep_Minutes"].idxmin()
+
+#                             def highlight_next(row):
+#                                 return ['background-color: #d1fae5; font-weight: bold;' if row.name == next_train_idx else '' for _ in row]
+
+#                             styled_df = (
+#                                 schedule_df.drop(columns=["Dep_Minutes"])
+#                                 .style
+#                                 .apply(highlight_next, axis=1)
+#                                 .hide(axis="index")   # 🔹 Hide index
+#                                 .set_table_styles([   # 🔹 Bold header
+#                                     {'selector': 'th',
+#                                     'props': [('font-weight', 'bold'),
+#                                             ('background-color', '#f9fafb')]}
+#                                 ])
+#                                 .set_properties(      # 🔹 Center align Departure & Arrival
+#                                     subset=["Departure_Time", "Arrival_Time"],
+#                                     **{'text-align': 'center'}
+#                                 )
+#                             )
+
+#                             st.dataframe(styled_df, use_container_width=True, height=400)
+#                             st.success(f"✅ Next available train: **{schedule_df.loc[next_train_idx, 'Departure_Time']}** from {departure}")
+#                         except Exception:
+#                             st.dataframe(schedule_df, use_container_width=True, height=400)
+#                     else:
+#                         st.info("📭 No upcoming train schedule found.")
+
+
+
+# else:
+#     st.info("🚆 Please select a route to begin.")
+
+# # --- FOOTER ---
+# st.markdown("---")
+# st.markdown("<p style='text-align:center; font-size:0.8rem; color:#6b7280;'>Created by: ubaid</p>", unsafe_allow_html=True)